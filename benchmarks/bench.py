@@ -0,0 +1,364 @@
+"""Benchmark harness for capture, verify, normalization and diffing.
+
+Run a preset and write machine-readable results::
+
+    python benchmarks/bench.py run --preset quick --output results.json
+
+Compare two result files and exit non-zero on regressions (for CI)::
+
+    python benchmarks/bench.py compare baseline.json results.json --threshold 0.25
+
+The ``quick`` preset finishes in well under a minute and is meant for CI.
+``full`` scales outputs up to 1 GB and snapshot directories up to 100k
+entries; it needs several GB of memory and disk and takes a long time.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+import generators  # noqa: E402
+from assert_snapshot import __version__  # noqa: E402
+from assert_snapshot.formatter import format_diff  # noqa: E402
+from assert_snapshot.snapshot import SnapshotManager  # noqa: E402
+
+RESULTS_VERSION = 1
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+PRESETS: Dict[str, Dict[str, Any]] = {
+    'quick': {
+        'sizes': [1 * KB, 64 * KB, 1 * MB],
+        'lines': [100, 10_000],
+        'divergence': [0.001, 0.1, 0.5],
+        'snapshots': [10, 1_000],
+        'repeat': 5,
+    },
+    'full': {
+        'sizes': [1 * KB, 1 * MB, 100 * MB, 1 * GB],
+        'lines': [100, 10_000, 1_000_000],
+        'divergence': [0.001, 0.01, 0.1, 0.5],
+        'snapshots': [10, 1_000, 100_000],
+        'repeat': 3,
+    },
+}
+
+# Each benchmark yields (params, setup) pairs; setup returns the timed callable
+# and a cleanup function.
+Case = Tuple[Dict[str, Any], Callable[[], Tuple[Callable[[], Any], Callable[[], None]]]]
+
+
+def _workdir() -> Path:
+    return Path(tempfile.mkdtemp(prefix='assert-snapshot-bench-'))
+
+
+def bench_run_command(config: Dict[str, Any]) -> Iterator[Case]:
+    """SnapshotManager._run_command on ``cat`` of a file of each size."""
+    for size in config['sizes']:
+        def setup(size=size):
+            root = _workdir()
+            data = generators.write_text(root / 'output.txt', size)
+            manager = SnapshotManager(str(root / '.snapshots'))
+            return (lambda: manager._run_command(['cat', str(data)]),
+                    lambda: shutil.rmtree(root))
+        yield {'size': size}, setup
+
+
+def bench_strip_ansi(config: Dict[str, Any]) -> Iterator[Case]:
+    """ANSI stripping of colored text of each size."""
+    for size in config['sizes']:
+        def setup(size=size):
+            root = _workdir()
+            text = generators.colorize(generators.make_text(size))
+            manager = SnapshotManager(str(root / '.snapshots'))
+            return lambda: manager._strip_ansi(text), lambda: shutil.rmtree(root)
+        yield {'size': size}, setup
+
+
+def bench_normalize(config: Dict[str, Any]) -> Iterator[Case]:
+    """Builtin redactions plus trailing-whitespace stripping over noisy text of each size."""
+    for size in config['sizes']:
+        def setup(size=size):
+            root = _workdir()
+            text = generators.add_noise(generators.make_text(size))
+            manager = SnapshotManager(
+                str(root / '.snapshots'),
+                redact=['timestamps', 'uuids'],
+                strip_trailing_whitespace=True
+            )
+            normalizer = manager._normalizer(True)
+            return lambda: normalizer(text), lambda: shutil.rmtree(root)
+        yield {'size': size}, setup
+
+
+def _verify_case(size: int, stream: bool) -> Callable[[], Tuple[Callable[[], Any], Callable[[], None]]]:
+    def setup():
+        root = _workdir()
+        data = generators.write_text(root / 'output.txt', size)
+        manager = SnapshotManager(str(root / '.snapshots'))
+        command = ['cat', str(data)]
+        manager.capture(command, name='bench')
+        verify = manager.verify_stream if stream else manager.verify
+
+        def run():
+            result = verify(command, name='bench')
+            assert result['matches']
+        return run, lambda: shutil.rmtree(root)
+    return setup
+
+
+def bench_verify(config: Dict[str, Any]) -> Iterator[Case]:
+    """A passing verify (digest comparison) of each output size."""
+    for size in config['sizes']:
+        yield {'size': size}, _verify_case(size, stream=False)
+
+
+def bench_verify_stream(config: Dict[str, Any]) -> Iterator[Case]:
+    """A passing streaming verify of each output size."""
+    for size in config['sizes']:
+        yield {'size': size}, _verify_case(size, stream=True)
+
+
+def bench_format_diff(config: Dict[str, Any]) -> Iterator[Case]:
+    """format_diff by line count and fraction of diverging lines."""
+    for lines in config['lines']:
+        for fraction in config['divergence']:
+            def setup(lines=lines, fraction=fraction):
+                expected_lines = generators.make_lines(lines)
+                expected = ''.join(expected_lines)
+                actual = ''.join(generators.diverge(expected_lines, fraction))
+                return lambda: format_diff(expected, actual), lambda: None
+            yield {'lines': lines, 'divergence': fraction}, setup
+
+
+def _populate(root: Path, count: int) -> SnapshotManager:
+    manager = SnapshotManager(str(root / '.snapshots'), sync='off')
+    for index in range(count):
+        manager.store.write(f'snap{index:06d}.snapshot', f'output {index}\n'.encode('utf-8'))
+    manager.reindex()
+    return manager
+
+
+def bench_list(config: Dict[str, Any]) -> Iterator[Case]:
+    """list_snapshots from the index for directories of each size."""
+    for count in config['snapshots']:
+        def setup(count=count):
+            root = _workdir()
+            _populate(root, count)
+            return lambda: SnapshotManager(str(root / '.snapshots')).list_snapshots(), \
+                lambda: shutil.rmtree(root)
+        yield {'snapshots': count}, setup
+
+
+def bench_reindex(config: Dict[str, Any]) -> Iterator[Case]:
+    """Rebuilding the index for directories of each size."""
+    for count in config['snapshots']:
+        def setup(count=count):
+            root = _workdir()
+            manager = _populate(root, count)
+            return manager.reindex, lambda: shutil.rmtree(root)
+        yield {'snapshots': count}, setup
+
+
+def bench_verify_in_dir(config: Dict[str, Any]) -> Iterator[Case]:
+    """A passing verify of a small snapshot in directories of each size."""
+    for count in config['snapshots']:
+        def setup(count=count):
+            root = _workdir()
+            _populate(root, count)
+            manager = SnapshotManager(str(root / '.snapshots'))
+            manager.capture(['echo', 'hello'], name='bench')
+            return lambda: manager.verify(['echo', 'hello'], name='bench'), \
+                lambda: shutil.rmtree(root)
+        yield {'snapshots': count}, setup
+
+
+BENCHMARKS: Dict[str, Callable[[Dict[str, Any]], Iterator[Case]]] = {
+    'run_command': bench_run_command,
+    'strip_ansi': bench_strip_ansi,
+    'normalize': bench_normalize,
+    'verify': bench_verify,
+    'verify_stream': bench_verify_stream,
+    'format_diff': bench_format_diff,
+    'list': bench_list,
+    'reindex': bench_reindex,
+    'verify_in_dir': bench_verify_in_dir,
+}
+
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmarks(
+    preset: str = 'quick',
+    pattern: Optional[str] = None,
+    repeat: Optional[int] = None,
+    log: Callable[[str], None] = lambda line: None
+) -> Dict[str, Any]:
+    """Run every benchmark matching ``pattern`` and return the results document."""
+    config = dict(PRESETS[preset])
+    if repeat is not None:
+        config['repeat'] = repeat
+    results = []
+    for name, cases in BENCHMARKS.items():
+        if pattern and not fnmatch.fnmatch(name, pattern):
+            continue
+        for params, setup in cases(config):
+            func, cleanup = setup()
+            try:
+                timings = measure(func, config['repeat'])
+            finally:
+                cleanup()
+            entry = {
+                'benchmark': name,
+                'params': params,
+                'timings': timings,
+                'min': min(timings),
+                'median': statistics.median(timings),
+                'mean': statistics.mean(timings),
+                'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            }
+            if 'size' in params:
+                entry['mb_per_s'] = params['size'] / MB / entry['median'] if entry['median'] else None
+            results.append(entry)
+            log(f"{name:<14} {_format_params(params):<32} median {entry['median'] * 1000:10.3f} ms")
+    return {
+        'version': RESULTS_VERSION,
+        'meta': {
+            'package_version': __version__,
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'preset': preset,
+            'repeat': config['repeat'],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+
+def _format_params(params: Dict[str, Any]) -> str:
+    return ' '.join(f"{key}={value}" for key, value in sorted(params.items()))
+
+
+def _key(entry: Dict[str, Any]) -> str:
+    return f"{entry['benchmark']} {_format_params(entry['params'])}"
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = 0.25,
+    min_delta: float = 0.001
+) -> List[Dict[str, Any]]:
+    """Pair up matching benchmarks and flag medians that grew beyond ``threshold``.
+
+    Differences smaller than ``min_delta`` seconds are never flagged, so
+    microsecond-scale noise does not fail CI.
+    """
+    base = {_key(entry): entry for entry in baseline['results']}
+    rows = []
+    for entry in current['results']:
+        key = _key(entry)
+        if key not in base:
+            continue
+        old, new = base[key]['median'], entry['median']
+        ratio = new / old if old else float('inf')
+        rows.append({
+            'key': key,
+            'baseline': old,
+            'current': new,
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold and new - old > min_delta,
+        })
+    return rows
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != RESULTS_VERSION:
+        raise SystemExit(f"{path}: unsupported results version {data.get('version')}")
+    return data
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Run benchmarks and write JSON results')
+    run.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    run.add_argument('--filter', dest='pattern', help='Glob of benchmark names to run')
+    run.add_argument('--repeat', type=int, help='Timed runs per case (default: from preset)')
+    run.add_argument('--output', '-o', help='Write results to this file (default: stdout)')
+
+    compare = commands.add_parser('compare', help='Compare two result files')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.25,
+                         help='Allowed slowdown of the median, as a fraction (default: 0.25)')
+    compare.add_argument('--min-delta', type=float, default=0.001,
+                         help='Ignore slowdowns smaller than this many seconds')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        results = run_benchmarks(
+            args.preset, args.pattern, args.repeat,
+            log=lambda line: print(line, file=sys.stderr)
+        )
+        text = json.dumps(results, indent=2)
+        if args.output:
+            Path(args.output).write_text(text + '\n', encoding='utf-8')
+        else:
+            print(text)
+        return 0
+
+    rows = compare_results(_load(args.baseline), _load(args.current), args.threshold, args.min_delta)
+    regressions = 0
+    for row in rows:
+        marker = 'REGRESSION' if row['regression'] else ''
+        regressions += row['regression']
+        print(f"{row['key']:<48} {row['baseline'] * 1000:10.3f} ms -> "
+              f"{row['current'] * 1000:10.3f} ms  x{row['ratio']:.2f} {marker}")
+    print(f"\n{len(rows)} compared, {regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
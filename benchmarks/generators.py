@@ -0,0 +1,90 @@
+"""Deterministic synthetic command output for the benchmarks."""
+
+import random
+import uuid
+from pathlib import Path
+from typing import Iterator, List
+
+WORDS = (
+    'alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi '
+    'omicron pi rho sigma tau upsilon phi chi psi omega build test deploy cache '
+    'request response status ok error warning info debug trace module package'
+).split()
+
+ANSI_CODES = ('\x1b[31m', '\x1b[32m', '\x1b[1;34m', '\x1b[0m', '\x1b[2K')
+
+
+def iter_lines(seed: int = 0, width: int = 72) -> Iterator[str]:
+    """Yield distinct, log-like lines of roughly ``width`` characters."""
+    rng = random.Random(seed)
+    number = 0
+    while True:
+        words = []
+        length = 9
+        while length < width:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        yield f"{number:08d} {' '.join(words)}\n"
+        number += 1
+
+
+def make_lines(count: int, seed: int = 0) -> List[str]:
+    lines = iter_lines(seed)
+    return [next(lines) for _ in range(count)]
+
+
+def make_text(size: int, seed: int = 0) -> str:
+    """Return about ``size`` characters of newline-terminated text."""
+    parts = []
+    total = 0
+    for line in iter_lines(seed):
+        if total >= size:
+            break
+        parts.append(line)
+        total += len(line)
+    return ''.join(parts)
+
+
+def write_text(path: Path, size: int, seed: int = 0, chunk_lines: int = 10_000) -> Path:
+    """Stream about ``size`` bytes of text to ``path`` without holding it in memory."""
+    lines = iter_lines(seed)
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < size:
+            chunk = ''.join(next(lines) for _ in range(chunk_lines))
+            f.write(chunk)
+            written += len(chunk)
+    return path
+
+
+def diverge(lines: List[str], fraction: float, seed: int = 1) -> List[str]:
+    """Return a copy of ``lines`` with ``fraction`` of them replaced (at least one)."""
+    rng = random.Random(seed)
+    changed = list(lines)
+    count = min(len(lines), max(1, int(len(lines) * fraction)))
+    for index in rng.sample(range(len(lines)), count):
+        changed[index] = changed[index].replace(' ', ' changed ', 1)
+    return changed
+
+
+def colorize(text: str, seed: int = 2) -> str:
+    """Sprinkle ANSI escape sequences through ``text``, one or two per line."""
+    rng = random.Random(seed)
+    out = []
+    for line in text.splitlines(keepends=True):
+        out.append(rng.choice(ANSI_CODES) + line[:20] + rng.choice(ANSI_CODES) + line[20:])
+    return ''.join(out)
+
+
+def add_noise(text: str, seed: int = 3) -> str:
+    """Add timestamps, UUIDs and trailing whitespace for the redaction benchmarks."""
+    rng = random.Random(seed)
+    out = []
+    for index, line in enumerate(text.splitlines()):
+        if index % 3 == 0:
+            line = f"2024-01-{index % 28 + 1:02d}T12:{index % 60:02d}:00Z {line}"
+        if index % 5 == 0:
+            line += f" id={uuid.UUID(int=rng.getrandbits(128))}"
+        out.append(line + '   \n')
+    return ''.join(out)
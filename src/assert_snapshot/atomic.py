@@ -0,0 +1,169 @@
+"""Atomic file replacement, fsync policies and the snapshot directory lock."""
+
+import os
+import threading
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
+
+LOCK_FILENAME = '.lock'
+
+# 'each' fsyncs every write, 'batch' defers to flush(), 'off' never syncs.
+SYNC_MODES = ('each', 'batch', 'off')
+
+
+def fsync_path(path: Path) -> None:
+    """Flush a file or directory to disk, ignoring platforms that refuse."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SyncPolicy:
+    """Decide when written files are flushed to disk.
+
+    In ``batch`` mode written paths are only remembered, and ``flush`` syncs
+    them and their directories in a single pass. A crash before the flush
+    can lose the batch but never leaves a torn file behind, because every
+    write is still a rename of a complete temporary file.
+    """
+
+    def __init__(self, mode: str = 'each'):
+        if mode not in SYNC_MODES:
+            raise ValueError(f"Unknown sync mode: {mode}")
+        self.mode = mode
+        self.pending: Set[Path] = set()
+
+    def file(self, f: BinaryIO) -> None:
+        """Called with an open file once its contents are complete."""
+        if self.mode == 'each':
+            f.flush()
+            os.fsync(f.fileno())
+
+    def committed(self, path: Path) -> None:
+        """Called once ``path`` has been renamed into place or appended to."""
+        if self.mode == 'each':
+            fsync_path(Path(path).parent)
+        elif self.mode == 'batch':
+            self.pending.add(Path(path))
+
+    def take(self) -> List[str]:
+        """Hand the pending paths to another process's policy."""
+        pending, self.pending = self.pending, set()
+        return sorted(str(path) for path in pending)
+
+    def extend(self, paths: Iterable[str]) -> None:
+        self.pending.update(Path(path) for path in paths)
+
+    def flush(self) -> int:
+        """Sync every pending file, then each affected directory once."""
+        pending, self.pending = self.pending, set()
+        directories = set()
+        for path in sorted(pending):
+            fsync_path(path)
+            directories.add(path.parent)
+        for directory in sorted(directories):
+            fsync_path(directory)
+        return len(pending)
+
+
+def atomic_write(path: Path, data: bytes, sync: Optional[SyncPolicy] = None) -> None:
+    """Replace ``path`` with ``data`` via a temporary file and ``os.replace``.
+
+    Readers see either the old or the new contents, never a partial write.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            if sync is not None:
+                sync.file(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+    if sync is not None:
+        sync.committed(path)
+
+
+class _LockState:
+    def __init__(self):
+        self.mutex = threading.RLock()
+        self.depth = 0
+        self.fd: Optional[int] = None
+
+
+_lock_states: Dict[str, _LockState] = {}
+_lock_states_guard = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    # A forked worker must take the lock itself rather than inherit the parent's.
+    os.register_at_fork(after_in_child=_lock_states.clear)
+
+
+class DirectoryLock:
+    """Advisory exclusive lock on a snapshot directory.
+
+    Uses ``flock`` on ``.lock`` so concurrent ``assert-snapshot`` processes
+    serialize their read-modify-write cycles. The lock is reentrant within a
+    process, so the manager, index and store can each take it without
+    deadlocking each other. Where ``flock`` is unavailable only threads in
+    the same process are serialized.
+    """
+
+    def __init__(self, root: Path):
+        self.path = Path(root) / LOCK_FILENAME
+        key = os.path.abspath(self.path)
+        with _lock_states_guard:
+            self._state = _lock_states.setdefault(key, _LockState())
+
+    def acquire(self) -> None:
+        state = self._state
+        state.mutex.acquire()
+        if state.depth == 0:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            except BaseException:
+                state.mutex.release()
+                raise
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(fd)
+                state.mutex.release()
+                raise
+            state.fd = fd
+        state.depth += 1
+
+    def release(self) -> None:
+        state = self._state
+        state.depth -= 1
+        if state.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(state.fd, fcntl.LOCK_UN)
+            os.close(state.fd)
+            state.fd = None
+        state.mutex.release()
+
+    def __enter__(self) -> 'DirectoryLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
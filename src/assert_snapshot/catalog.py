@@ -0,0 +1,144 @@
+"""When snapshots were last captured and verified, for queries and ``gc``.
+
+The index already records each snapshot's command, size and capture
+settings. ``StatusStore`` adds when it was last captured and verified and
+with what result, in name-hashed shards (as for durations, see
+``index.ShardedRecords``) so each update rewrites one small file and the
+file count stays bounded. It also remembers the last complete
+suite run and every snapshot suite runs have produced; those of them the
+last run did not touch, and that were not captured or verified since it
+started, are stale and can be garbage collected.
+"""
+
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .atomic import SyncPolicy, atomic_write
+from .index import ShardedRecords
+
+# ``unverified``: captured (or accepted) and not verified since.
+STATUSES = ('passed', 'failed', 'unverified')
+
+SUITE_FILENAME = '.suite'
+
+_AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def parse_age(value: str) -> float:
+    """Parse an age such as ``90``, ``30m``, ``12h`` or ``7d`` into seconds."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*', value.lower())
+    if not match:
+        raise ValueError(f"Invalid age '{value}': expected e.g. 90s, 30m, 12h, 7d or 2w")
+    return float(match.group(1)) * _AGE_UNITS[match.group(2) or 's']
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as ``512``, ``10k`` or ``2M`` (powers of 1024) into bytes."""
+    match = re.fullmatch(r'\s*(\d+)\s*([kmg]?)b?\s*', value.lower())
+    if not match:
+        raise ValueError(f"Invalid size '{value}': expected e.g. 512, 10k or 2M")
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def format_age(seconds: Optional[float]) -> str:
+    """Render an age in its largest whole unit, e.g. ``3d``; ``-`` if unknown."""
+    if seconds is None:
+        return '-'
+    for unit in ('w', 'd', 'h', 'm'):
+        if seconds >= _AGE_UNITS[unit]:
+            return f"{int(seconds // _AGE_UNITS[unit])}{unit}"
+    return f"{int(max(seconds, 0))}s"
+
+
+class StatusStore:
+    """Keep the last capture and verify time and result of each snapshot.
+
+    A record is ``{'captured': t, 'verified': t, 'status': s}`` with epoch
+    times; ``verified`` and ``status`` are None until the snapshot is
+    verified after being captured.
+    """
+
+    def __init__(self, root: Path, sync: Optional[SyncPolicy] = None):
+        self.root = Path(root)
+        self.sync = sync
+        # Records are advisory, so they are never fsynced on their own.
+        self.records = ShardedRecords(self.root, version=1, cache=False)
+
+    def get(self, snapshot_name: str) -> Optional[Dict[str, Any]]:
+        """Return the record of a snapshot, if any."""
+        return self.records.get(snapshot_name)
+
+    def captured(self, snapshot_name: str, when: Optional[float] = None) -> None:
+        """Note new snapshot content; the previous verify result no longer applies."""
+        self.records.update({snapshot_name: {
+            'captured': time.time() if when is None else when,
+            'verified': None,
+            'status': None,
+        }})
+
+    def verified(self, snapshot_name: str, matches: bool, when: Optional[float] = None) -> None:
+        """Note the result of a verify."""
+        def change(record):
+            record = record or {'captured': None}
+            record['verified'] = time.time() if when is None else when
+            record['status'] = 'passed' if matches else 'failed'
+            return record
+        self.records.apply(snapshot_name, change)
+
+    def load(self, snapshot_names: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the records of the snapshots that have one."""
+        records = self.records.load()
+        return {name: records[name] for name in snapshot_names if name in records}
+
+    def discard(self, snapshot_name: str) -> None:
+        self.records.update({}, removed=[snapshot_name])
+
+    def names(self) -> List[str]:
+        """List snapshot names with a record (including deleted snapshots)."""
+        return self.records.names()
+
+    def mark_suite(self, started: float, snapshot_names: Iterable[str]) -> None:
+        """Remember a complete suite run: when it started and what it covered.
+
+        ``managed`` accumulates the names of every suite run so far, so
+        snapshots a manifest never produced (captured by hand or by the
+        pytest plugin) are never taken for stale ones.
+        """
+        names = sorted(set(snapshot_names))
+        previous = self.last_suite() or {}
+        managed = set(previous.get('managed', previous.get('names', ()))) | set(names)
+        self._write_suite({'started': started, 'names': names, 'managed': sorted(managed)})
+
+    def unmanage(self, snapshot_names: Iterable[str]) -> None:
+        """Drop deleted snapshots from the names suite runs have produced."""
+        suite = self.last_suite()
+        if suite is None:
+            return
+        suite['managed'] = sorted(set(suite.get('managed', suite['names'])) - set(snapshot_names))
+        self._write_suite(suite)
+
+    def _write_suite(self, suite: Dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.root / SUITE_FILENAME, json.dumps(suite).encode('utf-8'), self.sync)
+
+    def last_suite(self) -> Optional[Dict[str, Any]]:
+        """Return the last run recorded by ``mark_suite``, if any."""
+        try:
+            return json.loads((self.root / SUITE_FILENAME).read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+def last_touched(record: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Return the latest capture or verify time of a status record."""
+    record = record or {}
+    return max((t for t in (record.get('captured'), record.get('verified')) if t), default=None)
+
+
+def status_of(record: Optional[Dict[str, Any]]) -> str:
+    """Return a record's status, ``unverified`` when it has none."""
+    return (record or {}).get('status') or 'unverified'
@@ -1,10 +1,204 @@
 """CLI entry point for assert-snapshot."""
 
+import json
+import os
+import signal
 import sys
+import threading
+import time
 import click
+from contextlib import contextmanager
 from pathlib import Path
-from .snapshot import SnapshotManager
-from .formatter import format_diff, prompt_update
+from .snapshot import SnapshotManager, mismatched_streams
+from .catalog import STATUSES, format_age, last_touched, parse_age, parse_size
+from .diff import DIFF_ALGORITHMS
+from .perf import STATISTICS, format_drift, make_budget
+from .client import default_socket_path
+from .shard import merge_documents, parse_shard, results_document
+from .structured import STRUCTURES
+from .suite import ENGINES, drive, load_manifest, run_suite, shard_entries, summarize
+from .trace import Tracer, build_report, format_profile, phase
+
+
+def diff_options(f):
+    """Add the options controlling how mismatch diffs are rendered."""
+    options = [
+        click.option('--diff-algorithm', type=click.Choice(DIFF_ALGORITHMS), default='auto', help='Diff engine used for mismatches'),
+        click.option('--max-diff-lines', type=int, help='Stop the diff after this many lines'),
+        click.option('--max-hunks', type=int, help='Stop the diff after this many hunks'),
+        click.option('--diff-stat', is_flag=True, help='Show only insertion/deletion counts'),
+        click.option('--diff-file', type=click.Path(dir_okay=False), help='Write diffs to a file instead of the terminal'),
+        click.option('--binary-diff', type=click.Choice(('escaped', 'hex')), default='escaped', show_default=True, help='How binary snapshots are rendered in diffs'),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
+
+def normalize_options(f):
+    """Add the output normalization options shared by capture/verify/update."""
+    options = [
+        click.option('--redact', multiple=True, help="Regex (or builtin: timestamps, uuids, pids, tmp-paths) to replace with a placeholder"),
+        click.option('--strip-trailing-whitespace', is_flag=True, help='Remove trailing spaces and tabs from each line'),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
+
+def trace_options(f):
+    """Add the options that record per-phase timings of the run."""
+    options = [
+        click.option('--report', 'report_file', type=click.Path(dir_okay=False), help='Write per-phase timings and resource use as JSON'),
+        click.option('--profile', is_flag=True, help='Print the slowest snapshots and phases to stderr'),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
+
+def budget_options(f):
+    """Add the options that turn verify into a performance budget check."""
+    options = [
+        click.option('--repeat', type=click.IntRange(min=1), default=1, help='Run the command N times and compare timing statistics'),
+        click.option('--statistic', type=click.Choice(STATISTICS), default='median', show_default=True, help='Statistic of the repeated runs checked against the budget'),
+        click.option('--tolerance', type=float, help='Allowed slowdown over the timings recorded by capture --measure (0.2 = 20%)'),
+        click.option('--max-wall', type=float, help='Wall time limit in seconds'),
+        click.option('--max-cpu', type=float, help='CPU time (user + system) limit in seconds'),
+        click.option('--max-rss', type=float, help='Peak memory limit in MB'),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
+
+def snapshot_dir_option(f):
+    """Add the option choosing the snapshot directory a command works on."""
+    return click.option(
+        '--snapshot-dir', default='.snapshots', show_default=True, type=click.Path(file_okay=False),
+        help="Snapshot directory (the manifest's snapshot_dir, if it sets one)"
+    )(f)
+
+
+def _shard(ctx, param, value):
+    """Parse an ``i/n`` shard option."""
+    if value is None:
+        return None
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def _parsed(parse):
+    """Build an option callback that converts its value with ``parse``."""
+    def callback(ctx, param, value):
+        if value is None:
+            return None
+        try:
+            return parse(value)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+    return callback
+
+
+def _budget(repeat, statistic, tolerance, max_wall, max_cpu, max_rss):
+    """Return the budget for verify, or None if no budget option was given."""
+    if repeat == 1 and tolerance is None and max_wall is None and max_cpu is None and max_rss is None:
+        return None
+    return make_budget(
+        repeat, statistic, tolerance, max_wall, max_cpu,
+        int(max_rss * 1024 * 1024) if max_rss is not None else None
+    )
+
+
+def _write_report(report, report_file=None, profile=False):
+    """Save a trace report as JSON and/or print its profile summary."""
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if profile:
+        click.echo('', err=True)
+        for line in format_profile(report):
+            click.echo(line, err=True)
+
+
+@contextmanager
+def _tracing(op, command, report_file=None, profile=False):
+    """Trace the block (diff rendering included) as one operation when asked to."""
+    if not report_file and not profile:
+        yield
+        return
+    tracer = Tracer()
+    try:
+        with tracer.operation(op, command):
+            yield
+    finally:
+        _write_report(tracer.report(), report_file, profile)
+
+
+def _manager(redact=(), strip_trailing_whitespace=False, snapshot_dir='.snapshots'):
+    """Create a SnapshotManager with the given normalization settings."""
+    return SnapshotManager(
+        snapshot_dir,
+        redact=redact,
+        strip_trailing_whitespace=strip_trailing_whitespace
+    )
+
+
+@contextmanager
+def _diff_output(diff_file):
+    """Yield the stream diffs are written to: a file or stdout."""
+    if diff_file is None:
+        yield None
+        return
+    with open(diff_file, 'w', encoding='utf-8') as f:
+        yield f
+
+
+def _show_diff(expected, actual, out=None, title=None, diff_algorithm='auto',
+               max_diff_lines=None, max_hunks=None, diff_stat=False, diff_file=None,
+               binary_diff='escaped', structure=None):
+    """Stream a mismatch diff (or its stat) to the terminal or diff file."""
+    # Rendering pulls in colorama and difflib; only mismatches pay for it.
+    from .formatter import format_diff_stat, iter_diff, write_diff
+
+    if diff_stat:
+        click.echo(format_diff_stat(expected, actual, diff_algorithm, binary_diff, structure))
+        return
+    lines = iter_diff(
+        expected,
+        actual,
+        algorithm=diff_algorithm,
+        max_lines=max_diff_lines,
+        max_hunks=max_hunks,
+        color=out is None,
+        binary_style=binary_diff,
+        structure=structure
+    )
+    if out is None:
+        write_diff(lines)
+    else:
+        if title:
+            out.write(f"{title}\n")
+        write_diff(lines, out)
+        if not title:
+            click.echo(f"Diff written to {diff_file}")
+
+
+def _show_result_diff(result, out=None, **diff_opts):
+    """Show the diff of a verify result, one per stream when stderr is kept apart."""
+    structure = result.get('structure')
+    if 'stderr' not in result:
+        _show_diff(result['expected'], result['actual'], out, structure=structure, **diff_opts)
+        return
+    for snapshot_name, expected, actual in mismatched_streams(result):
+        if out is None:
+            click.echo(snapshot_name)
+        # Only stdout is structured; the stderr companion is plain text.
+        _show_diff(expected, actual, out, title=snapshot_name,
+                   structure=structure if snapshot_name == result['snapshot_name'] else None,
+                   **diff_opts)
 
 
 @click.group()
@@ -18,17 +212,38 @@ def cli():
 @click.option('--name', help='Named snapshot identifier')
 @click.option('--strip-ansi', is_flag=True, help='Strip ANSI color codes')
 @click.option('--timeout', type=int, default=30, help='Command timeout in seconds')
-def capture(command, name, strip_ansi, timeout):
+@click.option('--measure', is_flag=True, help='Record wall time, CPU time and peak RSS as the budget baseline')
+@click.option('--repeat', type=click.IntRange(min=1), default=1, help='With --measure, run the command N times and record statistics')
+@click.option('--binary', is_flag=True, help='Store the raw output bytes without decoding or normalization')
+@click.option('--separate-stderr', is_flag=True, help='Snapshot stderr separately instead of appending it to stdout')
+@click.option('--structure', type=click.Choice(STRUCTURES), help='Store JSON/NDJSON output canonically and diff it by path')
+@normalize_options
+@trace_options
+def capture(command, name, strip_ansi, timeout, measure, repeat, binary, separate_stderr,
+            structure, report_file, profile, **normalize_opts):
     """Capture command output as a snapshot."""
-    manager = SnapshotManager()
     try:
-        snapshot_name = manager.capture(
-            list(command),
-            name=name,
-            strip_ansi=strip_ansi,
-            timeout=timeout
-        )
+        with _tracing('capture', command, report_file, profile):
+            manager = _manager(**normalize_opts)
+            snapshot_name = manager.capture(
+                list(command),
+                name=name,
+                strip_ansi=strip_ansi,
+                timeout=timeout,
+                measure=measure or repeat > 1,
+                repeat=repeat,
+                binary=binary,
+                separate_stderr=separate_stderr,
+                structure=structure
+            )
         click.echo(f"Snapshot saved: {snapshot_name}")
+        perf = manager.recorded_perf(snapshot_name)
+        if perf:
+            for line in format_drift({
+                'statistic': 'median', 'tolerance': None, 'measured': perf,
+                'recorded': None, 'violations': [],
+            }):
+                click.echo(line)
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
         sys.exit(1)
@@ -39,23 +254,66 @@ def capture(command, name, strip_ansi, timeout):
 @click.option('--name', help='Named snapshot identifier')
 @click.option('--strip-ansi', is_flag=True, help='Strip ANSI color codes')
 @click.option('--timeout', type=int, default=30, help='Command timeout in seconds')
-def verify(command, name, strip_ansi, timeout):
+@click.option('--stream', is_flag=True, help='Compare output incrementally and stop at the first difference')
+@click.option('--no-kill', is_flag=True, help='With --stream, let the command finish after a mismatch')
+@click.option('--input', 'inputs', multiple=True, help='Input path or glob the output depends on (enables caching)')
+@click.option('--env', 'env', multiple=True, help='Environment variable the output depends on')
+@click.option('--no-cache', is_flag=True, help='Always run the command even if inputs are unchanged')
+@click.option('--input-mtime', is_flag=True, help='Fingerprint inputs by size and mtime instead of hashing their contents')
+@normalize_options
+@diff_options
+@trace_options
+@budget_options
+def verify(command, name, strip_ansi, timeout, stream, no_kill, inputs, env, no_cache, input_mtime,
+           redact, strip_trailing_whitespace, report_file, profile,
+           repeat, statistic, tolerance, max_wall, max_cpu, max_rss, **diff_opts):
     """Verify command output matches saved snapshot."""
-    manager = SnapshotManager()
+    budget = _budget(repeat, statistic, tolerance, max_wall, max_cpu, max_rss)
+    if stream and budget is not None:
+        raise click.UsageError("--stream cannot be combined with performance budgets")
     try:
-        result = manager.verify(
-            list(command),
-            name=name,
-            strip_ansi=strip_ansi,
-            timeout=timeout
-        )
-        if result['matches']:
-            click.echo("✓ Snapshot matches")
-            sys.exit(0)
-        else:
-            click.echo("✗ Snapshot mismatch\n")
-            click.echo(format_diff(result['expected'], result['actual']))
-            sys.exit(1)
+        with _tracing('verify', command, report_file, profile):
+            manager = _manager(redact, strip_trailing_whitespace)
+            if stream:
+                result = manager.verify_stream(
+                    list(command),
+                    name=name,
+                    strip_ansi=strip_ansi,
+                    timeout=timeout,
+                    kill_on_mismatch=not no_kill
+                )
+            else:
+                result = manager.verify(
+                    list(command),
+                    name=name,
+                    strip_ansi=strip_ansi,
+                    timeout=timeout,
+                    inputs=list(inputs) if inputs else None,
+                    env=list(env),
+                    use_cache=not no_cache,
+                    budget=budget,
+                    input_mtime=input_mtime
+                )
+            perf = result.get('perf')
+            over_budget = bool(perf and perf['violations'])
+            if result['matches']:
+                if result.get('cached'):
+                    click.echo("✓ Snapshot matches (cached, inputs unchanged)")
+                else:
+                    click.echo("✓ Snapshot matches")
+            else:
+                if stream:
+                    click.echo(f"✗ Snapshot mismatch at offset {result['offset']}\n")
+                else:
+                    click.echo("✗ Snapshot mismatch\n")
+                with _diff_output(diff_opts['diff_file']) as out, phase('diff'):
+                    _show_result_diff(result, out, **diff_opts)
+            if perf:
+                if over_budget:
+                    click.echo("✗ Performance budget exceeded")
+                for line in format_drift(perf):
+                    click.echo(line)
+            sys.exit(0 if result['matches'] and not over_budget else 1)
     except FileNotFoundError as e:
         click.echo(f"Error: {e}", err=True)
         click.echo("Run 'capture' first to create a snapshot.")
@@ -66,15 +324,29 @@ def verify(command, name, strip_ansi, timeout):
 
 
 @cli.command()
-@click.argument('command', nargs=-1, required=True)
+@click.argument('command', nargs=-1)
 @click.option('--name', help='Named snapshot identifier')
 @click.option('--strip-ansi', is_flag=True, help='Strip ANSI color codes')
 @click.option('--timeout', type=int, default=30, help='Command timeout in seconds')
 @click.option('--yes', is_flag=True, help='Skip confirmation prompt')
-def update(command, name, strip_ansi, timeout, yes):
+@click.option('--from-last-run', is_flag=True, help='Accept output recorded by previous failed verifies')
+@click.option('--pattern', help='Glob pattern of snapshots to accept with --from-last-run')
+@snapshot_dir_option
+@normalize_options
+@diff_options
+def update(command, name, strip_ansi, timeout, yes, from_last_run, pattern, snapshot_dir, redact,
+           strip_trailing_whitespace, **diff_opts):
     """Update existing snapshot with new output."""
-    manager = SnapshotManager()
+    if from_last_run:
+        if command:
+            raise click.UsageError("--from-last-run does not take a command")
+        _update_from_last_run(pattern, yes, snapshot_dir, diff_opts)
+        return
+    if not command:
+        raise click.UsageError("Missing argument 'COMMAND...'")
+
     try:
+        manager = _manager(redact, strip_trailing_whitespace, snapshot_dir)
         result = manager.verify(
             list(command),
             name=name,
@@ -86,16 +358,16 @@ def update(command, name, strip_ansi, timeout, yes):
             click.echo("Snapshot already matches, no update needed.")
             sys.exit(0)
         
-        click.echo(format_diff(result['expected'], result['actual']))
+        with _diff_output(diff_opts['diff_file']) as out:
+            _show_result_diff(result, out, **diff_opts)
         
+        from .formatter import prompt_update
+
         if yes or prompt_update():
-            snapshot_name = manager.update(
-                list(command),
-                name=name,
-                strip_ansi=strip_ansi,
-                timeout=timeout
-            )
-            click.echo(f"\nSnapshot updated: {snapshot_name}")
+            # Accept exactly the output shown above instead of re-running.
+            for snapshot_name, _, _ in mismatched_streams(result):
+                manager.accept_last_run(snapshot_name, command=list(command))
+            click.echo(f"\nSnapshot updated: {result['snapshot_name']}")
         else:
             click.echo("Update cancelled.")
             sys.exit(1)
@@ -104,20 +376,353 @@ def update(command, name, strip_ansi, timeout, yes):
         sys.exit(1)
 
 
+def _update_from_last_run(pattern, yes, snapshot_dir, diff_opts):
+    """Accept recorded run results without running any command."""
+    manager = SnapshotManager(snapshot_dir)
+    names = manager.last_runs(pattern)
+    if not names:
+        click.echo("No recorded runs to accept.")
+        return
+
+    updated = 0
+    try:
+        with manager.batch():
+            for snapshot_name in names:
+                if not yes:
+                    record = manager.results.load(snapshot_name)
+                    try:
+                        expected = manager.read_snapshot(snapshot_name)
+                    except FileNotFoundError:
+                        expected = ''
+                    click.echo(f"\n{snapshot_name}")
+                    structure = manager.recorded_structure(snapshot_name)
+                    with _diff_output(diff_opts['diff_file']) as out:
+                        _show_diff(expected, record['output'], out, structure=structure, **diff_opts)
+                    from .formatter import prompt_update
+                    if not prompt_update():
+                        continue
+                manager.accept_last_run(snapshot_name)
+                updated += 1
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    click.echo(f"\nUpdated {updated} of {len(names)} snapshot(s).")
+
+
 @cli.command(name='list')
 @click.option('--pattern', help='Glob pattern to filter snapshots')
-def list_snapshots(pattern):
+@click.option('--long', 'long_format', is_flag=True, help='Show size, last result, age and command')
+@click.option('--reindex', is_flag=True, help='Rebuild the snapshot index before listing')
+@click.option('--shard', callback=_shard, help='Only list shard i of n (e.g. 2/16), balanced by recorded durations')
+@click.option('--status', type=click.Choice(STATUSES), help='Only list snapshots whose last verify had this result')
+@click.option('--older-than', callback=_parsed(parse_age), help='Only list snapshots not captured or verified for this long (e.g. 7d)')
+@click.option('--min-size', callback=_parsed(parse_size), help='Only list snapshots of at least this size (e.g. 10k)')
+@click.option('--max-size', callback=_parsed(parse_size), help='Only list snapshots of at most this size (e.g. 2M)')
+@snapshot_dir_option
+def list_snapshots(pattern, long_format, reindex, shard, status, older_than, min_size, max_size, snapshot_dir):
     """List all saved snapshots."""
-    manager = SnapshotManager()
-    snapshots = manager.list_snapshots(pattern)
+    manager = SnapshotManager(snapshot_dir)
+    if reindex:
+        manager.reindex()
+    snapshots = manager.list_snapshots(
+        pattern, details=long_format, shard=shard, status=status,
+        older_than=older_than, min_size=min_size, max_size=max_size
+    )
     
     if not snapshots:
         click.echo("No snapshots found.")
         return
     
     click.echo(f"Found {len(snapshots)} snapshot(s):\n")
+    now = time.time()
     for snap in snapshots:
-        click.echo(f"  {snap}")
+        if long_format:
+            command = ' '.join(snap['command']) if snap['command'] else '-'
+            touched = last_touched(snap)
+            age = format_age(now - touched if touched else None)
+            click.echo(f"  {snap['name']}  {snap['size']:>10}  {snap['status']:<10}  {age:>4}  {command}")
+        else:
+            click.echo(f"  {snap}")
+
+
+@cli.command()
+@click.option('--dry-run', is_flag=True, help='Only list what would be deleted')
+@snapshot_dir_option
+def gc(dry_run, snapshot_dir):
+    """Delete snapshots earlier runs produced that the last complete 'run' did not touch.
+
+    Snapshots no manifest run ever resolved to, such as ones captured by
+    hand or by the pytest plugin, are left alone.
+    """
+    manager = SnapshotManager(snapshot_dir)
+    try:
+        removed = manager.gc(dry_run=dry_run)
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    verb = 'Would delete' if dry_run else 'Deleted'
+    for snapshot_name in removed['stale']:
+        click.echo(f"  {snapshot_name}")
+    click.echo(f"{verb} {len(removed['stale'])} stale snapshot(s) and "
+               f"{len(removed['orphans'])} orphaned record(s).")
+
+
+@cli.command()
+@click.option('--compress', is_flag=True, help='zlib-compress entries when it saves space')
+@click.option('--compact', is_flag=True, help='Also drop unreferenced data from an existing pack')
+@snapshot_dir_option
+def pack(compress, compact, snapshot_dir):
+    """Move snapshot files into a single packed store."""
+    manager = SnapshotManager(snapshot_dir)
+    try:
+        count = manager.pack(compress=compress)
+        click.echo(f"Packed {count} snapshot(s).")
+        if compact:
+            reclaimed = manager.store.compact()
+            click.echo(f"Compacted pack, reclaimed {reclaimed} bytes.")
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command()
+@snapshot_dir_option
+def unpack(snapshot_dir):
+    """Write packed snapshots back out as individual files."""
+    manager = SnapshotManager(snapshot_dir)
+    try:
+        count = manager.unpack()
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    click.echo(f"Unpacked {count} snapshot(s).")
+
+
+@cli.command()
+@click.option('--socket', 'socket_path', help='Socket path (default: .snapshots/.daemon.sock)')
+@click.option('--workers', type=int, default=8, show_default=True, help='Commands run concurrently')
+@click.option('--stop', is_flag=True, help='Stop the daemon listening on the socket')
+def serve(socket_path, workers, stop):
+    """Keep a warm daemon that thin clients forward capture/verify to."""
+    # Imported here: Unix socket servers do not exist on every platform.
+    from .daemon import SnapshotDaemon, daemon_running, stop_daemon
+
+    socket_path = socket_path or default_socket_path()
+    if stop:
+        if not stop_daemon(socket_path):
+            click.echo(f"No daemon running on {socket_path}", err=True)
+            sys.exit(1)
+        click.echo("Daemon stopped.")
+        return
+    if daemon_running(socket_path):
+        click.echo(f"Error: a daemon is already running on {socket_path}", err=True)
+        sys.exit(1)
+
+    Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+    try:
+        # A leftover socket from a daemon that did not exit cleanly.
+        os.unlink(socket_path)
+    except FileNotFoundError:
+        pass
+    try:
+        server = SnapshotDaemon(socket_path, workers=workers)
+    except (AttributeError, OSError) as e:
+        click.echo(f"Error: cannot listen on {socket_path}: {e}", err=True)
+        sys.exit(1)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    click.echo(f"Serving {os.getcwd()} on {socket_path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _echo_suite_result(result, out, show_diff, diff_opts):
+    """Print one manifest entry's outcome and, if asked, its diff."""
+    if result['status'] == 'passed' and result.get('cached'):
+        click.echo(f"✓ {result['name']} (cached)")
+    elif result['status'] == 'passed':
+        click.echo(f"✓ {result['name']} ({result['duration']:.2f}s)")
+    elif result['status'] == 'failed':
+        click.echo(f"✗ {result['name']} ({result['duration']:.2f}s)")
+        if show_diff:
+            _show_diff(
+                result['expected'], result['actual'], out,
+                title=result['name'], structure=result.get('structure'), **diff_opts
+            )
+            if 'stderr_expected' in result:
+                if out is None:
+                    click.echo(f"{result['name']} (stderr)")
+                _show_diff(
+                    result['stderr_expected'], result['stderr_actual'], out,
+                    title=f"{result['name']} (stderr)", **diff_opts
+                )
+    else:
+        click.echo(f"! {result['name']}: {result['error']}")
+
+
+@cli.command()
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('--jobs', '-j', type=int, help='Number of parallel workers (default: CPU count)')
+@click.option('--engine', type=click.Choice(ENGINES), default='process', show_default=True,
+              help="'async' runs every command from one event loop (for I/O-bound commands)")
+@click.option('--diff', 'show_diff', is_flag=True, help='Show diffs for mismatched snapshots')
+@click.option('--no-cache', is_flag=True, help='Run every command even if its inputs are unchanged')
+@click.option('--shard', callback=_shard, help="Only verify shard i of n (e.g. 2/16), balanced by recorded durations; record new ones with 'merge --record-durations'")
+@click.option('--results', 'results_file', type=click.Path(dir_okay=False), help="Write per-snapshot results as JSON for 'merge'")
+@diff_options
+@trace_options
+def run(manifest, jobs, engine, show_diff, no_cache, shard, results_file, report_file, profile,
+        **diff_opts):
+    """Verify every snapshot listed in a TOML/JSON manifest."""
+    try:
+        config = load_manifest(manifest)
+        if shard is not None:
+            config['snapshots'] = shard_entries(config['snapshots'], config['snapshot_dir'], *shard)
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+    show_diff = show_diff or diff_opts['diff_stat'] or diff_opts['diff_file'] is not None
+    trace = bool(report_file or profile)
+    started = time.time()
+    start = time.perf_counter()
+    results = []
+    records = []
+    with _diff_output(diff_opts['diff_file']) as out:
+        for result in run_suite(
+            config['snapshots'],
+            snapshot_dir=config['snapshot_dir'],
+            jobs=jobs,
+            include_output=show_diff,
+            normalize=config['normalize'],
+            use_cache=not no_cache,
+            engine=engine,
+            trace=trace,
+            record_durations=shard is None
+        ):
+            results.append(result)
+            record = result.pop('trace', None)
+            if record is not None:
+                records.append(record)
+            with phase('diff', record):
+                _echo_suite_result(result, out, show_diff, diff_opts)
+
+    if diff_opts['diff_file'] and not diff_opts['diff_stat']:
+        click.echo(f"\nDiffs written to {diff_opts['diff_file']}")
+    summary = summarize(results, time.perf_counter() - start)
+    if shard is None:
+        # Only a run over the whole manifest says what 'gc' may delete.
+        SnapshotManager(config['snapshot_dir']).mark_suite_run(
+            started, [result['name'] for result in results]
+        )
+    click.echo(
+        f"\n{summary['passed']} passed, {summary['failed']} failed, "
+        f"{summary['errors']} errors in {summary['duration']:.2f}s"
+    )
+    if summary['cached']:
+        click.echo(
+            f"Cache: {summary['cached']} of {summary['total']} skipped "
+            f"({summary['cached'] / summary['total']:.0%} hit rate)"
+        )
+    if trace:
+        _write_report(build_report(records, summary['duration']), report_file, profile)
+    if results_file:
+        with open(results_file, 'w', encoding='utf-8') as f:
+            json.dump(results_document(results, summary, shard, config['snapshot_dir']), f, indent=2)
+    sys.exit(0 if summary['success'] else 1)
+
+
+@cli.command()
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('--jobs', '-j', type=int, help='Maximum commands running at once')
+@click.option('--debounce', type=float, default=0.1, show_default=True, help='Seconds of quiet before re-verifying after a change')
+@click.option('--poll', is_flag=True, help='Poll for changes instead of using inotify')
+@click.option('--poll-interval', type=float, default=0.5, show_default=True, help='Seconds between polls')
+@click.option('--no-initial', is_flag=True, help='Do not verify everything once at startup')
+@diff_options
+def watch(manifest, jobs, debounce, poll, poll_interval, no_initial, **diff_opts):
+    """Re-verify snapshots whenever their declared inputs change."""
+    # The watcher runs on asyncio; keep it off every other command's import path.
+    from .watch import awatch
+
+    try:
+        config = load_manifest(manifest)
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    unwatched = [entry.get('name') or ' '.join(entry['command'])
+                 for entry in config['snapshots'] if not entry['inputs']]
+    if unwatched:
+        click.echo(f"Not watched (no inputs declared): {', '.join(unwatched)}")
+    click.echo("Watching for changes. Press Ctrl+C to stop.")
+
+    events = awatch(
+        config['snapshots'],
+        snapshot_dir=config['snapshot_dir'],
+        jobs=jobs,
+        normalize=config['normalize'],
+        debounce=debounce,
+        backend='poll' if poll else 'auto',
+        poll_interval=poll_interval,
+        initial=not no_initial
+    )
+    try:
+        with _diff_output(diff_opts['diff_file']) as out:
+            for kind, payload in drive(events):
+                if kind == 'changed':
+                    click.echo(f"\nChanged inputs: {', '.join(payload)}")
+                elif kind == 'cancelled':
+                    click.echo(f"… {payload} (restarted, inputs changed again)")
+                else:
+                    _echo_suite_result(payload, out, True, diff_opts)
+                    if out is not None:
+                        out.flush()
+    except KeyboardInterrupt:
+        click.echo("\nStopped watching.")
+
+
+@cli.command()
+@click.argument('results_files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the combined results as JSON')
+@click.option('--record-durations', is_flag=True, help='Save the shards\' durations for balancing the next split')
+@click.option('--snapshot-dir', type=click.Path(file_okay=False),
+              help='Where to save durations (default: the directory the shards ran against)')
+def merge(results_files, output, record_durations, snapshot_dir):
+    """Combine the --results files of sharded runs into one report."""
+    try:
+        documents = [json.loads(Path(path).read_text(encoding='utf-8')) for path in results_files]
+    except (OSError, ValueError) as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    merged = merge_documents(documents)
+    results = merged['results']
+    for result in results:
+        if result['status'] == 'failed':
+            click.echo(f"✗ {result['name']}")
+        elif result['status'] == 'error':
+            click.echo(f"! {result['name']}: {result.get('error')}")
+    for problem in merged['problems']:
+        click.echo(f"Error: {problem}", err=True)
+
+    snapshot_dir = snapshot_dir or merged['snapshot_dir'] or '.snapshots'
+    if record_durations:
+        manager = SnapshotManager(snapshot_dir)
+        for result in results:
+            if result['status'] != 'error' and not result.get('cached'):
+                manager.durations.record(result['name'], result['duration'])
+
+    summary = summarize(results, merged['duration'])
+    click.echo(
+        f"\n{summary['passed']} passed, {summary['failed']} failed, "
+        f"{summary['errors']} errors across {len(documents)} shard(s) in {summary['duration']:.2f}s"
+    )
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results_document(results, summary, snapshot_dir=snapshot_dir), f, indent=2)
+    sys.exit(0 if summary['success'] and not merged['problems'] else 1)
 
 
 def main():
@@ -0,0 +1,226 @@
+"""Fast-path command-line entry point.
+
+Plain capture/verify invocations are parsed here without importing click,
+then forwarded to ``assert-snapshot serve`` if a daemon answers or run
+in-process otherwise. Diff rendering (colorama, difflib) is only imported
+on a mismatch. Anything this module does not understand falls through to
+the full click CLI.
+"""
+
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+SOCKET_ENV = 'ASSERT_SNAPSHOT_SOCKET'
+NO_DAEMON_ENV = 'ASSERT_SNAPSHOT_NO_DAEMON'
+SOCKET_FILENAME = '.daemon.sock'
+
+_VALUE_OPTIONS = {'--name': 'name', '--timeout': 'timeout', '--input': 'inputs',
+                  '--env': 'env', '--redact': 'redact'}
+_FLAG_OPTIONS = {'--strip-ansi': 'strip_ansi', '--no-cache': 'no_cache',
+                 '--input-mtime': 'input_mtime',
+                 '--strip-trailing-whitespace': 'strip_trailing_whitespace'}
+_FORWARDED = {
+    'capture': {'--name', '--timeout', '--redact', '--strip-ansi',
+                '--strip-trailing-whitespace'},
+    'verify': set(_VALUE_OPTIONS) | set(_FLAG_OPTIONS),
+}
+
+
+def _encode_bytes(value: Any) -> Dict[str, str]:
+    # Binary snapshot contents travel as base64; see ``decode_message``.
+    if isinstance(value, bytes):
+        import base64
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_bytes(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and '__bytes__' in obj:
+        import base64
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """Serialize a request or response as one JSON line; bytes values survive."""
+    return json.dumps(message, default=_encode_bytes).encode('utf-8') + b'\n'
+
+
+def decode_message(line: bytes) -> Dict[str, Any]:
+    return json.loads(line, object_hook=_decode_bytes)
+
+
+def default_socket_path(snapshot_dir: str = '.snapshots') -> str:
+    return os.environ.get(SOCKET_ENV) or os.path.join(snapshot_dir, SOCKET_FILENAME)
+
+
+def request(payload: Dict[str, Any], socket_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Send one request to the daemon; returns None if no daemon answers."""
+    socket_path = socket_path or default_socket_path()
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(encode_message(payload))
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+    return decode_message(line)
+
+
+def parse_args(argv: List[str]) -> Optional[Dict[str, Any]]:
+    """Parse the subset of capture/verify arguments the daemon understands.
+
+    Returns None for anything else (other commands, --help, diff options,
+    malformed input) so click can handle it with its usual messages.
+    """
+    if not argv or argv[0] not in _FORWARDED:
+        return None
+    allowed = _FORWARDED[argv[0]]
+    options: Dict[str, Any] = {'inputs': [], 'env': [], 'redact': []}
+    command: List[str] = []
+    args = iter(argv[1:])
+    for arg in args:
+        if arg == '--':
+            command.extend(args)
+            break
+        if not arg.startswith('-') or arg == '-':
+            command.append(arg)
+            continue
+        option, has_value, value = arg.partition('=')
+        if option not in allowed:
+            return None
+        if option in _FLAG_OPTIONS:
+            if has_value:
+                return None
+            options[_FLAG_OPTIONS[option]] = True
+            continue
+        if not has_value:
+            value = next(args, None)
+            if value is None:
+                return None
+        key = _VALUE_OPTIONS[option]
+        if isinstance(options.get(key), list):
+            options[key].append(value)
+        else:
+            options[key] = value
+    if not command:
+        return None
+    try:
+        timeout = int(options.get('timeout', 30))
+    except ValueError:
+        return None
+
+    params = {
+        'command': command,
+        'name': options.get('name'),
+        'strip_ansi': options.get('strip_ansi', False),
+        'timeout': timeout,
+    }
+    if argv[0] == 'verify':
+        params['inputs'] = options['inputs'] or None
+        params['env'] = options['env']
+        params['use_cache'] = not options.get('no_cache', False)
+        params['input_mtime'] = options.get('input_mtime', False)
+    return {
+        'op': argv[0],
+        'params': params,
+        'normalize': {
+            'redact': options['redact'],
+            'strip_trailing_whitespace': options.get('strip_trailing_whitespace', False),
+        },
+        'cwd': os.getcwd(),
+        'environ': dict(os.environ),
+    }
+
+
+def execute(manager, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a parsed capture/verify request and wrap the outcome as a response."""
+    params = payload['params']
+    try:
+        if payload['op'] == 'capture':
+            return {'ok': True, 'result': {'snapshot_name': manager.capture(**params)}}
+        return {'ok': True, 'result': manager.verify(**params)}
+    except Exception as e:
+        return {'ok': False, 'error': str(e), 'type': type(e).__name__}
+
+
+def run_local(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from .snapshot import SnapshotManager
+
+    try:
+        manager = SnapshotManager(**payload['normalize'])
+    except Exception as e:
+        return {'ok': False, 'error': str(e), 'type': type(e).__name__}
+    return execute(manager, payload)
+
+
+def _report(op: str, response: Dict[str, Any]) -> int:
+    """Print a daemon response the way the CLI would; returns the exit code."""
+    if not response.get('ok'):
+        print(f"Error: {response['error']}", file=sys.stderr)
+        if op == 'verify' and response.get('type') == 'FileNotFoundError':
+            print("Run 'capture' first to create a snapshot.")
+        return 1
+    result = response['result']
+    if op == 'capture':
+        print(f"Snapshot saved: {result['snapshot_name']}")
+        return 0
+    if result['matches']:
+        if result.get('cached'):
+            print("✓ Snapshot matches (cached, inputs unchanged)")
+        else:
+            print("✓ Snapshot matches")
+        return 0
+    print("✗ Snapshot mismatch\n")
+    # Only mismatches pay for the diff machinery.
+    from .formatter import iter_diff, write_diff
+    structure = result.get('structure')
+    if 'stderr' not in result:
+        write_diff(iter_diff(result['expected'], result['actual'], structure=structure))
+        return 1
+    from .snapshot import mismatched_streams
+    for snapshot_name, expected, actual in mismatched_streams(result):
+        print(snapshot_name)
+        write_diff(iter_diff(
+            expected, actual,
+            structure=structure if snapshot_name == result['snapshot_name'] else None
+        ))
+    return 1
+
+
+def forward(argv: List[str]) -> Optional[int]:
+    """Run a capture/verify through the daemon; None means run it in-process."""
+    if os.environ.get(NO_DAEMON_ENV):
+        return None
+    payload = parse_args(argv)
+    if payload is None:
+        return None
+    response = request(payload)
+    if response is None or response.get('fallback'):
+        return None
+    return _report(payload['op'], response)
+
+
+def main():
+    argv = sys.argv[1:]
+    code = forward(argv)
+    if code is None:
+        payload = parse_args(argv)
+        if payload is not None:
+            code = _report(payload['op'], run_local(payload))
+    if code is not None:
+        sys.exit(code)
+    from .cli import main as cli_main
+    cli_main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Resident daemon that answers capture/verify requests over a Unix socket."""
+
+import copy
+import json
+import os
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from .client import decode_message, encode_message, execute, request
+from .snapshot import SnapshotManager
+
+DEFAULT_WORKERS = 8
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one JSON response line out."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            payload = decode_message(line)
+        except ValueError as e:
+            response = {'ok': False, 'error': f"Malformed request: {e}", 'type': 'ValueError'}
+        else:
+            response = self.server.dispatch(payload)
+        self.wfile.write(encode_message(response))
+
+
+class SnapshotDaemon(socketserver.UnixStreamServer):
+    """Serve capture/verify for the snapshot directory of the current directory.
+
+    Managers (with their loaded index and compiled normalizers) are kept per
+    normalization setting and shared across requests; each request runs its
+    command with the client's environment on a fixed pool of worker threads.
+    Requests from another working directory are answered with ``fallback``
+    so the client runs them itself.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        snapshot_dir: str = '.snapshots',
+        workers: int = DEFAULT_WORKERS
+    ):
+        self.socket_path = socket_path
+        self.snapshot_dir = snapshot_dir
+        self.cwd = os.getcwd()
+        self._managers: Dict[str, SnapshotManager] = {}
+        self._managers_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        super().__init__(socket_path, _RequestHandler)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    def _manager(self, normalize: Optional[Dict[str, Any]], environ: Dict[str, str]) -> SnapshotManager:
+        key = json.dumps(normalize, sort_keys=True)
+        with self._managers_lock:
+            manager = self._managers.get(key)
+            if manager is None:
+                manager = self._managers[key] = SnapshotManager(
+                    self.snapshot_dir, **(normalize or {})
+                )
+        # Share the index, store and normalizers; only the environment differs.
+        client = copy.copy(manager)
+        client.environ = environ
+        return client
+
+    def dispatch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        op = payload.get('op')
+        if op == 'ping':
+            return {'ok': True, 'pid': os.getpid(), 'cwd': self.cwd}
+        if op == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}
+        if op not in ('capture', 'verify'):
+            return {'ok': False, 'error': f"Unknown request: {op}", 'type': 'ValueError'}
+        if payload.get('cwd') != self.cwd:
+            return {'fallback': True, 'error': f"Daemon serves {self.cwd}"}
+
+        try:
+            manager = self._manager(payload.get('normalize'), payload.get('environ') or dict(os.environ))
+        except Exception as e:
+            return {'ok': False, 'error': str(e), 'type': type(e).__name__}
+        return execute(manager, payload)
+
+
+def daemon_running(socket_path: str) -> bool:
+    response = request({'op': 'ping'}, socket_path)
+    return bool(response and response.get('ok'))
+
+
+def stop_daemon(socket_path: str) -> bool:
+    """Ask the daemon on ``socket_path`` to exit; returns False if none answered."""
+    response = request({'op': 'shutdown'}, socket_path)
+    return bool(response and response.get('ok'))
@@ -0,0 +1,324 @@
+"""Line diff engines used to render snapshot mismatches."""
+
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+Opcode = Tuple[str, int, int, int, int]
+
+DIFF_ALGORITHMS = ('auto', 'myers', 'difflib', 'summary')
+
+# Above this many lines (expected + actual) only a summary is produced.
+SUMMARY_THRESHOLD_LINES = 200_000
+
+# In auto mode Myers gives up after this many edits (its trace is O(D^2)
+# in memory) and difflib computes the diff instead.
+MAX_EDIT_COST = 2000
+
+
+class DiffTooExpensive(Exception):
+    """Raised when a diff would exceed the configured edit budget."""
+
+
+def _difflib_opcodes(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    import difflib
+    return difflib.SequenceMatcher(None, a, b).get_opcodes()
+
+
+def _intern_lines(a: Sequence[str], b: Sequence[str]) -> Tuple[List[int], List[int]]:
+    """Map lines to small integers so comparisons are int compares."""
+    ids: Dict[str, int] = {}
+    a_ids = [ids.setdefault(line, len(ids)) for line in a]
+    b_ids = [ids.setdefault(line, len(ids)) for line in b]
+    return a_ids, b_ids
+
+
+def _myers_script(a: List[int], b: List[int], max_cost: Optional[int]) -> List[str]:
+    """Return the shortest edit script as 'e'/'d'/'i' steps (Myers, O(ND))."""
+    n, m = len(a), len(b)
+    max_d = n + m if max_cost is None else min(n + m, max_cost)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+
+    for d in range(max_d + 1):
+        trace.append(v[offset - d:offset + d + 1])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    raise DiffTooExpensive(f"more than {max_d} edits")
+
+
+def _backtrack(trace: List[List[int]], x: int, y: int) -> List[str]:
+    steps = []
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1 + d] < v[k + 1 + d]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k + d]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            steps.append('e')
+            x -= 1
+            y -= 1
+        steps.append('i' if x == prev_x else 'd')
+        x, y = prev_x, prev_y
+    steps.extend('e' * x)
+    steps.reverse()
+    return steps
+
+
+def _script_to_opcodes(steps: List[str], i: int = 0, j: int = 0) -> List[Opcode]:
+    opcodes = []
+    pos = 0
+    while pos < len(steps):
+        i1, j1 = i, j
+        if steps[pos] == 'e':
+            while pos < len(steps) and steps[pos] == 'e':
+                i += 1
+                j += 1
+                pos += 1
+            opcodes.append(('equal', i1, i, j1, j))
+            continue
+        while pos < len(steps) and steps[pos] != 'e':
+            if steps[pos] == 'd':
+                i += 1
+            else:
+                j += 1
+            pos += 1
+        if i > i1 and j > j1:
+            tag = 'replace'
+        elif i > i1:
+            tag = 'delete'
+        else:
+            tag = 'insert'
+        opcodes.append((tag, i1, i, j1, j))
+    return opcodes
+
+
+def myers_opcodes(
+    a: Sequence[str],
+    b: Sequence[str],
+    max_cost: Optional[int] = MAX_EDIT_COST
+) -> List[Opcode]:
+    """Compute SequenceMatcher-style opcodes with the Myers O(ND) algorithm.
+
+    Common leading and trailing lines are trimmed first, so the cost is
+    driven by the size of the differing region rather than the whole output.
+    """
+    a_ids, b_ids = _intern_lines(a, b)
+    prefix = 0
+    limit = min(len(a_ids), len(b_ids))
+    while prefix < limit and a_ids[prefix] == b_ids[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < limit - prefix
+           and a_ids[len(a_ids) - 1 - suffix] == b_ids[len(b_ids) - 1 - suffix]):
+        suffix += 1
+
+    middle_a = a_ids[prefix:len(a_ids) - suffix]
+    middle_b = b_ids[prefix:len(b_ids) - suffix]
+    steps = ['e'] * prefix
+    steps.extend(_myers_script(middle_a, middle_b, max_cost))
+    steps.extend('e' * suffix)
+    return _script_to_opcodes(steps)
+
+
+def _unbounded_myers_opcodes(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """Myers without an edit budget, for when it was asked for by name."""
+    return myers_opcodes(a, b, max_cost=None)
+
+
+DIFF_BACKENDS: Dict[str, Callable[[Sequence[str], Sequence[str]], List[Opcode]]] = {
+    'difflib': _difflib_opcodes,
+    'myers': _unbounded_myers_opcodes,
+}
+
+
+def register_backend(
+    name: str,
+    backend: Callable[[Sequence[str], Sequence[str]], List[Opcode]]
+) -> None:
+    """Register a diff backend returning SequenceMatcher-style opcodes."""
+    DIFF_BACKENDS[name] = backend
+
+
+def _group_opcodes(codes: List[Opcode], n: int = 3) -> Iterator[List[Opcode]]:
+    """Split opcodes into hunks with ``n`` lines of context (as difflib does)."""
+    if not codes:
+        codes = [('equal', 0, 1, 0, 1)]
+    codes = list(codes)
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    nn = n + n
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == 'equal' and i2 - i1 > nn:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f'{beginning}'
+    if not length:
+        beginning -= 1
+    return f'{beginning},{length}'
+
+
+def _unified_lines(
+    a: Sequence[str],
+    b: Sequence[str],
+    opcodes: List[Opcode],
+    fromfile: str,
+    tofile: str,
+    n: int
+) -> Iterator[str]:
+    started = False
+    for group in _group_opcodes(opcodes, n):
+        if not started:
+            started = True
+            yield f'--- {fromfile}'
+            yield f'+++ {tofile}'
+        first, last = group[0], group[-1]
+        yield f'@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@'
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                continue
+            if tag in ('replace', 'delete'):
+                for line in a[i1:i2]:
+                    yield '-' + line
+            if tag in ('replace', 'insert'):
+                for line in b[j1:j2]:
+                    yield '+' + line
+
+
+def summary_diff(
+    a: Sequence[str],
+    b: Sequence[str],
+    fromfile: str = 'expected',
+    tofile: str = 'actual'
+) -> Iterator[str]:
+    """Summarize a large diff in linear time: first difference and line counts."""
+    first = next(
+        (i for i, (x, y) in enumerate(zip(a, b)) if x != y),
+        min(len(a), len(b))
+    )
+    if first == len(a) == len(b):
+        return
+    expected_counts = Counter(a)
+    actual_counts = Counter(b)
+    removed = sum((expected_counts - actual_counts).values())
+    added = sum((actual_counts - expected_counts).values())
+
+    yield f'--- {fromfile}'
+    yield f'+++ {tofile}'
+    yield f'@@ summary: {len(a)} expected lines, {len(b)} actual lines @@'
+    yield f' first difference at line {first + 1}:'
+    if first < len(a):
+        yield '-' + a[first]
+    if first < len(b):
+        yield '+' + b[first]
+    yield f' {added} line(s) added, {removed} line(s) removed'
+
+
+def _select_opcodes(
+    a: Sequence[str],
+    b: Sequence[str],
+    algorithm: str
+) -> Optional[List[Opcode]]:
+    """Run the chosen backend; None means only a summary should be shown."""
+    if algorithm == 'summary' or (
+        algorithm == 'auto' and len(a) + len(b) > SUMMARY_THRESHOLD_LINES
+    ):
+        return None
+    if algorithm == 'auto':
+        try:
+            return myers_opcodes(a, b, MAX_EDIT_COST)
+        except DiffTooExpensive:
+            return _difflib_opcodes(a, b)
+
+    try:
+        backend = DIFF_BACKENDS[algorithm]
+    except KeyError:
+        raise ValueError(f"Unknown diff algorithm: {algorithm}")
+    try:
+        return backend(a, b)
+    except DiffTooExpensive:
+        return None
+
+
+def unified_diff(
+    a: Sequence[str],
+    b: Sequence[str],
+    fromfile: str = 'expected',
+    tofile: str = 'actual',
+    n: int = 3,
+    algorithm: str = 'auto'
+) -> Iterator[str]:
+    """Yield unified diff lines (without line terminators) for two line lists.
+
+    ``algorithm`` names a registered backend, ``'summary'``, or ``'auto'``,
+    which uses Myers and switches to difflib for diffs needing more than
+    ``MAX_EDIT_COST`` edits. Only inputs of more than
+    ``SUMMARY_THRESHOLD_LINES`` lines in auto mode, or a backend raising
+    DiffTooExpensive, produce a summary instead of a full diff.
+    """
+    opcodes = _select_opcodes(a, b, algorithm)
+    if opcodes is None:
+        return summary_diff(a, b, fromfile, tofile)
+    return _unified_lines(a, b, opcodes, fromfile, tofile, n)
+
+
+def diff_stat(
+    a: Sequence[str],
+    b: Sequence[str],
+    n: int = 3,
+    algorithm: str = 'auto'
+) -> Dict[str, Optional[int]]:
+    """Count inserted and deleted lines and hunks without rendering the diff.
+
+    When only a summary is available the counts come from comparing line
+    multisets and ``hunks`` is None.
+    """
+    opcodes = _select_opcodes(a, b, algorithm)
+    if opcodes is None:
+        expected_counts = Counter(a)
+        actual_counts = Counter(b)
+        return {
+            'insertions': sum((actual_counts - expected_counts).values()),
+            'deletions': sum((expected_counts - actual_counts).values()),
+            'hunks': None,
+        }
+    insertions = deletions = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag != 'equal':
+            deletions += i2 - i1
+            insertions += j2 - j1
+    hunks = sum(1 for _ in _group_opcodes(opcodes, n)) if insertions or deletions else 0
+    return {'insertions': insertions, 'deletions': deletions, 'hunks': hunks}
@@ -0,0 +1,83 @@
+"""Fingerprints of a command's inputs used to skip unchanged verifications."""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+_READ_SIZE = 1024 * 1024
+
+
+def expand_inputs(inputs: Iterable[str]) -> List[str]:
+    """Expand input paths and globs into a sorted list of files.
+
+    Directories contribute every file beneath them. Patterns that match
+    nothing are kept as-is so a missing input changes the fingerprint.
+    """
+    files = set()
+    for pattern in inputs:
+        matches = glob.glob(pattern, recursive=True) or [pattern]
+        for path in matches:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.update(os.path.join(root, name) for name in names)
+            else:
+                files.add(path)
+    return sorted(files)
+
+
+def _file_digest(path: str, use_mtime: bool) -> Optional[str]:
+    try:
+        if use_mtime:
+            stat = os.stat(path)
+            return f"{stat.st_size}:{stat.st_mtime_ns}"
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_READ_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
+def _executable_stamp(program: str, search_path: Optional[str] = None) -> Optional[str]:
+    """Identify the executable by resolved path, size and mtime."""
+    path = shutil.which(program, path=search_path) or program
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def compute_fingerprint(
+    command: List[str],
+    inputs: Iterable[str] = (),
+    env: Iterable[str] = (),
+    normalize: Optional[Dict[str, Any]] = None,
+    use_mtime: bool = False,
+    environ: Optional[Mapping[str, str]] = None
+) -> str:
+    """Hash everything a command's output is declared to depend on.
+
+    Covers the executable, arguments, working directory, the values of the
+    allowlisted environment variables, the normalization settings and the
+    contents (or, with ``use_mtime``, the size and mtime) of input files.
+    Variables and ``PATH`` come from ``environ``, defaulting to ``os.environ``.
+    """
+    if environ is None:
+        environ = os.environ
+    payload = {
+        'argv': list(command),
+        'executable': _executable_stamp(command[0], environ.get('PATH')) if command else None,
+        'cwd': os.getcwd(),
+        'env': {name: environ.get(name) for name in sorted(env)},
+        'normalize': normalize,
+        'inputs': [
+            [path, _file_digest(path, use_mtime)] for path in expand_inputs(inputs)
+        ],
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
@@ -1,36 +1,208 @@
 """Colored diff output formatting and interactive prompts."""
 
-import difflib
+import sys
+from collections import Counter
+from typing import Iterable, Iterator, Optional, TextIO, Tuple, Union
+
 from colorama import Fore, Style, init
 
+from .diff import DIFF_ALGORITHMS, diff_stat, unified_diff
+
 init(autoreset=True)
 
+BINARY_STYLES = ('escaped', 'hex')
 
-def format_diff(expected: str, actual: str) -> str:
-    """Generate colored unified diff output."""
-    expected_lines = expected.splitlines(keepends=True)
-    actual_lines = actual.splitlines(keepends=True)
-    
-    diff = difflib.unified_diff(
-        expected_lines,
-        actual_lines,
-        fromfile='expected',
-        tofile='actual',
-        lineterm=''
+# Bytes per line of a hex dump.
+HEX_WIDTH = 16
+
+# Control characters other than newline and tab, shown as escapes.
+_CONTROL = {code: f'\\x{code:02x}' for code in (*range(0x20), 0x7f) if code not in (0x09, 0x0a)}
+
+
+def render_bytes(data: bytes, style: str = 'escaped') -> str:
+    """Render binary output as text so it can be diffed line by line.
+
+    ``escaped`` keeps valid UTF-8 readable and shows invalid bytes and
+    control characters as ``\\xNN``; ``hex`` is an ``xxd``-style dump with
+    offsets, hex bytes and their printable ASCII.
+    """
+    if style == 'escaped':
+        return data.decode('utf-8', 'backslashreplace').translate(_CONTROL)
+    if style != 'hex':
+        raise ValueError(f"Unknown binary diff style: {style}")
+    lines = []
+    for offset in range(0, len(data), HEX_WIDTH):
+        row = data[offset:offset + HEX_WIDTH]
+        hex_bytes = ' '.join(row[i:i + 2].hex() for i in range(0, len(row), 2))
+        ascii_text = ''.join(chr(b) if 0x20 <= b < 0x7f else '.' for b in row)
+        lines.append(f"{offset:08x}: {hex_bytes:<39}  {ascii_text}\n")
+    return ''.join(lines)
+
+
+def _as_text(
+    expected: Union[str, bytes],
+    actual: Union[str, bytes],
+    binary_style: str
+) -> Tuple[str, str]:
+    """Render both sides with ``render_bytes`` if either is binary."""
+    if not isinstance(expected, bytes) and not isinstance(actual, bytes):
+        return expected, actual
+    return tuple(
+        render_bytes(side if isinstance(side, bytes) else side.encode('utf-8'), binary_style)
+        for side in (expected, actual)
     )
+
+
+def _structural_lines(expected: str, actual: str, structure: str) -> Optional[Iterator[str]]:
+    """Diff structured output by path; None if either side does not parse.
+
+    Each differing path is a hunk: its ``@@`` header names the path,
+    followed by the removed and/or added value.
+    """
+    from .structured import render_value, structural_diff
+
+    try:
+        changes = structural_diff(expected, actual, structure)
+    except ValueError:
+        return None
+
+    def lines():
+        started = False
+        for op, path, old, new in changes:
+            if not started:
+                started = True
+                yield '--- expected'
+                yield '+++ actual'
+            yield f'@@ {path} @@'
+            if op != '+':
+                yield '-' + render_value(old)
+            if op != '-':
+                yield '+' + render_value(new)
+    return lines()
+
+
+def _colorize(line: str) -> str:
+    if line.startswith('+') and not line.startswith('+++'):
+        return Fore.GREEN + line + Style.RESET_ALL
+    elif line.startswith('-') and not line.startswith('---'):
+        return Fore.RED + line + Style.RESET_ALL
+    elif line.startswith('@@'):
+        return Fore.CYAN + line + Style.RESET_ALL
+    return line
+
+
+def iter_diff(
+    expected: Union[str, bytes],
+    actual: Union[str, bytes],
+    algorithm: str = 'auto',
+    max_lines: Optional[int] = None,
+    max_hunks: Optional[int] = None,
+    color: bool = True,
+    binary_style: str = 'escaped',
+    structure: Optional[str] = None
+) -> Iterator[str]:
+    """Yield colored unified diff lines as they are produced.
+
+    Output stops after ``max_lines`` lines or ``max_hunks`` hunks, ending
+    with a note saying the diff was truncated. Binary output is rendered
+    with ``render_bytes`` in ``binary_style`` first. Output of a
+    ``structure`` is diffed by path instead of by line when both sides parse.
+    """
+    diff = None
+    if structure and isinstance(expected, str) and isinstance(actual, str):
+        diff = _structural_lines(expected, actual, structure)
+    if diff is None:
+        expected, actual = _as_text(expected, actual, binary_style)
+        diff = unified_diff(
+            expected.splitlines(keepends=True),
+            actual.splitlines(keepends=True),
+            fromfile='expected',
+            tofile='actual',
+            algorithm=algorithm
+        )
     
-    colored_lines = []
+    emitted = 0
+    hunks = 0
     for line in diff:
-        if line.startswith('+') and not line.startswith('+++'):
-            colored_lines.append(Fore.GREEN + line + Style.RESET_ALL)
-        elif line.startswith('-') and not line.startswith('---'):
-            colored_lines.append(Fore.RED + line + Style.RESET_ALL)
-        elif line.startswith('@@'):
-            colored_lines.append(Fore.CYAN + line + Style.RESET_ALL)
-        else:
-            colored_lines.append(line)
-    
-    return '\n'.join(colored_lines)
+        if line.startswith('@@'):
+            hunks += 1
+            if max_hunks is not None and hunks > max_hunks:
+                yield _truncated(f"{max_hunks} hunk(s)", color)
+                return
+        if max_lines is not None and emitted >= max_lines:
+            yield _truncated(f"{max_lines} line(s)", color)
+            return
+        yield _colorize(line) if color else line
+        emitted += 1
+
+
+def _truncated(limit: str, color: bool) -> str:
+    note = f"... diff truncated after {limit}"
+    return Fore.YELLOW + note + Style.RESET_ALL if color else note
+
+
+def format_diff(
+    expected: str,
+    actual: str,
+    algorithm: str = 'auto',
+    max_lines: Optional[int] = None,
+    max_hunks: Optional[int] = None
+) -> str:
+    """Generate colored unified diff output."""
+    return '\n'.join(iter_diff(expected, actual, algorithm, max_lines, max_hunks))
+
+
+def write_diff(lines: Iterable[str], stream: Optional[TextIO] = None) -> int:
+    """Write diff lines to a stream as they are produced; returns the line count."""
+    stream = stream or sys.stdout
+    count = 0
+    for line in lines:
+        stream.write(line + '\n')
+        if line.startswith(Fore.CYAN + '@@') or line.startswith('@@'):
+            stream.flush()
+        count += 1
+    stream.flush()
+    return count
+
+
+def format_diff_stat(
+    expected: Union[str, bytes],
+    actual: Union[str, bytes],
+    algorithm: str = 'auto',
+    binary_style: str = 'escaped',
+    structure: Optional[str] = None
+) -> str:
+    """Summarize a diff as insertion, deletion and hunk counts.
+
+    Structured output is summarized as counts of changed, added and
+    removed paths instead.
+    """
+    if structure and isinstance(expected, str) and isinstance(actual, str):
+        from .structured import structural_diff
+
+        try:
+            ops = Counter(op for op, _, _, _ in structural_diff(expected, actual, structure))
+        except ValueError:
+            ops = None
+        if ops is not None:
+            return (
+                f"{ops['~']} path(s) changed, "
+                f"{Fore.GREEN}{ops['+']} added(+){Style.RESET_ALL}, "
+                f"{Fore.RED}{ops['-']} removed(-){Style.RESET_ALL}"
+            )
+    expected, actual = _as_text(expected, actual, binary_style)
+    stat = diff_stat(
+        expected.splitlines(keepends=True),
+        actual.splitlines(keepends=True),
+        algorithm=algorithm
+    )
+    text = (
+        f"{Fore.GREEN}{stat['insertions']} insertion(s)(+){Style.RESET_ALL}, "
+        f"{Fore.RED}{stat['deletions']} deletion(s)(-){Style.RESET_ALL}"
+    )
+    if stat['hunks'] is not None:
+        text += f" in {stat['hunks']} hunk(s)"
+    return text
 
 
 def prompt_update() -> bool:
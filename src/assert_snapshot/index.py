@@ -0,0 +1,180 @@
+"""Sidecar index of snapshot digests and metadata."""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .atomic import DirectoryLock, SyncPolicy, atomic_write
+
+INDEX_VERSION = 3
+SHARD_COUNT = 256
+
+
+def content_digest(text: str) -> str:
+    """Return the hex SHA-256 digest of snapshot content."""
+    return bytes_digest(text.encode('utf-8'))
+
+
+def bytes_digest(data: bytes) -> str:
+    """Return the hex SHA-256 digest of snapshot content stored as raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def shard_of(name: str) -> str:
+    """Return the shard key (two hex digits) a record name is kept under."""
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()[:2]
+
+
+class ShardedRecords:
+    """JSON records keyed by name, spread over ``SHARD_COUNT`` files by name hash.
+
+    Reading or writing one record touches only its shard (``<root>/<xx>.json``),
+    so the cost of a get or set stays flat as the number of records grows,
+    while the number of files stays bounded. With ``cache`` shards are kept
+    once read and ``refresh`` drops them so changes made by other processes
+    are seen; otherwise every read goes to disk. Writes re-read the shard
+    under ``lock`` (by default one in ``root``) and replace it atomically.
+    """
+
+    def __init__(self, root: Path, lock: Optional[DirectoryLock] = None,
+                 sync: Optional[SyncPolicy] = None, version: int = INDEX_VERSION,
+                 cache: bool = True):
+        self.root = Path(root)
+        self.lock = lock or DirectoryLock(self.root)
+        self.sync = sync
+        self.version = version
+        self.cache = cache
+        self._shards: Dict[str, Dict[str, Any]] = {}
+
+    def exists(self) -> bool:
+        return self.root.is_dir()
+
+    def refresh(self) -> None:
+        """Forget cached shards; the next read sees what other processes wrote."""
+        self._shards.clear()
+
+    def _path(self, shard: str) -> Path:
+        return self.root / f'{shard}.json'
+
+    def _read(self, shard: str) -> Dict[str, Any]:
+        try:
+            data = json.loads(self._path(shard).read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            return {}
+        return data.get('records', {})
+
+    def _write(self, shard: str, records: Dict[str, Any]) -> None:
+        path = self._path(shard)
+        if records:
+            data = json.dumps({'version': self.version, 'records': records}, sort_keys=True)
+            atomic_write(path, data.encode('utf-8'), self.sync)
+        else:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        if self.cache:
+            self._shards[shard] = records
+
+    def _shard(self, shard: str) -> Dict[str, Any]:
+        records = self._shards.get(shard)
+        if records is None:
+            records = self._read(shard)
+            if self.cache:
+                self._shards[shard] = records
+        return records
+
+    def _shard_keys(self) -> List[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(p.stem for p in self.root.glob('??.json'))
+
+    def get(self, name: str) -> Any:
+        """Return the record stored under ``name``, if any."""
+        return self._shard(shard_of(name)).get(name)
+
+    def load(self) -> Dict[str, Any]:
+        """Return every record, reading each shard once."""
+        records: Dict[str, Any] = {}
+        for shard in self._shard_keys():
+            records.update(self._shard(shard))
+        return records
+
+    def names(self) -> List[str]:
+        return sorted(self.load())
+
+    def update(self, records: Dict[str, Any], removed: Iterable[str] = ()) -> None:
+        """Store several records and drop others, rewriting only the shards they fall in."""
+        changes: Dict[str, Dict[str, Any]] = {}
+        for name in removed:
+            changes.setdefault(shard_of(name), {})[name] = None
+        for name, record in records.items():
+            changes.setdefault(shard_of(name), {})[name] = record
+        if not changes:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            for shard, shard_changes in changes.items():
+                current = self._read(shard)
+                before = dict(current)
+                for name, record in shard_changes.items():
+                    if record is None:
+                        current.pop(name, None)
+                    else:
+                        current[name] = record
+                if current != before:
+                    self._write(shard, current)
+                elif self.cache:
+                    self._shards[shard] = current
+
+    def apply(self, name: str, change: Callable[[Any], Any]) -> Any:
+        """Replace the record of ``name`` with ``change(record)`` atomically; returns it.
+
+        ``record`` is None when there is none yet.
+        """
+        shard = shard_of(name)
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            current = self._read(shard)
+            record = current[name] = change(current.get(name))
+            self._write(shard, current)
+        return record
+
+    def replace_all(self, records: Dict[str, Any]) -> None:
+        """Replace every record, leaving no shard behind that ``records`` does not fill."""
+        shards: Dict[str, Dict[str, Any]] = {}
+        for name, record in records.items():
+            shards.setdefault(shard_of(name), {})[name] = record
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            for shard in set(self._shard_keys()) - set(shards):
+                self._write(shard, {})
+            for shard, shard_records in shards.items():
+                self._write(shard, shard_records)
+
+
+class SnapshotIndex(ShardedRecords):
+    """Map snapshot names to content digests, sizes and capture settings.
+
+    The index lives next to the snapshots in ``.index/`` so a verify can
+    compare digests without opening snapshot bodies. Entries carry the
+    store's stamp for the snapshot (size and mtime for plain files) so
+    hand-edited snapshots are detected as stale. Entries are sharded by
+    name (see ``ShardedRecords``); updates take the snapshot directory lock.
+    """
+
+    DIRNAME = '.index'
+
+    def __init__(self, snapshot_dir: Path, sync: Optional[SyncPolicy] = None):
+        super().__init__(Path(snapshot_dir) / self.DIRNAME, DirectoryLock(snapshot_dir), sync)
+
+    def set(self, snapshot_name: str, entry: Dict[str, Any]) -> None:
+        """Store an entry, merging with whatever other processes have written."""
+        self.update({snapshot_name: entry})
+
+    def remove(self, *snapshot_names: str) -> None:
+        """Drop the entries of any number of snapshots."""
+        self.update({}, removed=snapshot_names)
@@ -0,0 +1,170 @@
+"""Output normalization: ANSI stripping, redactions and trailing whitespace.
+
+Line endings need no rule: command output and stored snapshots are decoded
+with universal newlines, like ``subprocess.run(text=True)``, before any
+normalization runs.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+ANSI_PATTERN = r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])'
+
+BUILTIN_REDACTIONS = {
+    'timestamps': (
+        r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?',
+        '<TIMESTAMP>',
+    ),
+    'uuids': (
+        r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b',
+        '<UUID>',
+    ),
+    'pids': (r'(?<=(?i:pid)[=: ])\d+', '<PID>'),
+    'tmp-paths': (r'(?:/private)?(?:/tmp|/var/folders)/[^\s\'"]+', '<TMP>'),
+}
+
+DEFAULT_REPLACEMENT = '<REDACTED>'
+
+# Lines longer than this are normalized in pieces when streaming.
+MAX_STREAM_LINE = 1024 * 1024
+
+Redactions = Tuple[Tuple[str, str], ...]
+
+# Rules are combined into one regex, where global flags are only allowed at
+# the very start and group numbers shift, so neither may appear in a rule.
+_GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+_NUMBERED_REFERENCE = re.compile(r'(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?\(\d+\))')
+
+
+def parse_redactions(items: Optional[Iterable[Any]]) -> Redactions:
+    """Turn builtin names, raw patterns or pattern/replacement tables into rules."""
+    rules = []
+    for item in items or ():
+        if isinstance(item, dict):
+            if 'pattern' not in item:
+                raise ValueError("Redaction table needs a 'pattern' key")
+            rules.append((item['pattern'], item.get('replacement', DEFAULT_REPLACEMENT)))
+        elif item in BUILTIN_REDACTIONS:
+            rules.append(BUILTIN_REDACTIONS[item])
+        else:
+            rules.append((item, DEFAULT_REPLACEMENT))
+    for pattern, _ in rules:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid redaction pattern {pattern!r}: {e}")
+        if _GLOBAL_FLAGS.search(pattern):
+            raise ValueError(
+                f"Invalid redaction pattern {pattern!r}: inline flags must be scoped, "
+                "e.g. '(?i:secret)' instead of '(?i)secret'"
+            )
+        if _NUMBERED_REFERENCE.search(pattern):
+            raise ValueError(
+                f"Invalid redaction pattern {pattern!r}: use a named group and "
+                "'(?P=name)' instead of a numbered backreference"
+            )
+    rules = tuple(rules)
+    try:
+        Normalizer(redactions=rules)
+    except re.error as e:
+        raise ValueError(f"Invalid redaction patterns: {e}")
+    return rules
+
+
+class Normalizer:
+    """A chain of normalization rules compiled into one alternation.
+
+    ANSI escapes are stripped in a first pass, so the other rules see the
+    plain text (``pid=\x1b[1m123`` is redacted and spaces before a trailing
+    reset count as trailing). Every other rule becomes a named group of a
+    single regex applied in one ``sub`` pass. Replacements are literal
+    strings.
+    """
+
+    def __init__(
+        self,
+        strip_ansi: bool = False,
+        redactions: Redactions = (),
+        strip_trailing_whitespace: bool = False
+    ):
+        self.spec = {
+            'strip_ansi': strip_ansi,
+            'redact': [list(rule) for rule in redactions],
+            'strip_trailing_whitespace': strip_trailing_whitespace,
+        }
+        parts = []
+        self._replacements: Dict[str, str] = {}
+
+        def add(group: str, pattern: str, replacement: str) -> None:
+            parts.append(f'(?P<{group}>{pattern})')
+            self._replacements[group] = replacement
+
+        self._ansi = re.compile(ANSI_PATTERN) if strip_ansi else None
+        if strip_trailing_whitespace:
+            add('trailing', r'[ \t]+(?=\r|\n|\Z)', '')
+        for index, (pattern, replacement) in enumerate(redactions):
+            add(f'redact{index}', pattern, replacement)
+
+        self._pattern = re.compile('|'.join(parts)) if parts else None
+
+    @property
+    def active(self) -> bool:
+        return self._ansi is not None or self._pattern is not None
+
+    def _replace(self, match) -> str:
+        return self._replacements[match.lastgroup]
+
+    def __call__(self, text: str) -> str:
+        if self._ansi is not None:
+            text = self._ansi.sub('', text)
+        if self._pattern is None:
+            return text
+        return self._pattern.sub(self._replace, text)
+
+    def stream(self) -> 'StreamNormalizer':
+        return StreamNormalizer(self)
+
+
+class StreamNormalizer:
+    """Apply a Normalizer to text arriving in arbitrary chunks.
+
+    Text is held back after the last newline so escape sequences, CRLF
+    pairs and line-local redactions split across chunk boundaries still
+    match. Rules must not match across newlines.
+    """
+
+    def __init__(self, normalizer: Normalizer):
+        self.normalizer = normalizer
+        self._pending = ''
+
+    def feed(self, chunk: str) -> str:
+        """Normalize and return everything that is safe to emit so far."""
+        if not self.normalizer.active:
+            return chunk
+        text = self._pending + chunk
+        cut = text.rfind('\n') + 1
+        if len(text) - cut > MAX_STREAM_LINE:
+            cut = len(text) - 4096
+            escape = text.rfind('\x1b', cut - 64, cut)
+            if escape != -1:
+                cut = escape
+            if text[cut - 1] == '\r':
+                cut -= 1
+        self._pending = text[cut:]
+        return self.normalizer(text[:cut])
+
+    def flush(self) -> str:
+        """Normalize and return any held-back text at end of stream."""
+        text, self._pending = self._pending, ''
+        return self.normalizer(text)
+
+
+@lru_cache(maxsize=None)
+def build_normalizer(
+    strip_ansi: bool = False,
+    redactions: Redactions = (),
+    strip_trailing_whitespace: bool = False
+) -> Normalizer:
+    """Return the process-wide compiled Normalizer for these settings."""
+    return Normalizer(strip_ansi, redactions, strip_trailing_whitespace)
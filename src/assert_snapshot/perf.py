@@ -0,0 +1,197 @@
+"""Performance budgets: measured runs, summary statistics and budget checks.
+
+Each measured run records the command's wall time, CPU time (user plus
+system) and peak RSS. CPU and RSS come from ``wait4`` on the child itself,
+so they are exact even when other commands run concurrently; on platforms
+without ``wait4`` only wall time is recorded.
+"""
+
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .trace import charge_child, format_bytes, phase, reap, rss_bytes
+
+METRICS = ('wall', 'cpu', 'max_rss')
+STATISTICS = ('min', 'median', 'p90', 'p95', 'max')
+
+# Drift below these absolute amounts never breaks a tolerance, so very fast
+# commands do not fail on scheduler noise.
+TOLERANCE_FLOOR = {'wall': 0.01, 'cpu': 0.01, 'max_rss': 1024 * 1024}
+
+
+def run_measured(
+    command: List[str],
+    timeout: int = 30,
+    environ: Optional[Dict[str, str]] = None
+) -> Tuple[bytes, bytes, Dict[str, Optional[float]]]:
+    """Run ``command`` once; returns stdout, stderr and its resource sample.
+
+    Output goes to temporary files so the child can be reaped with
+    ``wait4`` (which reports its own rusage) without a pipe deadlock. The
+    usage is also charged to the operation being traced, if any.
+    """
+    import tempfile
+
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        try:
+            with phase('spawn'):
+                process = subprocess.Popen(command, stdout=stdout, stderr=stderr, env=environ)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Command not found: {command[0]}")
+        usage = None
+        with phase('run'):
+            if hasattr(os, 'wait4'):
+                timed_out = threading.Event()
+
+                def on_timeout():
+                    timed_out.set()
+                    process.kill()
+
+                timer = threading.Timer(timeout, on_timeout)
+                timer.start()
+                try:
+                    usage = reap(process)
+                finally:
+                    timer.cancel()
+                if timed_out.is_set():
+                    raise TimeoutError(f"Command timed out after {timeout} seconds")
+            else:  # pragma: no cover - Windows
+                try:
+                    process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+                    raise TimeoutError(f"Command timed out after {timeout} seconds")
+        charge_child(usage)
+        wall = time.perf_counter() - start
+        stdout.seek(0)
+        stderr.seek(0)
+        sample = {
+            'wall': wall,
+            'cpu': usage.ru_utime + usage.ru_stime if usage else None,
+            'max_rss': rss_bytes(usage.ru_maxrss) if usage else None,
+        }
+        return stdout.read(), stderr.read(), sample
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Linearly interpolated percentile of ``values`` (``fraction`` in 0..1)."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize_samples(samples: Iterable[Dict[str, Optional[float]]]) -> Dict[str, Any]:
+    """Reduce measured runs to per-metric statistics (see ``STATISTICS``)."""
+    samples = list(samples)
+    summary: Dict[str, Any] = {'runs': len(samples)}
+    for metric in METRICS:
+        values = [s[metric] for s in samples if s.get(metric) is not None]
+        if not values:
+            continue
+        summary[metric] = {
+            'min': min(values),
+            'median': percentile(values, 0.5),
+            'p90': percentile(values, 0.9),
+            'p95': percentile(values, 0.95),
+            'max': max(values),
+        }
+    return summary
+
+
+def make_budget(
+    repeat: int = 1,
+    statistic: str = 'median',
+    tolerance: Optional[float] = None,
+    max_wall: Optional[float] = None,
+    max_cpu: Optional[float] = None,
+    max_rss: Optional[int] = None
+) -> Dict[str, Any]:
+    """Build a budget for ``SnapshotManager.verify``.
+
+    ``tolerance`` is the allowed relative growth over the timings recorded
+    at capture; the ``max_*`` limits are absolute (seconds and bytes). Both
+    apply to ``statistic`` over ``repeat`` runs.
+    """
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1")
+    if statistic not in STATISTICS:
+        raise ValueError(f"Unknown statistic: {statistic}")
+    if tolerance is not None and tolerance < 0:
+        raise ValueError("tolerance cannot be negative")
+    return {
+        'repeat': repeat,
+        'statistic': statistic,
+        'tolerance': tolerance,
+        'limits': {'wall': max_wall, 'cpu': max_cpu, 'max_rss': max_rss},
+    }
+
+
+def check_budget(
+    measured: Dict[str, Any],
+    recorded: Optional[Dict[str, Any]],
+    budget: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Return one violation per metric that exceeds a limit or the tolerance.
+
+    A tolerance without a recorded baseline is itself a violation (of kind
+    ``baseline``), so a budget check never passes for lack of data.
+    """
+    statistic = budget['statistic']
+    violations = []
+    if budget['tolerance'] is not None and not recorded:
+        violations.append({'metric': None, 'kind': 'baseline'})
+    for metric in METRICS:
+        if metric not in measured:
+            continue
+        value = measured[metric][statistic]
+        limit = budget['limits'].get(metric)
+        if limit is not None and value > limit:
+            violations.append({'metric': metric, 'value': value, 'limit': limit, 'kind': 'limit'})
+            continue
+        tolerance = budget['tolerance']
+        if tolerance is None or not recorded or metric not in recorded:
+            continue
+        baseline = recorded[metric][statistic]
+        allowed = max(baseline * (1 + tolerance), baseline + TOLERANCE_FLOOR[metric])
+        if value > allowed:
+            violations.append({
+                'metric': metric, 'value': value, 'limit': allowed,
+                'baseline': baseline, 'kind': 'tolerance',
+            })
+    return violations
+
+
+def _format_value(metric: str, value: float) -> str:
+    if metric == 'max_rss':
+        return format_bytes(value)
+    return f"{value:.3f}s"
+
+
+def format_drift(perf: Dict[str, Any]) -> List[str]:
+    """Render measured timings against the recorded ones and any violations."""
+    statistic = perf['statistic']
+    measured, recorded = perf['measured'], perf['recorded'] or {}
+    violated = {v['metric']: v for v in perf['violations']}
+    lines = [f"Performance ({statistic} of {measured['runs']} run(s)):"]
+    for metric in METRICS:
+        if metric not in measured:
+            continue
+        value = measured[metric][statistic]
+        line = f"  {metric:<8} {_format_value(metric, value):>10}"
+        if metric in recorded:
+            baseline = recorded[metric][statistic]
+            change = f"{(value - baseline) / baseline:+.0%}" if baseline else 'n/a'
+            line += f"  (recorded {_format_value(metric, baseline)}, {change})"
+        if metric in violated:
+            line += f"  over budget {_format_value(metric, violated[metric]['limit'])}"
+        lines.append(line)
+    if not perf['recorded'] and perf['tolerance'] is not None:
+        lines.append("  No recorded timings to compare with; run 'capture --measure' first.")
+    return lines
@@ -0,0 +1,100 @@
+"""pytest plugin providing the ``assert_snapshot`` fixture for in-process snapshots.
+
+The plugin is loaded into every pytest run through its entry point, so the
+snapshot machinery is only imported once the fixture is used, and the diff
+renderer (whose colorama init wraps ``sys.stdout``) only on a mismatch.
+Its option, ini key and fixtures are all prefixed with ``assert_snapshot``
+so they never clash with other snapshot plugins such as syrupy or
+pytest-snapshot, which claim ``--snapshot-update`` and ``snapshot``.
+"""
+
+import re
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+import pytest
+
+if TYPE_CHECKING:
+    from .snapshot import SnapshotManager
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('assert-snapshot')
+    group.addoption(
+        '--assert-snapshot-update',
+        action='store_true',
+        help='Rewrite snapshots used by the assert_snapshot fixture instead of comparing'
+    )
+    parser.addini(
+        'assert_snapshot_dir',
+        'Snapshot directory for the assert_snapshot fixture, relative to rootdir',
+        default='.snapshots'
+    )
+
+
+class SnapshotAssertion:
+    """Compare values and callables against snapshots named after the test.
+
+    The first snapshot in a test is named after its node id, later ones get
+    a numeric suffix. Pass ``name`` to choose one explicitly.
+    """
+
+    def __init__(self, manager: 'SnapshotManager', base_name: str, update: bool = False):
+        self.manager = manager
+        self.base_name = base_name
+        self.update = update
+        self._count = 0
+
+    def _next_name(self) -> str:
+        self._count += 1
+        if self._count == 1:
+            return self.base_name
+        return f"{self.base_name}_{self._count}"
+
+    def assert_match(self, value: Any, name: Optional[str] = None, strip_ansi: bool = False) -> None:
+        """Assert that a value (rendered like a return value) matches its snapshot."""
+        self.assert_call(lambda: value, name=name, strip_ansi=strip_ansi)
+
+    def assert_call(
+        self,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        name: Optional[str] = None,
+        strip_ansi: bool = False
+    ) -> None:
+        """Assert that a callable's output and return value match its snapshot."""
+        name = name or self._next_name()
+        if self.update:
+            self.manager.capture_call(func, args, kwargs, name=name, strip_ansi=strip_ansi)
+            return
+        try:
+            result = self.manager.verify_call(func, args, kwargs, name=name, strip_ansi=strip_ansi)
+        except FileNotFoundError:
+            raise AssertionError(
+                f"Snapshot not found: {name}.snapshot (run pytest with --assert-snapshot-update)"
+            ) from None
+        if not result['matches']:
+            from .formatter import iter_diff
+            diff = '\n'.join(iter_diff(result['expected'], result['actual'], color=False))
+            raise AssertionError(f"Snapshot mismatch: {result['snapshot_name']}\n{diff}")
+
+
+@pytest.fixture(scope='session')
+def assert_snapshot_manager(request):
+    """Session-wide SnapshotManager; writes are fsynced once at session end."""
+    from .snapshot import SnapshotManager
+
+    config = request.config
+    manager = SnapshotManager(str(config.rootpath / config.getini('assert_snapshot_dir')))
+    with manager.batch():
+        yield manager
+
+
+@pytest.fixture
+def assert_snapshot(request, assert_snapshot_manager):
+    """Snapshot assertions for the current test."""
+    base_name = re.sub(r'[^a-zA-Z0-9_-]', '_', request.node.nodeid.replace('.py::', '_'))
+    base_name = re.sub(r'_+', '_', base_name).strip('_')
+    return SnapshotAssertion(
+        assert_snapshot_manager, base_name, request.config.getoption('assert_snapshot_update')
+    )
@@ -0,0 +1,73 @@
+"""Storage for the actual output of failed verifications."""
+
+import fnmatch
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from .atomic import SyncPolicy, atomic_write
+
+
+class RunResultStore:
+    """Keep the last mismatching output per snapshot so it can be accepted later."""
+
+    def __init__(self, root: Path, sync: Optional[SyncPolicy] = None):
+        self.root = Path(root)
+        self.sync = sync
+
+    def _paths(self, snapshot_name: str):
+        return self.root / snapshot_name, self.root / f"{snapshot_name}.json"
+
+    def record(
+        self,
+        snapshot_name: str,
+        command: List[str],
+        output: Union[str, bytes],
+        strip_ansi: bool = False
+    ) -> int:
+        """Save the actual output of a verification run; returns its size in bytes.
+
+        Binary output is stored as is and loaded back as bytes.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        output_path, meta_path = self._paths(snapshot_name)
+        binary = isinstance(output, bytes)
+        data = output if binary else output.encode('utf-8')
+        atomic_write(output_path, data, self.sync)
+        # Metadata is written last so a record is only visible once complete.
+        meta = {'command': list(command), 'strip_ansi': strip_ansi}
+        if binary:
+            meta['binary'] = True
+        meta = json.dumps(meta)
+        atomic_write(meta_path, meta.encode('utf-8'), self.sync)
+        return len(data)
+
+    def load(self, snapshot_name: str) -> Optional[Dict[str, Any]]:
+        """Return the recorded run for a snapshot, or None if there is none."""
+        output_path, meta_path = self._paths(snapshot_name)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if meta.get('binary'):
+                meta['output'] = output_path.read_bytes()
+            else:
+                meta['output'] = output_path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        return meta
+
+    def discard(self, snapshot_name: str) -> None:
+        """Forget the recorded run for a snapshot."""
+        for path in self._paths(snapshot_name):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def names(self, pattern: Optional[str] = None) -> List[str]:
+        """List snapshot names with a recorded run, optionally filtered by glob."""
+        if not self.root.is_dir():
+            return []
+        names = [p.name[:-len('.json')] for p in self.root.glob('*.json')]
+        if pattern:
+            names = fnmatch.filter(names, pattern)
+        return sorted(names)
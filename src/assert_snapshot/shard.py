@@ -0,0 +1,195 @@
+"""Recorded verify durations and splitting a suite into balanced shards.
+
+Every verify that runs its command records how long it took, smoothed
+over past runs. ``partition`` uses these durations to split snapshots
+across CI nodes so every shard takes about as long, and falls back to
+hashing names for snapshots that have no recorded duration yet. Each node
+computes the partition on its own, so all nodes must see the same
+durations (restore ``.snapshots/.durations`` from a shared cache; it is
+git-ignored like the rest of the local state) for the shards to cover
+every snapshot exactly once. Sharded runs
+therefore leave the durations alone; ``merge --record-durations`` folds
+the durations of all shards in once they are done.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .atomic import SyncPolicy
+from .index import ShardedRecords
+
+RESULTS_VERSION = 1
+
+# Weight of the newest run in the smoothed duration.
+SMOOTHING = 0.5
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse ``'i/n'`` (1-based) into ``(i, n)``."""
+    index, sep, count = value.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}': expected i/n, e.g. 2/16")
+    if not sep or count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{value}': need 1 <= i <= n")
+    return index, count
+
+
+class DurationStore:
+    """Keep a smoothed verify duration per snapshot.
+
+    Durations live in name-hashed shards (see ``index.ShardedRecords``), so
+    each update rewrites one small file and the file count stays bounded.
+    """
+
+    def __init__(self, root: Path, sync: Optional[SyncPolicy] = None):
+        self.root = Path(root)
+        self.sync = sync
+        self.records = ShardedRecords(self.root, sync=sync, version=1, cache=False)
+
+    def get(self, snapshot_name: str) -> Optional[float]:
+        """Return the recorded duration of a snapshot in seconds, if any."""
+        try:
+            return float(self.records.get(snapshot_name)['duration'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def record(self, snapshot_name: str, seconds: float) -> float:
+        """Fold a new run into the snapshot's duration; returns the new value."""
+        def change(record):
+            try:
+                previous = float(record['duration'])
+            except (KeyError, TypeError, ValueError):
+                return {'duration': seconds}
+            return {'duration': SMOOTHING * seconds + (1 - SMOOTHING) * previous}
+        return self.records.apply(snapshot_name, change)['duration']
+
+    def load(self, snapshot_names: Iterable[str]) -> Dict[str, float]:
+        """Return the recorded durations of the snapshots that have one."""
+        records = self.records.load()
+        durations = {}
+        for snapshot_name in snapshot_names:
+            try:
+                durations[snapshot_name] = float(records[snapshot_name]['duration'])
+            except (KeyError, TypeError, ValueError):
+                pass
+        return durations
+
+    def discard(self, snapshot_name: str) -> None:
+        self.records.update({}, removed=[snapshot_name])
+
+    def names(self) -> List[str]:
+        """List snapshot names with a recorded duration (including deleted snapshots)."""
+        return self.records.names()
+
+
+def _name_hash(name: str) -> int:
+    return int.from_bytes(hashlib.sha256(name.encode('utf-8')).digest()[:8], 'big')
+
+
+def partition(names: Iterable[str], durations: Dict[str, float], count: int) -> List[List[str]]:
+    """Split ``names`` into ``count`` shards of roughly equal total duration.
+
+    Names without a duration are placed by hash, which stays stable as the
+    suite grows. The rest are assigned longest first to the least loaded
+    shard, counting unknown names at the median recorded duration. The
+    result depends only on the names and durations, never on their order.
+    """
+    if count < 1:
+        raise ValueError("Shard count must be at least 1")
+    names = sorted(set(names))
+    shards: List[List[str]] = [[] for _ in range(count)]
+    known = sorted((name for name in names if name in durations),
+                   key=lambda name: (-durations[name], name))
+    unknown = [name for name in names if name not in durations]
+
+    estimate = 0.0
+    if known:
+        ordered = sorted(durations[name] for name in known)
+        estimate = ordered[len(ordered) // 2]
+    loads = [0.0] * count
+    for name in unknown:
+        shard = _name_hash(name) % count
+        shards[shard].append(name)
+        loads[shard] += estimate
+    for name in known:
+        shard = min(range(count), key=lambda i: (loads[i], i))
+        shards[shard].append(name)
+        loads[shard] += durations[name]
+    return [sorted(shard) for shard in shards]
+
+
+def select_shard(
+    names: Iterable[str],
+    durations: Dict[str, float],
+    index: int,
+    count: int
+) -> List[str]:
+    """Return the names in shard ``index`` of ``count`` (1-based)."""
+    return partition(names, durations, count)[index - 1]
+
+
+def results_document(
+    results: List[Dict[str, Any]],
+    summary: Dict[str, Any],
+    shard: Optional[Tuple[int, int]] = None,
+    snapshot_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build the JSON document ``run --results`` writes for ``merge``.
+
+    ``snapshot_dir`` tells ``merge --record-durations`` where to save the
+    shards' durations.
+    """
+    keys = ('name', 'command', 'status', 'duration', 'cached', 'error')
+    return {
+        'version': RESULTS_VERSION,
+        'shard': list(shard) if shard else None,
+        'snapshot_dir': snapshot_dir,
+        'summary': summary,
+        'results': [{key: result[key] for key in keys if key in result} for result in results],
+    }
+
+
+def merge_documents(documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-shard result documents.
+
+    Returns the concatenated ``results``, the shard ``duration`` (the
+    slowest shard, as they run in parallel), the shards' ``snapshot_dir``
+    (None if unrecorded) and a list of ``problems``: unknown versions,
+    shards of different splits or snapshot directories, and missing or
+    repeated shards. Any problem fails the merge.
+    """
+    problems = []
+    results = []
+    seen: Dict[int, int] = {}
+    counts = set()
+    snapshot_dirs = set()
+    for position, document in enumerate(documents):
+        if document.get('version') != RESULTS_VERSION:
+            problems.append(f"File {position + 1} has unsupported results version {document.get('version')}")
+            continue
+        results.extend(document['results'])
+        if document.get('snapshot_dir'):
+            snapshot_dirs.add(document['snapshot_dir'])
+        shard = document.get('shard')
+        if shard:
+            index, count = shard
+            counts.add(count)
+            seen[index] = seen.get(index, 0) + 1
+    if len(counts) > 1:
+        problems.append(f"Shards come from different splits: {', '.join(map(str, sorted(counts)))}")
+    elif counts:
+        count, = counts
+        missing = [str(i) for i in range(1, count + 1) if i not in seen]
+        if missing:
+            problems.append(f"Missing shard(s) {', '.join(missing)} of {count}")
+        repeated = [str(i) for i, times in sorted(seen.items()) if times > 1]
+        if repeated:
+            problems.append(f"Shard(s) {', '.join(repeated)} given more than once")
+    if len(snapshot_dirs) > 1:
+        problems.append(f"Shards use different snapshot directories: {', '.join(sorted(snapshot_dirs))}")
+    duration = max((d['summary']['duration'] for d in documents if 'summary' in d), default=0.0)
+    snapshot_dir = next(iter(snapshot_dirs)) if len(snapshot_dirs) == 1 else None
+    return {'results': results, 'duration': duration, 'snapshot_dir': snapshot_dir, 'problems': problems}
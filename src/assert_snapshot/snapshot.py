@@ -1,15 +1,270 @@
-"""Core snapshot capture, storage, and comparison logic."""
+"""Core snapshot capture, storage, and comparison logic.
 
+Modules only needed off the common capture/verify path (asyncio, tempfile,
+pprint) are imported where they are used to keep CLI startup fast.
+"""
+
+import codecs
+import fnmatch
+import io
+import json
+import locale
+import os
 import re
+import shlex
+import signal
 import subprocess
+import threading
+import time
+from contextlib import (
+    asynccontextmanager, contextmanager, nullcontext, redirect_stderr, redirect_stdout
+)
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Any, Callable, Iterable, Iterator, Optional, List, Dict, Tuple, Union
+
+from .atomic import DirectoryLock, SyncPolicy, atomic_write
+from .catalog import StatusStore, last_touched, status_of
+from .fingerprint import compute_fingerprint
+from .index import SnapshotIndex, bytes_digest
+from .normalize import Normalizer, build_normalizer, parse_redactions
+from .perf import check_budget, run_measured, summarize_samples
+from .results import RunResultStore
+from .shard import DurationStore, select_shard
+from .store import open_store, pack_snapshots, unpack_snapshots
+from .structured import canonicalize
+from .trace import Tracer, charge_child, count, current, note, phase, reap
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Companion snapshot holding stderr when streams are captured separately.
+STDERR_SUFFIX = '.stderr'
+
+# Index fields describing how a snapshot was captured; kept across re-indexing.
+CAPTURE_FIELDS = ('perf', 'binary', 'separate_stderr', 'structure')
+
+# The capture fields a verify cannot do without. The index only caches them:
+# they are also kept with the snapshots, which is what gets committed.
+MODE_FIELDS = ('perf', 'binary', 'separate_stderr', 'structure')
+
+# Snapshots that cannot be compared as plain text, or that carry a timing
+# baseline, start with a header line naming their modes, e.g.
+# ``#assert-snapshot binary`` or ``#assert-snapshot structure=json``.
+SNAPSHOT_HEADER = b'#assert-snapshot'
+
+Output = Union[str, bytes]
+
+# Default number of commands the async API runs at once per manager.
+ASYNC_CONCURRENCY = 32
+
+# Written into new snapshot directories: the snapshots (and a pack) are
+# meant to be committed, while the index, run results, statuses, durations,
+# lock, daemon socket and temporary files are local to each machine.
+GITIGNORE = """\
+# Local assert-snapshot state; the snapshots themselves are committed.
+/.index/
+/.runs/
+/.status/
+/.durations/
+/.lock
+/.daemon.sock
+.*.tmp
+"""
+
+
+def _iter_decoded(stream, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield text from a binary stream as soon as bytes are available.
+
+    Decodes with the locale encoding and universal newlines, matching
+    ``subprocess.run(text=True)``.
+    """
+    decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+    decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+    while True:
+        data = stream.read1(chunk_size)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def _universal_newlines(text: str) -> str:
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def _decode_output(data: bytes) -> str:
+    """Decode command output like ``subprocess.run(text=True)``."""
+    return _universal_newlines(data.decode(locale.getpreferredencoding(False)))
+
+
+def _kill_process_group(process) -> None:
+    """Kill a child started in its own session together with its descendants."""
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+def stderr_name(snapshot_name: str) -> str:
+    """Name of the companion snapshot holding a snapshot's separate stderr."""
+    return snapshot_name[:-len('.snapshot')] + STDERR_SUFFIX + '.snapshot'
+
+
+def mismatched_streams(result: Dict[str, Any]) -> List[Tuple[str, Output, Output]]:
+    """List ``(snapshot_name, expected, actual)`` for each stream a verify failed on."""
+    streams = []
+    if result['expected'] != result['actual']:
+        streams.append((result['snapshot_name'], result['expected'], result['actual']))
+    stderr = result.get('stderr')
+    if stderr and not stderr['matches']:
+        streams.append((stderr['snapshot_name'], stderr['expected'], stderr['actual']))
+    return streams
+
+
+def encode_snapshot(
+    output: Output,
+    structure: Optional[str] = None,
+    perf: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """Return the stored form of snapshot content: a mode header, if any, then the body.
+
+    ``perf``, the baseline of ``capture(measure=True)``, is kept in the
+    header as compact JSON. Text that happens to start like a header gets
+    an empty one, so it reads back unchanged.
+    """
+    binary = isinstance(output, bytes)
+    data = output if binary else output.encode('utf-8')
+    modes = [b'binary'] if binary else []
+    if structure:
+        modes.append(b'structure=' + structure.encode('ascii'))
+    if perf:
+        modes.append(b'perf=' + json.dumps(perf, sort_keys=True, separators=(',', ':')).encode('ascii'))
+    if modes or data.startswith(SNAPSHOT_HEADER):
+        return b' '.join([SNAPSHOT_HEADER, *modes]) + b'\n' + data
+    return data
+
+
+def decode_header(data: bytes) -> Tuple[Dict[str, Any], int]:
+    """Return the modes named by a stored snapshot's header and where its body starts."""
+    if not data.startswith(SNAPSHOT_HEADER):
+        return {}, 0
+    end = data.find(b'\n')
+    end = len(data) if end < 0 else end
+    modes: Dict[str, Any] = {}
+    for word in data[len(SNAPSHOT_HEADER):end].decode('ascii').split():
+        key, _, value = word.partition('=')
+        if key == 'perf':
+            try:
+                modes[key] = json.loads(value)
+            except ValueError:
+                pass
+            continue
+        modes[key] = value or True
+    return modes, end + 1
+
+
+def _decode(data: bytes) -> str:
+    """Decode stored snapshot bytes with universal newlines, like read_text."""
+    return _universal_newlines(data.decode('utf-8'))
+
+
+def _render_value(value: Any) -> str:
+    """Render a callable's return value as snapshot text."""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return _decode_output(value)
+    import pprint
+    return pprint.pformat(value) + '\n'
+
+
+class _StreamComparator:
+    """Compare text pieces against an open snapshot file as they arrive."""
+
+    def __init__(self, expected_file, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.expected_file = expected_file
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.mismatch: Optional[Tuple[str, str]] = None
+
+    def feed(self, piece: str) -> bool:
+        """Compare the next piece of actual output; False on divergence."""
+        if not piece:
+            return True
+        expected = self.expected_file.read(len(piece))
+        if expected != piece:
+            common = 0
+            for exp_char, act_char in zip(expected, piece):
+                if exp_char != act_char:
+                    break
+                common += 1
+            self.offset += common
+            self.mismatch = (expected, piece)
+            return False
+        self.offset += len(piece)
+        return True
+
+    def finish(self) -> bool:
+        """Check that the snapshot has no content left over."""
+        rest = self.expected_file.read(self.chunk_size)
+        if rest:
+            self.mismatch = (rest, '')
+            return False
+        return True
 
 
 class SnapshotManager:
-    def __init__(self, snapshot_dir: str = ".snapshots"):
+    def __init__(
+        self,
+        snapshot_dir: str = ".snapshots",
+        redact: Optional[Iterable[Any]] = None,
+        strip_trailing_whitespace: bool = False,
+        store: Optional[str] = None,
+        compress: bool = False,
+        sync: str = 'each',
+        max_concurrency: int = ASYNC_CONCURRENCY,
+        tracer: Optional[Tracer] = None,
+        record_durations: bool = True
+    ):
         self.snapshot_dir = Path(snapshot_dir)
+        self.redactions = parse_redactions(redact)
+        self.strip_trailing_whitespace = strip_trailing_whitespace
         self.snapshot_dir.mkdir(exist_ok=True)
+        gitignore = self.snapshot_dir / '.gitignore'
+        if not gitignore.exists():
+            atomic_write(gitignore, GITIGNORE.encode('utf-8'))
+        # 'each' fsyncs every write, 'batch' waits for flush(), 'off' never syncs.
+        self.sync = SyncPolicy(sync)
+        self.lock = DirectoryLock(self.snapshot_dir)
+        self.results = RunResultStore(self.snapshot_dir / '.runs', self.sync)
+        # How long each verify took, used to balance shards (see shard.py).
+        # Durations are advisory, like statuses, so they are never fsynced.
+        # Both are sharded by name, so they add a bounded number of files.
+        self.durations = DurationStore(self.snapshot_dir / '.durations')
+        self.record_durations = record_durations
+        # When each snapshot was last captured and verified, for queries and gc.
+        self.status = StatusStore(self.snapshot_dir / '.status', self.sync)
+        self.index = SnapshotIndex(self.snapshot_dir, self.sync)
+        # 'directory' (one file per snapshot) or 'pack'; detected when None.
+        self.store = open_store(self.snapshot_dir, store, compress, self.sync)
+        self.max_concurrency = max_concurrency
+        # Environment for commands; None inherits this process's environment.
+        self.environ: Optional[Dict[str, str]] = None
+        # Records per-phase timings of every capture/verify when set.
+        self.tracer = tracer
+        # Snapshot directory mtime when the index was last checked against the store.
+        self._synced_mtime: Optional[int] = None
+        self._async_limit: Optional[Tuple[Any, Any]] = None
     
     def _validate_name(self, name: str) -> None:
         """Validate snapshot name to prevent path traversal."""
@@ -19,6 +274,8 @@ class SnapshotManager:
             )
         if name.startswith('.'):
             raise ValueError("Invalid snapshot name: cannot start with '.'")
+        if name.endswith(STDERR_SUFFIX):
+            raise ValueError(f"Invalid snapshot name: cannot end with '{STDERR_SUFFIX}'")
     
     def _generate_name(self, command: List[str], name: Optional[str] = None) -> str:
         """Generate snapshot filename from command or use provided name."""
@@ -30,11 +287,42 @@ class SnapshotManager:
         sanitized = re.sub(r'[^a-zA-Z0-9_-]', '_', cmd_str)
         sanitized = re.sub(r'_+', '_', sanitized).strip('_')
         return f"{sanitized}.snapshot"
+
+    def _check_collision(self, snapshot_name: str, command: List[str]) -> None:
+        """Refuse to reuse a generated name that belongs to another command.
+
+        Generated names only look at the first three arguments, so distinct
+        commands can map to the same snapshot.
+        """
+        recorded = (self.index.get(snapshot_name) or {}).get('command')
+        if recorded is not None and recorded != list(command):
+            raise ValueError(
+                f"Generated snapshot name {snapshot_name} is already used by "
+                f"'{shlex.join(recorded)}'; pass --name to disambiguate"
+            )
     
+    def _operation(self, op: str, command: List[str]):
+        """Trace the block as one operation if this manager has a tracer.
+
+        Cached index shards are dropped first, so each operation sees what
+        other processes recorded since the last one.
+        """
+        self.index.refresh()
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.operation(op, command)
+
     def _strip_ansi(self, text: str) -> str:
         """Remove ANSI escape codes from text."""
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        return ansi_escape.sub('', text)
+        return build_normalizer(strip_ansi=True)(text)
+
+    def _normalizer(self, strip_ansi: bool = False) -> Normalizer:
+        """Return the compiled normalizer chain for this manager's settings."""
+        return build_normalizer(
+            strip_ansi,
+            self.redactions,
+            self.strip_trailing_whitespace
+        )
     
     def _run_command(
         self,
@@ -43,67 +331,790 @@ class SnapshotManager:
         strip_ansi: bool = False
     ) -> str:
         """Execute command and capture output safely."""
+        stdout, stderr = self._execute(command, timeout)
+        return self._outputs(stdout, stderr, strip_ansi)[0]
+
+    def _execute(self, command: List[str], timeout: int = 30) -> Tuple[bytes, bytes]:
+        """Run ``command`` and return its raw stdout and stderr.
+
+        A traced command runs through ``run_measured`` instead, which reaps
+        it with ``wait4`` so the trace gets its own CPU time and peak RSS.
+        """
         if not command:
             raise ValueError("Command cannot be empty")
-        
+        if current() is not None and hasattr(os, 'wait4'):
+            stdout, stderr, _ = run_measured(command, timeout, self.environ)
+            return stdout, stderr
+
         try:
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                check=False
-            )
-            output = result.stdout + result.stderr
-            
-            if strip_ansi:
-                output = self._strip_ansi(output)
-            
-            return output
-        except subprocess.TimeoutExpired:
-            raise TimeoutError(f"Command timed out after {timeout} seconds")
+            with phase('spawn'):
+                process = subprocess.Popen(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    env=self.environ
+                )
         except FileNotFoundError:
             raise FileNotFoundError(f"Command not found: {command[0]}")
+        with process, phase('run'):
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise TimeoutError(f"Command timed out after {timeout} seconds")
+        return stdout, stderr
+
+    def _check_binary(self, strip_ansi: bool) -> None:
+        if self._normalizer(strip_ansi).active:
+            raise ValueError("Binary snapshots are byte-exact and cannot be normalized")
+
+    def _outputs(
+        self,
+        stdout: bytes,
+        stderr: bytes,
+        strip_ansi: bool = False,
+        binary: bool = False,
+        separate_stderr: bool = False,
+        structure: Optional[str] = None
+    ) -> Tuple[Output, Optional[Output]]:
+        """Turn raw command output into snapshot content.
+
+        Text is decoded and normalized; binary output is kept byte for byte.
+        Returns the stdout-then-stderr concatenation and None, or stdout and
+        stderr apart when ``separate_stderr`` is set. With a ``structure``
+        the (normalized) stdout, or the concatenation, is canonicalized.
+        """
+        count('output_bytes', len(stdout) + len(stderr))
+        if binary:
+            return (stdout, stderr) if separate_stderr else (stdout + stderr, None)
+        with phase('decode'):
+            out, err = _decode_output(stdout), _decode_output(stderr)
+        normalizer = self._normalizer(strip_ansi)
+        with phase('normalize'):
+            if separate_stderr:
+                out, err = normalizer(out), normalizer(err)
+            else:
+                out, err = normalizer(out + err), None
+        if structure:
+            with phase('canonicalize'):
+                out = canonicalize(out, structure)
+        return out, err
+
+    def _measure_command(
+        self,
+        command: List[str],
+        timeout: int = 30,
+        repeat: int = 1
+    ) -> Tuple[bytes, bytes, Dict[str, Any]]:
+        """Run ``command`` ``repeat`` times; returns the first run's output and timing stats."""
+        if not command:
+            raise ValueError("Command cannot be empty")
+        if repeat < 1:
+            raise ValueError("repeat must be at least 1")
+
+        samples = []
+        first = None
+        for _ in range(repeat):
+            stdout, stderr, sample = run_measured(command, timeout, self.environ)
+            samples.append(sample)
+            first = first or (stdout, stderr)
+        return first[0], first[1], summarize_samples(samples)
     
     def capture(
         self,
         command: List[str],
         name: Optional[str] = None,
         strip_ansi: bool = False,
-        timeout: int = 30
+        timeout: int = 30,
+        measure: bool = False,
+        repeat: int = 1,
+        binary: bool = False,
+        separate_stderr: bool = False,
+        structure: Optional[str] = None
+    ) -> str:
+        """Capture command output and save as snapshot.
+
+        With ``measure`` the command runs ``repeat`` times and the statistics
+        of its wall time, CPU time and peak RSS are kept in the snapshot's
+        header as the baseline for ``verify`` budgets. The output of the first run is saved.
+
+        ``binary`` stores the raw bytes without decoding or normalization.
+        ``separate_stderr`` stores stderr in a companion snapshot (see
+        ``stderr_name``) instead of appending it to stdout. ``structure``
+        (``'json'`` or ``'ndjson'``) stores the output in canonical form so
+        key order and number formatting do not matter (see ``structured``);
+        mismatches then report the differing paths. ``verify`` picks all
+        three settings up from the index.
+        """
+        if binary:
+            self._check_binary(strip_ansi)
+            if structure:
+                raise ValueError("Binary snapshots cannot be compared by structure")
+        with self._operation('capture', command):
+            perf = None
+            if measure:
+                stdout, stderr, perf = self._measure_command(command, timeout, repeat)
+            else:
+                stdout, stderr = self._execute(command, timeout)
+            output, stderr_output = self._outputs(
+                stdout, stderr, strip_ansi, binary, separate_stderr, structure
+            )
+            return self._store_capture(
+                command, name, output, strip_ansi, perf, stderr_output, structure
+            )
+
+    def _store_capture(
+        self,
+        command: List[str],
+        name: Optional[str],
+        output: Output,
+        strip_ansi: bool,
+        perf: Optional[Dict[str, Any]] = None,
+        stderr: Optional[Output] = None,
+        structure: Optional[str] = None
     ) -> str:
-        """Capture command output and save as snapshot."""
-        output = self._run_command(command, timeout, strip_ansi)
         snapshot_name = self._generate_name(command, name)
-        snapshot_path = self.snapshot_dir / snapshot_name
-        
-        snapshot_path.write_text(output, encoding='utf-8')
+        note(snapshot=snapshot_name, status='captured')
+        fields = {'perf': perf, 'separate_stderr': stderr is not None, 'structure': structure}
+        companion = stderr_name(snapshot_name)
+        with self.lock:
+            if name is None:
+                self._check_collision(snapshot_name, command)
+            self._write_snapshot(snapshot_name, output, command, strip_ansi, fields)
+            if stderr is not None:
+                self._write_snapshot(companion, stderr, command, strip_ansi)
+            elif self.store.exists(companion):
+                self._forget([companion])
         return snapshot_name
+
+    def _capture_fields(self, snapshot_name: str) -> Dict[str, Any]:
+        """Return the capture settings (see ``CAPTURE_FIELDS``) of a snapshot.
+
+        They come from the index while it describes the stored content.
+        Otherwise (a fresh clone, a checkout or a hand edit) the
+        ``MODE_FIELDS`` are read from the snapshot itself.
+        """
+        entry = self.index.get(snapshot_name) or {}
+        fields = {field: entry[field] for field in CAPTURE_FIELDS if field in entry}
+        if self.store.exists(snapshot_name) and self._indexed_digest(snapshot_name) is None:
+            for field in MODE_FIELDS:
+                fields.pop(field, None)
+            fields.update(self._stored_modes(snapshot_name))
+        return fields
+
+    def _stored_modes(self, snapshot_name: str) -> Dict[str, Any]:
+        """Read the modes kept with a snapshot: its header and stderr companion."""
+        with self.store.open(snapshot_name) as f:
+            head = f.readline(4096)
+        modes, _ = decode_header(head)
+        if self.store.exists(stderr_name(snapshot_name)):
+            modes['separate_stderr'] = True
+        return {field: modes[field] for field in MODE_FIELDS if field in modes}
+
+    def recorded_perf(self, snapshot_name: str) -> Optional[Dict[str, Any]]:
+        """Return the timing statistics recorded by ``capture(measure=True)``."""
+        return self._capture_fields(snapshot_name).get('perf')
+
+    def recorded_structure(self, snapshot_name: str) -> Optional[str]:
+        """Return the ``structure`` a snapshot was captured with, if any."""
+        return self._capture_fields(snapshot_name).get('structure')
+
+    def read_snapshot(self, snapshot_name: str) -> Output:
+        """Return the stored content of a snapshot (bytes for binary snapshots)."""
+        if not self.store.exists(snapshot_name):
+            raise FileNotFoundError(f"Snapshot not found: {snapshot_name}")
+        with phase('read'):
+            data = self.store.read(snapshot_name)
+        count('bytes_read', len(data))
+        modes, start = decode_header(data)
+        body = data[start:] if start else data
+        if modes.get('binary'):
+            return body
+        return _decode(body)
+
+    def _open_snapshot(self, snapshot_name: str) -> io.TextIOWrapper:
+        """Open a text snapshot for incremental reads, past any header."""
+        if not self.store.exists(snapshot_name):
+            raise FileNotFoundError(f"Snapshot not found: {snapshot_name}")
+        raw = self.store.open(snapshot_name)
+        if hasattr(raw, 'peek') and raw.peek(len(SNAPSHOT_HEADER)).startswith(SNAPSHOT_HEADER):
+            raw.readline()
+        return io.TextIOWrapper(raw, encoding='utf-8')
+
+    def _write_snapshot(
+        self,
+        snapshot_name: str,
+        output: Output,
+        command: Optional[List[str]] = None,
+        strip_ansi: bool = False,
+        fields: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Store snapshot content, index it and drop any pending run result.
+
+        The directory lock is held throughout so the index entry always
+        describes the content that was written. Capture ``fields`` recorded
+        for the previous content are replaced by ``fields``; ``binary`` is
+        set from the type of ``output``. It, ``structure`` and ``perf`` are
+        also stored in the snapshot's header (see ``encode_snapshot``).
+        """
+        fields = dict(fields or {}, binary=isinstance(output, bytes))
+        data = encode_snapshot(output, fields.get('structure'), fields.get('perf'))
+        with phase('write'), self.lock:
+            self.store.write(snapshot_name, data)
+            self.index.set(snapshot_name, self._index_entry(
+                snapshot_name, bytes_digest(data), command, strip_ansi, fields
+            ))
+            self.results.discard(snapshot_name)
+            self.status.captured(snapshot_name)
+        count('bytes_written', len(data))
+
+    @contextmanager
+    def batch(self) -> Iterator['SnapshotManager']:
+        """Defer fsync of everything written inside the block to its end."""
+        previous = self.sync.mode
+        if previous == 'each':
+            self.sync.mode = 'batch'
+        try:
+            yield self
+        finally:
+            self.sync.mode = previous
+            self.sync.flush()
+
+    def _index_entry(
+        self,
+        snapshot_name: str,
+        digest: Optional[str],
+        command: Optional[List[str]],
+        strip_ansi: bool,
+        fields: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, any]:
+        """Build an index entry from the snapshot's current size and stamp.
+
+        Capture ``fields`` (see ``CAPTURE_FIELDS``) are only stored when set.
+        """
+        entry = {
+            'sha256': digest,
+            'size': self.store.size(snapshot_name),
+            'stamp': self.store.stamp(snapshot_name),
+            'strip_ansi': strip_ansi,
+            'normalize': self._normalizer(strip_ansi).spec,
+            'command': list(command) if command is not None else None,
+        }
+        entry.update((key, value) for key, value in (fields or {}).items() if value)
+        return entry
+
+    def _indexed_digest(self, snapshot_name: str) -> Optional[str]:
+        """Return the indexed digest if the snapshot is unchanged since indexing."""
+        entry = self.index.get(snapshot_name)
+        if not entry or not entry.get('sha256'):
+            return None
+        stamp = self.store.stamp(snapshot_name)
+        if stamp is None or stamp != entry.get('stamp'):
+            return None
+        return entry['sha256']
     
     def verify(
         self,
         command: List[str],
         name: Optional[str] = None,
         strip_ansi: bool = False,
-        timeout: int = 30
+        timeout: int = 30,
+        inputs: Optional[List[str]] = None,
+        env: Optional[List[str]] = None,
+        use_cache: bool = True,
+        budget: Optional[Dict[str, Any]] = None,
+        input_mtime: bool = False
     ) -> Dict[str, any]:
-        """Verify command output matches saved snapshot."""
+        """Verify command output matches saved snapshot.
+
+        When the index holds a fresh digest for the snapshot, only the digest
+        of the new output is compared and the snapshot body is read only to
+        produce a diff on mismatch.
+
+        If ``inputs`` (paths or globs) are declared, a passing verify records
+        a fingerprint of the executable, arguments, ``env`` allowlist and
+        input files. While that fingerprint is unchanged the command is not
+        run and the result has ``cached`` set. Input files are hashed, or
+        with ``input_mtime`` only stat()ed (size and mtime), which is cheaper
+        for large inputs but misses edits that keep both.
+
+        With a ``budget`` (see ``perf.make_budget``) the command is never
+        served from the cache; it runs ``budget['repeat']`` times and the
+        result gains ``perf`` with the measured and recorded statistics and
+        any ``violations``. ``matches`` still reflects the output only.
+
+        Binary and separate-stderr snapshots are verified the way they were
+        captured. For the latter ``matches`` covers both streams and the
+        result gains ``stderr``, the verify result of the companion snapshot.
+        Structured snapshots are compared in canonical form and the result
+        gains ``structure`` so the mismatch can be diffed by path.
+        """
+        with self._operation('verify', command):
+            snapshot_name, fingerprint, cached = self._prepare_verify(
+                command, name, strip_ansi, inputs, env, use_cache and budget is None, input_mtime
+            )
+            if cached is not None:
+                return cached
+            start = time.perf_counter()
+            if budget is None:
+                stdout, stderr = self._execute(command, timeout)
+                result = self._finish_outputs(
+                    snapshot_name, command, stdout, stderr, strip_ansi, fingerprint
+                )
+                self._record_duration(snapshot_name, time.perf_counter() - start)
+                return result
+
+            stdout, stderr, measured = self._measure_command(command, timeout, budget['repeat'])
+            recorded = self.recorded_perf(snapshot_name)
+            result = self._finish_outputs(
+                snapshot_name, command, stdout, stderr, strip_ansi, fingerprint
+            )
+            self._record_duration(snapshot_name, (time.perf_counter() - start) / budget['repeat'])
+            result['perf'] = {
+                'statistic': budget['statistic'],
+                'tolerance': budget['tolerance'],
+                'measured': measured,
+                'recorded': recorded,
+                'violations': check_budget(measured, recorded, budget),
+            }
+            return result
+
+    def _record_duration(self, snapshot_name: str, seconds: float) -> None:
+        """Remember how long a verify that ran its command took."""
+        if not self.record_durations:
+            return
+        with phase('record'):
+            self.durations.record(snapshot_name, seconds)
+
+    def _prepare_verify(
+        self,
+        command: List[str],
+        name: Optional[str],
+        strip_ansi: bool,
+        inputs: Optional[List[str]],
+        env: Optional[List[str]],
+        use_cache: bool,
+        input_mtime: bool = False
+    ) -> Tuple[str, Optional[str], Optional[Dict[str, any]]]:
+        """Resolve the snapshot and fingerprint; returns a result on a cache hit."""
         snapshot_name = self._generate_name(command, name)
-        snapshot_path = self.snapshot_dir / snapshot_name
+        note(snapshot=snapshot_name)
         
-        if not snapshot_path.exists():
+        if not self.store.exists(snapshot_name):
             raise FileNotFoundError(f"Snapshot not found: {snapshot_name}")
-        
-        expected = snapshot_path.read_text(encoding='utf-8')
-        actual = self._run_command(command, timeout, strip_ansi)
-        
+        if name is None:
+            self._check_collision(snapshot_name, command)
+
+        fingerprint = None
+        if inputs is not None:
+            with phase('fingerprint'):
+                fingerprint = compute_fingerprint(
+                    command, inputs, env or (), self._normalizer(strip_ansi).spec,
+                    use_mtime=input_mtime, environ=self.environ
+                )
+            entry = self.index.get(snapshot_name) or {}
+            if (use_cache and entry.get('fingerprint') == fingerprint
+                    and self._indexed_digest(snapshot_name) is not None):
+                self.results.discard(snapshot_name)
+                self.status.verified(snapshot_name, True)
+                note(status='cached')
+                return snapshot_name, fingerprint, {
+                    'matches': True,
+                    'expected': None,
+                    'actual': None,
+                    'snapshot_name': snapshot_name,
+                    'cached': True
+                }
+        return snapshot_name, fingerprint, None
+
+    def _finish_outputs(
+        self,
+        snapshot_name: str,
+        command: List[str],
+        stdout: bytes,
+        stderr: bytes,
+        strip_ansi: bool,
+        fingerprint: Optional[str]
+    ) -> Dict[str, any]:
+        """Convert raw output as the snapshot was captured, then compare each stream."""
+        fields = self._capture_fields(snapshot_name)
+        binary = fields.get('binary', False)
+        structure = fields.get('structure')
+        if binary:
+            self._check_binary(strip_ansi)
+        actual, stderr_actual = self._outputs(
+            stdout, stderr, strip_ansi, binary, fields.get('separate_stderr', False), structure
+        )
+        if stderr_actual is None:
+            result = self._finish_verify(
+                snapshot_name, command, actual, strip_ansi, fingerprint, structure
+            )
+            if structure:
+                result['structure'] = structure
+            return result
+
+        stderr_result = self._finish_verify(
+            stderr_name(snapshot_name), command, stderr_actual, strip_ansi, None
+        )
+        # Only cache a run on the fingerprint when both streams passed.
+        result = self._finish_verify(
+            snapshot_name, command, actual, strip_ansi,
+            fingerprint if stderr_result['matches'] else None, structure
+        )
+        result['stderr'] = stderr_result
+        result['matches'] = result['matches'] and stderr_result['matches']
+        if structure:
+            result['structure'] = structure
+        note(status='passed' if result['matches'] else 'failed')
+        return result
+
+    def _finish_verify(
+        self,
+        snapshot_name: str,
+        command: List[str],
+        actual: Output,
+        strip_ansi: bool,
+        fingerprint: Optional[str],
+        structure: Optional[str] = None
+    ) -> Dict[str, any]:
+        """Compare fresh output with the snapshot and update index and run results.
+
+        Binary output is compared against the stored bytes in place and the
+        snapshot is only read to produce a diff on mismatch.
+        """
+        binary = isinstance(actual, bytes)
+        with phase('compare'):
+            stored = encode_snapshot(actual, structure, self.recorded_perf(snapshot_name))
+            digest = bytes_digest(stored)
+            stamp = self.store.stamp(snapshot_name)
+            indexed_digest = self._indexed_digest(snapshot_name)
+        if indexed_digest == digest:
+            expected = actual
+        elif binary:
+            with phase('compare'):
+                same = self.store.equals(snapshot_name, stored)
+            expected = actual if same else self.read_snapshot(snapshot_name)
+        else:
+            expected = self.read_snapshot(snapshot_name)
+        with phase('compare'):
+            matches = expected == actual
+        note(status='passed' if matches else 'failed')
+
+        with phase('record'):
+            stored_fingerprint = (self.index.get(snapshot_name) or {}).get('fingerprint')
+            new_fingerprint = fingerprint if matches else None
+            if (matches and indexed_digest is None) or new_fingerprint != stored_fingerprint:
+                # Fill in digests for snapshots indexed by reindex() or edited by
+                # hand, and keep the fingerprint in step with the last result.
+                with self.lock:
+                    entry = self._index_entry(snapshot_name, digest if matches else indexed_digest,
+                                              command, strip_ansi, self._capture_fields(snapshot_name))
+                    if new_fingerprint:
+                        entry['fingerprint'] = new_fingerprint
+                    # Skip the update if another process rewrote the snapshot meanwhile.
+                    if entry['stamp'] == stamp:
+                        self.index.set(snapshot_name, entry)
+
+            if matches:
+                self.results.discard(snapshot_name)
+            else:
+                count('bytes_written', self.results.record(snapshot_name, command, actual, strip_ansi))
+            self.status.verified(snapshot_name, matches)
+
         return {
-            'matches': expected == actual,
+            'matches': matches,
             'expected': expected,
             'actual': actual,
-            'snapshot_name': snapshot_name
+            'snapshot_name': snapshot_name,
+            'cached': False
         }
     
+    def verify_stream(
+        self,
+        command: List[str],
+        name: Optional[str] = None,
+        strip_ansi: bool = False,
+        timeout: int = 30,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        kill_on_mismatch: bool = True
+    ) -> Dict[str, any]:
+        """Verify command output chunk by chunk, stopping at the first divergence.
+
+        Memory use is bounded by ``chunk_size``: stdout is compared as it is
+        read, and stderr is spooled to a temporary file and compared once
+        stdout closes, preserving the stdout-then-stderr order of ``verify``.
+        On mismatch ``expected`` and ``actual`` hold the diverging chunks only.
+        Binary, separate-stderr and structured snapshots cannot be streamed.
+        """
+        with self._operation('verify', command):
+            if not command:
+                raise ValueError("Command cannot be empty")
+
+            snapshot_name = self._generate_name(command, name)
+            note(snapshot=snapshot_name)
+            if name is None:
+                self._check_collision(snapshot_name, command)
+            fields = self._capture_fields(snapshot_name)
+            if fields.get('binary') or fields.get('separate_stderr') or fields.get('structure'):
+                raise ValueError(
+                    f"{snapshot_name} was captured with --binary, --separate-stderr "
+                    "or --structure and cannot be verified with --stream"
+                )
+
+            import tempfile
+
+            start = time.perf_counter()
+            with tempfile.TemporaryFile() as stderr_file, \
+                    self._open_snapshot(snapshot_name) as expected_file:
+                try:
+                    with phase('spawn'):
+                        # Its own session, so a timeout or mismatch also stops
+                        # descendants that would keep stdout open.
+                        proc = subprocess.Popen(
+                            command,
+                            stdout=subprocess.PIPE,
+                            stderr=stderr_file,
+                            start_new_session=os.name == 'posix',
+                            env=self.environ
+                        )
+                except FileNotFoundError:
+                    raise FileNotFoundError(f"Command not found: {command[0]}")
+
+                timed_out = threading.Event()
+
+                def on_timeout():
+                    timed_out.set()
+                    _kill_process_group(proc)
+
+                timer = threading.Timer(timeout, on_timeout)
+                timer.start()
+                comparator = _StreamComparator(expected_file, chunk_size)
+                normalizer = self._normalizer(strip_ansi).stream()
+                matches = True
+                try:
+                    with phase('stream'):
+                        for chunk in _iter_decoded(proc.stdout, chunk_size):
+                            matches = comparator.feed(normalizer.feed(chunk))
+                            if not matches:
+                                break
+
+                        if not matches and kill_on_mismatch:
+                            _kill_process_group(proc)
+                        else:
+                            while proc.stdout.read1(chunk_size):
+                                pass
+                        charge_child(reap(proc))
+                    proc.stdout.close()
+                finally:
+                    timer.cancel()
+                    if proc.poll() is None:
+                        _kill_process_group(proc)
+                        proc.wait()
+
+                if timed_out.is_set():
+                    raise TimeoutError(f"Command timed out after {timeout} seconds")
+
+                with phase('stream'):
+                    if matches:
+                        stderr_file.seek(0)
+                        for chunk in _iter_decoded(stderr_file, chunk_size):
+                            matches = comparator.feed(normalizer.feed(chunk))
+                            if not matches:
+                                break
+                    if matches:
+                        matches = comparator.feed(normalizer.flush()) and comparator.finish()
+
+            note(status='passed' if matches else 'failed')
+            # Streaming never holds the full output, so only a pass is recorded.
+            if matches:
+                self.results.discard(snapshot_name)
+                self._record_duration(snapshot_name, time.perf_counter() - start)
+            with phase('record'):
+                self.status.verified(snapshot_name, matches)
+
+            expected, actual = comparator.mismatch or (None, None)
+            return {
+                'matches': matches,
+                'expected': expected,
+                'actual': actual,
+                'offset': None if matches else comparator.offset,
+                'snapshot_name': snapshot_name
+            }
+
+    @asynccontextmanager
+    async def _async_slot(self):
+        """Limit concurrent async commands; the semaphore is rebuilt per event loop."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self._async_limit is None or self._async_limit[0] is not loop:
+            self._async_limit = (loop, asyncio.Semaphore(self.max_concurrency))
+        async with self._async_limit[1]:
+            yield
+
+    async def _arun_command(
+        self,
+        command: List[str],
+        timeout: int = 30,
+        strip_ansi: bool = False
+    ) -> str:
+        """Async counterpart of ``_run_command``."""
+        stdout, stderr, _ = await self._aexecute(command, timeout)
+        return self._outputs(stdout, stderr, strip_ansi)[0]
+
+    async def _aexecute(
+        self,
+        command: List[str],
+        timeout: int = 30
+    ) -> Tuple[bytes, bytes, float]:
+        """Async counterpart of ``_execute``; also returns the command's run time.
+
+        The run time excludes waiting for a concurrency slot. The command
+        runs in its own process group, which is killed as a whole on
+        timeout or cancellation so no grandchildren are left behind.
+        """
+        import asyncio
+
+        if not command:
+            raise ValueError("Command cannot be empty")
+
+        async with self._async_slot():
+            start = time.perf_counter()
+            try:
+                with phase('spawn'):
+                    process = await asyncio.create_subprocess_exec(
+                        *command,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        start_new_session=os.name == 'posix',
+                        env=self.environ
+                    )
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Command not found: {command[0]}")
+            try:
+                with phase('run'):
+                    stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                _kill_process_group(process)
+                await process.wait()
+                raise TimeoutError(f"Command timed out after {timeout} seconds")
+            except asyncio.CancelledError:
+                _kill_process_group(process)
+                # Reap it even though this task is being cancelled, so no
+                # zombie outlives the event loop.
+                await asyncio.shield(process.wait())
+                raise
+        return stdout, stderr, time.perf_counter() - start
+
+    async def acapture(
+        self,
+        command: List[str],
+        name: Optional[str] = None,
+        strip_ansi: bool = False,
+        timeout: int = 30
+    ) -> str:
+        """Async ``capture``: awaits the command, then stores the snapshot."""
+        with self._operation('capture', command):
+            output = await self._arun_command(command, timeout, strip_ansi)
+            return self._store_capture(command, name, output, strip_ansi)
+
+    async def averify(
+        self,
+        command: List[str],
+        name: Optional[str] = None,
+        strip_ansi: bool = False,
+        timeout: int = 30,
+        inputs: Optional[List[str]] = None,
+        env: Optional[List[str]] = None,
+        use_cache: bool = True,
+        input_mtime: bool = False
+    ) -> Dict[str, any]:
+        """Async ``verify``; at most ``max_concurrency`` commands run at once.
+
+        Snapshot and index access stays synchronous; it is small next to
+        the command itself.
+        """
+        with self._operation('verify', command):
+            snapshot_name, fingerprint, cached = self._prepare_verify(
+                command, name, strip_ansi, inputs, env, use_cache, input_mtime
+            )
+            if cached is not None:
+                return cached
+            stdout, stderr, seconds = await self._aexecute(command, timeout)
+            result = self._finish_outputs(
+                snapshot_name, command, stdout, stderr, strip_ansi, fingerprint
+            )
+            self._record_duration(snapshot_name, seconds)
+            return result
+
+    def _call_command(
+        self,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any]
+    ) -> List[str]:
+        """Describe a call the way argv describes a command, for naming and the index."""
+        target = f"{func.__module__}.{func.__qualname__}"
+        return [target, *map(repr, args), *(f"{k}={v!r}" for k, v in sorted(kwargs.items()))]
+
+    def _run_call(
+        self,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        strip_ansi: bool = False
+    ) -> str:
+        """Call ``func`` in-process and return its normalized output.
+
+        The output is whatever it printed to stdout, then stderr, then its
+        rendered return value. Exceptions propagate. Redirecting the standard
+        streams is process-wide, so calls must not run concurrently.
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with phase('call'), redirect_stdout(stdout), redirect_stderr(stderr):
+            value = func(*args, **kwargs)
+        output = stdout.getvalue() + stderr.getvalue() + _render_value(value)
+        with phase('normalize'):
+            return self._normalizer(strip_ansi)(_universal_newlines(output))
+
+    def capture_call(
+        self,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        name: Optional[str] = None,
+        strip_ansi: bool = False
+    ) -> str:
+        """Snapshot a Python callable without spawning a process.
+
+        Without ``name`` the snapshot is named after the function and the
+        reprs of its first arguments, so those should be stable.
+        """
+        kwargs = kwargs or {}
+        command = self._call_command(func, args, kwargs)
+        with self._operation('capture', command):
+            output = self._run_call(func, args, kwargs, strip_ansi)
+            return self._store_capture(command, name, output, strip_ansi)
+
+    def verify_call(
+        self,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        name: Optional[str] = None,
+        strip_ansi: bool = False
+    ) -> Dict[str, any]:
+        """Verify a Python callable's output against its snapshot in-process."""
+        kwargs = kwargs or {}
+        command = self._call_command(func, args, kwargs)
+        with self._operation('verify', command):
+            snapshot_name, _, _ = self._prepare_verify(
+                command, name, strip_ansi, None, None, False
+            )
+            actual = self._run_call(func, args, kwargs, strip_ansi)
+            return self._finish_verify(snapshot_name, command, actual, strip_ansi, None)
+
     def update(
         self,
         command: List[str],
@@ -113,12 +1124,244 @@ class SnapshotManager:
     ) -> str:
         """Update existing snapshot with new output."""
         return self.capture(command, name, strip_ansi, timeout)
+
+    def accept_last_run(
+        self,
+        snapshot_name: str,
+        command: Optional[List[str]] = None
+    ) -> str:
+        """Replace a snapshot with the output recorded by its last failed verify.
+
+        If ``command`` is given it must match the command that produced the
+        recorded output, so a stale run is never accepted by mistake.
+        """
+        record = self.results.load(snapshot_name)
+        if record is None:
+            raise FileNotFoundError(f"No recorded run for snapshot: {snapshot_name}")
+        if command is not None and record['command'] != list(command):
+            raise ValueError(
+                f"Recorded run for {snapshot_name} was produced by a different command"
+            )
+        fields = self._capture_fields(snapshot_name)
+        # The recorded timings belong to the output being replaced.
+        fields.pop('perf', None)
+        self._write_snapshot(
+            snapshot_name, record['output'], record['command'], record['strip_ansi'], fields
+        )
+        return snapshot_name
+
+    def last_runs(self, pattern: Optional[str] = None) -> List[str]:
+        """List snapshots with a recorded failing run, optionally filtered by glob."""
+        return self.results.names(pattern)
     
-    def list_snapshots(self, pattern: Optional[str] = None) -> List[str]:
-        """List all snapshots, optionally filtered by glob pattern."""
+    def pack(self, compress: bool = False) -> int:
+        """Migrate loose snapshot files into the pack store; returns the count moved."""
+        with self.lock:
+            count = pack_snapshots(self.snapshot_dir, compress, self.sync)
+            self.store = open_store(self.snapshot_dir, 'pack', sync=self.sync)
+            self.reindex()
+        return count
+
+    def unpack(self) -> int:
+        """Migrate a pack back to one file per snapshot; returns the count written."""
+        if self.store.kind != 'pack':
+            return 0
+        with self.lock:
+            count = unpack_snapshots(self.snapshot_dir, self.sync)
+            self.store = open_store(self.snapshot_dir, 'directory', sync=self.sync)
+            self.reindex()
+        return count
+
+    def reindex(self) -> int:
+        """Rebuild the index from the snapshot directory.
+
+        Existing digests are kept for snapshots that have not changed, and
+        packed snapshots reuse the pack's digest; anything else is indexed
+        without a digest, which is filled in lazily.
+        """
+        entries = {}
+        with self.lock:
+            for snapshot_name in self.store.names():
+                old = self.index.get(snapshot_name) or {}
+                digest = self._indexed_digest(snapshot_name) or self.store.digest(snapshot_name)
+                fields = self._capture_fields(snapshot_name)
+                entries[snapshot_name] = self._index_entry(
+                    snapshot_name, digest, old.get('command'), old.get('strip_ansi', False), fields
+                )
+            self.index.replace_all(entries)
+        return len(entries)
+
+    def _sync_index(self) -> None:
+        """Bring the index in line with snapshots added or removed behind its back.
+
+        Snapshots copied in or deleted by hand, by a checkout or by another
+        tool are indexed without a digest (filled in lazily) or dropped. The
+        store is only listed when the directory changed since the last check.
+        """
+        if not self.index.exists():
+            self.reindex()
+            return
+        mtime = self.snapshot_dir.stat().st_mtime_ns
+        if mtime == self._synced_mtime:
+            return
+        with self.lock:
+            stored = set(self.store.names())
+            indexed = set(self.index.names())
+            if stored != indexed:
+                self.index.update({
+                    name: self._index_entry(name, None, None, False, self._capture_fields(name))
+                    for name in stored - indexed
+                }, removed=indexed - stored)
+        self._synced_mtime = mtime
+
+    def shard_names(self, snapshot_names: Iterable[str], index: int, count: int) -> List[str]:
+        """Return shard ``index`` of ``count`` (1-based) of ``snapshot_names``.
+
+        Shards are balanced by recorded verify durations (see
+        ``shard.partition``). Stderr companions go with their snapshot.
+        """
+        names = set(snapshot_names)
+        companions = {stderr_name(name): name for name in names}
+        selected = set(select_shard(
+            [name for name in names if companions.get(name) is None],
+            self.durations.load(names), index, count
+        ))
+        return sorted(name for name in names if companions.get(name, name) in selected)
+
+    def list_snapshots(
+        self,
+        pattern: Optional[str] = None,
+        details: bool = False,
+        shard: Optional[Tuple[int, int]] = None,
+        status: Optional[str] = None,
+        older_than: Optional[float] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None
+    ) -> List[any]:
+        """List all snapshots, optionally filtered by glob pattern.
+
+        Names and metadata come from the index, which is first synced with
+        the snapshots actually stored (see ``_sync_index``). With ``details`` each item is a dict holding
+        the name, size, digest, command and normalization flags, plus the
+        ``status`` and ``captured``/``verified`` times from the catalog
+        (see ``catalog.StatusStore``). ``shard`` (``(i, n)``, see
+        ``shard_names``) keeps only one shard's snapshots.
+
+        ``status`` (one of ``catalog.STATUSES``), ``older_than`` (seconds
+        since last captured or verified; never counts as infinitely old)
+        and the inclusive ``min_size``/``max_size`` in bytes filter further.
+        Pattern and size filters use the index alone; status files are only
+        read for the snapshots that pass them.
+        """
+        self.index.refresh()
+        self._sync_index()
+        entries = self.index.load()
+        names = sorted(entries)
         if pattern:
-            snapshots = self.snapshot_dir.glob(pattern)
-        else:
-            snapshots = self.snapshot_dir.glob('*.snapshot')
-        
-        return sorted([s.name for s in snapshots])
+            names = fnmatch.filter(names, pattern)
+        if min_size is not None or max_size is not None:
+            names = [
+                name for name in names
+                if (min_size is None or (entries[name].get('size') or 0) >= min_size)
+                and (max_size is None or (entries[name].get('size') or 0) <= max_size)
+            ]
+        records: Dict[str, Dict[str, Any]] = {}
+        if status is not None or older_than is not None or details:
+            records = self.status.load(names)
+        if status is not None:
+            names = [name for name in names if status_of(records.get(name)) == status]
+        if older_than is not None:
+            cutoff = time.time() - older_than
+            names = [name for name in names if (last_touched(records.get(name)) or 0) < cutoff]
+        if shard is not None:
+            names = self.shard_names(names, *shard)
+        if not details:
+            return names
+        return [
+            dict(
+                entries[n], name=n,
+                status=status_of(records.get(n)),
+                captured=(records.get(n) or {}).get('captured'),
+                verified=(records.get(n) or {}).get('verified')
+            )
+            for n in names
+        ]
+
+    def _forget(self, snapshot_names: Iterable[str]) -> None:
+        """Delete snapshots, if present, and everything recorded about them."""
+        snapshot_names = list(snapshot_names)
+        with self.lock:
+            for snapshot_name in snapshot_names:
+                if self.store.exists(snapshot_name):
+                    self.store.delete(snapshot_name)
+                self.results.discard(snapshot_name)
+                self.durations.discard(snapshot_name)
+                self.status.discard(snapshot_name)
+            self.index.remove(*snapshot_names)
+
+    def delete_snapshot(self, name: str) -> List[str]:
+        """Delete a snapshot, its stderr companion and their recorded state.
+
+        ``name`` is the name given to ``capture`` or the full snapshot name.
+        Returns the snapshot names deleted.
+        """
+        if name.endswith('.snapshot'):
+            name = name[:-len('.snapshot')]
+        snapshot_name = self._generate_name([], name)
+        if not self.store.exists(snapshot_name):
+            raise FileNotFoundError(f"Snapshot not found: {snapshot_name}")
+        deleted = [snapshot_name]
+        if self.store.exists(stderr_name(snapshot_name)):
+            deleted.append(stderr_name(snapshot_name))
+        self._forget(deleted)
+        return deleted
+
+    def mark_suite_run(self, started: float, snapshot_names: Iterable[str]) -> None:
+        """Record a complete suite run, the reference point of ``stale_snapshots``.
+
+        ``started`` is the epoch time the run began and ``snapshot_names``
+        the snapshots its entries resolved to, whatever their outcome.
+        """
+        self.status.mark_suite(started, snapshot_names)
+
+    def stale_snapshots(self) -> List[str]:
+        """List snapshots an earlier suite run produced and the last one did not touch.
+
+        Only snapshots some complete suite run resolved to are candidates,
+        so ones captured by hand or by the pytest plugin are never stale.
+        A candidate is kept if one of the last run's entries resolved to
+        it, or it was captured or verified after that run started. Stderr
+        companions share their snapshot's fate.
+        """
+        suite = self.status.last_suite()
+        if suite is None:
+            raise FileNotFoundError("No complete suite run recorded; 'run' a manifest first")
+        covered = set(suite['names'])
+        managed = set(suite.get('managed', covered))
+        names = self.list_snapshots()
+        records = self.status.load(names)
+        companions = {stderr_name(name): name for name in names}
+
+        def stale(snapshot_name: str) -> bool:
+            return (snapshot_name in managed and snapshot_name not in covered
+                    and (last_touched(records.get(snapshot_name)) or 0) < suite['started'])
+
+        return [name for name in names if stale(companions.get(name, name))]
+
+    def gc(self, dry_run: bool = False) -> Dict[str, List[str]]:
+        """Delete stale snapshots (see ``stale_snapshots``) and orphaned records.
+
+        Orphans are recorded runs, durations and statuses left behind by
+        snapshots that no longer exist. Returns the ``stale`` and ``orphans``
+        names; with ``dry_run`` nothing is deleted.
+        """
+        with self.lock:
+            stale = self.stale_snapshots()
+            existing = set(self.list_snapshots())
+            recorded = set(self.results.names()) | set(self.durations.names()) | set(self.status.names())
+            orphans = sorted(recorded - existing)
+            if not dry_run:
+                with self.batch():
+                    self._forget(stale + orphans)
+                    self.status.unmanage(stale)
+        return {'stale': stale, 'orphans': orphans}
@@ -0,0 +1,555 @@
+"""Snapshot storage backends: one file per snapshot or a single pack file."""
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from .atomic import DirectoryLock, SyncPolicy, atomic_write
+
+PACK_FILENAME = 'snapshots.pack'
+PACK_INDEX_FILENAME = 'snapshots.pack.idx'
+PACK_LOG_FILENAME = 'snapshots.pack.log'
+PACK_VERSION = 1
+
+# The pack log is folded into the index once it holds more records than
+# there are entries, and at least this many.
+PACK_LOG_FOLD_MIN = 1024
+
+SNAPSHOT_SUFFIX = '.snapshot'
+
+
+class DirectoryStore:
+    """Store each snapshot as ``<name>.snapshot`` in the snapshot directory."""
+
+    kind = 'directory'
+
+    def __init__(self, root: Path, sync: Optional[SyncPolicy] = None):
+        self.root = Path(root)
+        self.sync = sync
+
+    def path(self, snapshot_name: str) -> Path:
+        return self.root / snapshot_name
+
+    def exists(self, snapshot_name: str) -> bool:
+        return self.path(snapshot_name).exists()
+
+    def read(self, snapshot_name: str) -> bytes:
+        return self.path(snapshot_name).read_bytes()
+
+    def open(self, snapshot_name: str) -> BinaryIO:
+        return self.path(snapshot_name).open('rb')
+
+    def equals(self, snapshot_name: str, data: bytes) -> bool:
+        """Compare stored bytes with ``data`` through a memory map, without copying."""
+        with self.open(snapshot_name) as f:
+            size = os.fstat(f.fileno()).st_size
+            if size != len(data):
+                return False
+            if size == 0:
+                return True
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer, \
+                    memoryview(buffer) as view:
+                return view == data
+
+    def write(self, snapshot_name: str, data: bytes) -> None:
+        atomic_write(self.path(snapshot_name), data, self.sync)
+
+    def delete(self, snapshot_name: str) -> None:
+        self.path(snapshot_name).unlink()
+
+    def names(self) -> List[str]:
+        return sorted(p.name for p in self.root.glob(f'*{SNAPSHOT_SUFFIX}'))
+
+    def stamp(self, snapshot_name: str) -> Optional[str]:
+        """Return a token that changes whenever the snapshot is rewritten."""
+        try:
+            stat = self.path(snapshot_name).stat()
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def size(self, snapshot_name: str) -> int:
+        return self.path(snapshot_name).stat().st_size
+
+    def digest(self, snapshot_name: str) -> Optional[str]:
+        """Stored content digest, if the backend keeps one (this one does not)."""
+        return None
+
+
+class _MmapReader(io.RawIOBase):
+    """Read-only raw stream over a region of a memory map, without copying it."""
+
+    def __init__(self, buffer: mmap.mmap, start: int, length: int):
+        self._view = memoryview(buffer)[start:start + length]
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class _ZlibReader(io.RawIOBase):
+    """Incrementally decompress a zlib stream read from another raw stream."""
+
+    def __init__(self, source: BinaryIO, block_size: int = 64 * 1024):
+        self._source = source
+        self._block_size = block_size
+        self._decompressor = zlib.decompressobj()
+        self._buffer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer and not self._decompressor.eof:
+            data = self._decompressor.unconsumed_tail or self._source.read(self._block_size)
+            if not data:
+                self._buffer = self._decompressor.flush()
+                break
+            # Cap the output per step so large entries never inflate at once.
+            self._buffer = self._decompressor.decompress(data, self._block_size)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self) -> None:
+        self._source.close()
+        super().close()
+
+
+class PackStore:
+    """Store snapshots in one append-only data file plus a JSON offset index.
+
+    Reads go through ``mmap``. Entries are deduplicated by content digest
+    and optionally zlib-compressed. Rewritten or deleted snapshots leave
+    dead bytes behind until ``compact`` is run. Appends and index updates
+    happen under the snapshot directory lock, so concurrent writers never
+    record overlapping offsets.
+
+    The offset index is the JSON file plus a log of the changes made since
+    it was written, one JSON line per write or delete, so a write appends a
+    line instead of rewriting every entry. Both carry a generation number:
+    a log only applies to the index of its own generation, and the log is
+    folded into a new index once it holds more records than there are
+    entries (and at least ``PACK_LOG_FOLD_MIN``).
+    """
+
+    kind = 'pack'
+
+    def __init__(
+        self,
+        root: Path,
+        compress: bool = False,
+        sync: Optional[SyncPolicy] = None
+    ):
+        self.root = Path(root)
+        self.compress = compress
+        self.sync = sync
+        self.lock = DirectoryLock(self.root)
+        self.data_path = self.root / PACK_FILENAME
+        self.index_path = self.root / PACK_INDEX_FILENAME
+        self.log_path = self.root / PACK_LOG_FILENAME
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        # Content digest -> entry, so a write finds a duplicate without a scan.
+        self._by_digest: Dict[str, Dict[str, Any]] = {}
+        self._generation = 0
+        self._signature: Optional[Tuple[int, int, int]] = None
+        # Inode and size of the log up to the last record applied.
+        self._log_position: Tuple[Optional[int], int] = (None, 0)
+        self._log_records = 0
+        self._map: Optional[mmap.mmap] = None
+        self._map_signature: Optional[Tuple[int, int]] = None
+
+    @classmethod
+    def detect(cls, root: Path) -> bool:
+        return (Path(root) / PACK_INDEX_FILENAME).exists()
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.index_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _load(self) -> None:
+        """Read the index and replay its log from the start."""
+        signature = self._stat_signature()
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            data = {'version': PACK_VERSION, 'entries': {}}
+        if data.get('version') != PACK_VERSION:
+            raise ValueError(f"Unsupported pack index version: {data.get('version')}")
+        self.compress = data.get('compress', self.compress)
+        self._generation = data.get('generation', 0)
+        self._entries = data['entries']
+        self._by_digest = {e['sha256']: e for e in self._entries.values()}
+        self._signature = signature
+        self._log_position = (None, 0)
+        self._log_records = 0
+        self._replay()
+
+    def _replay(self) -> None:
+        """Apply the log records appended since the last replay."""
+        try:
+            stat = self.log_path.stat()
+        except FileNotFoundError:
+            return
+        inode, position = self._log_position
+        if inode == stat.st_ino and position == stat.st_size:
+            return
+        if inode != stat.st_ino:
+            position = 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(position)
+            data = f.read()
+        # A line still being appended by another process is left for later.
+        complete = data[:data.rfind(b'\n') + 1]
+        lines = complete.splitlines()
+        if position == 0:
+            if not lines or _log_generation(lines[0]) != self._generation:
+                # Left over from before the index was rewritten; it is
+                # replaced with a log of the current generation shortly.
+                return
+            lines = lines[1:]
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self._apply(record['name'], record['entry'])
+            self._log_records += 1
+        self._log_position = (stat.st_ino, position + len(complete))
+
+    def _apply(self, snapshot_name: str, entry: Optional[Dict[str, Any]]) -> None:
+        if entry is None:
+            self._entries.pop(snapshot_name, None)
+        else:
+            self._entries[snapshot_name] = entry
+            self._by_digest.setdefault(entry['sha256'], entry)
+
+    def _refresh(self) -> None:
+        """Pick up index rewrites and log records from other processes."""
+        if self._entries is None or self._stat_signature() != self._signature:
+            self._load()
+        else:
+            self._replay()
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        """Return the current entries, re-read from disk."""
+        self._load()
+        return self._entries
+
+    def _write_index(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Write ``entries`` as the index of a new generation with an empty log."""
+        self._generation += 1
+        data = json.dumps(
+            {'version': PACK_VERSION, 'compress': self.compress,
+             'generation': self._generation, 'entries': entries},
+            sort_keys=True
+        )
+        atomic_write(self.index_path, data.encode('utf-8'), self.sync)
+        atomic_write(self.log_path, _log_header(self._generation), self.sync)
+        self._entries = entries
+        self._by_digest = {e['sha256']: e for e in entries.values()}
+        self._signature = self._stat_signature()
+        stat = self.log_path.stat()
+        self._log_position = (stat.st_ino, stat.st_size)
+        self._log_records = 0
+
+    def _log(self, snapshot_name: str, entry: Optional[Dict[str, Any]]) -> None:
+        """Record a write (or, with ``entry`` None, a delete); the lock must be held."""
+        self._apply(snapshot_name, entry)
+        if (self._signature is None or self._log_position[0] is None
+                or self._log_records + 1 > max(PACK_LOG_FOLD_MIN, len(self._entries))):
+            self._write_index(self._entries)
+            return
+        line = json.dumps({'name': snapshot_name, 'entry': entry}, sort_keys=True).encode('utf-8')
+        with open(self.log_path, 'ab') as f:
+            f.write(line + b'\n')
+            if self.sync is not None:
+                self.sync.file(f)
+            size = f.tell()
+        if self.sync is not None:
+            self.sync.committed(self.log_path)
+        self._log_position = (self._log_position[0], size)
+        self._log_records += 1
+
+    @property
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """Cached offsets, updated whenever another process changed the index."""
+        self._refresh()
+        return self._entries
+
+    def _entry(self, snapshot_name: str) -> Dict[str, Any]:
+        entry = self.entries.get(snapshot_name)
+        if entry is None:
+            raise FileNotFoundError(f"Snapshot not found: {snapshot_name}")
+        return entry
+
+    def _buffer(self, end: int) -> mmap.mmap:
+        """Map the data file, remapping whenever it was appended to or replaced.
+
+        Another process may compact the pack (a new file) and append to it
+        again, so the map is keyed on the file's inode and size rather than
+        only on whether it is long enough. Open readers keep an old map
+        alive until they are closed.
+        """
+        stat = os.stat(self.data_path)
+        signature = (stat.st_ino, stat.st_size)
+        if self._map is None or signature != self._map_signature or len(self._map) < end:
+            with open(self.data_path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map_signature = signature
+        return self._map
+
+    def close(self) -> None:
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+            self._map = None
+            self._map_signature = None
+
+    def exists(self, snapshot_name: str) -> bool:
+        try:
+            self._entry(snapshot_name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def open(self, snapshot_name: str) -> BinaryIO:
+        entry = self._entry(snapshot_name)
+        if entry['length'] == 0:
+            raw = io.BytesIO(b'')
+        else:
+            buffer = self._buffer(entry['offset'] + entry['length'])
+            raw = _MmapReader(buffer, entry['offset'], entry['length'])
+        if entry['compression'] == 'zlib':
+            raw = _ZlibReader(raw)
+        return io.BufferedReader(raw) if isinstance(raw, io.RawIOBase) else raw
+
+    def read(self, snapshot_name: str) -> bytes:
+        entry = self._entry(snapshot_name)
+        if entry['length'] == 0:
+            data = b''
+        else:
+            start = entry['offset']
+            data = self._buffer(start + entry['length'])[start:start + entry['length']]
+        if entry['compression'] == 'zlib':
+            data = zlib.decompress(data)
+        return data
+
+    def equals(self, snapshot_name: str, data: bytes) -> bool:
+        """Compare stored bytes with ``data``; uncompressed entries are compared in place."""
+        entry = self._entry(snapshot_name)
+        if entry['size'] != len(data):
+            return False
+        if entry['compression'] is not None:
+            return self.read(snapshot_name) == data
+        if entry['length'] == 0:
+            return True
+        start = entry['offset']
+        with memoryview(self._buffer(start + entry['length'])) as view, \
+                view[start:start + entry['length']] as stored:
+            return stored == data
+
+    def write(self, snapshot_name: str, data: bytes) -> None:
+        with self.lock:
+            self._write_locked(snapshot_name, data)
+
+    def _write_locked(self, snapshot_name: str, data: bytes) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        self._refresh()
+        duplicate = self._by_digest.get(digest)
+        if duplicate is not None:
+            entry = dict(duplicate)
+        else:
+            payload, compression = data, None
+            if self.compress:
+                compressed = zlib.compress(data)
+                if len(compressed) < len(data):
+                    payload, compression = compressed, 'zlib'
+            with open(self.data_path, 'ab') as f:
+                offset = f.tell()
+                f.write(payload)
+                if self.sync is not None:
+                    self.sync.file(f)
+            if self.sync is not None:
+                self.sync.committed(self.data_path)
+            entry = {
+                'offset': offset,
+                'length': len(payload),
+                'size': len(data),
+                'compression': compression,
+                'sha256': digest,
+            }
+        self._log(snapshot_name, entry)
+
+    def delete(self, snapshot_name: str) -> None:
+        with self.lock:
+            self._refresh()
+            if snapshot_name not in self._entries:
+                raise FileNotFoundError(f"Snapshot not found: {snapshot_name}")
+            self._log(snapshot_name, None)
+
+    def names(self) -> List[str]:
+        return sorted(self.entries)
+
+    def stamp(self, snapshot_name: str) -> Optional[str]:
+        try:
+            entry = self._entry(snapshot_name)
+        except FileNotFoundError:
+            return None
+        return f"{entry['size']}@{entry['offset']}"
+
+    def size(self, snapshot_name: str) -> int:
+        return self._entry(snapshot_name)['size']
+
+    def digest(self, snapshot_name: str) -> Optional[str]:
+        return self._entry(snapshot_name)['sha256']
+
+    def compact(self) -> int:
+        """Rewrite the pack with only live entries; returns bytes reclaimed."""
+        with self.lock:
+            return self._compact_locked()
+
+    def _compact_locked(self) -> int:
+        entries = self._read_index()
+        old_size = self.data_path.stat().st_size if self.data_path.exists() else 0
+        tmp_path = self.data_path.with_name(f"{PACK_FILENAME}.{os.getpid()}.tmp")
+        by_digest: Dict[str, Dict[str, Any]] = {}
+        new_entries = {}
+        with open(tmp_path, 'wb') as out:
+            for snapshot_name in sorted(entries):
+                entry = entries[snapshot_name]
+                moved = by_digest.get(entry['sha256'])
+                if moved is None:
+                    start = entry['offset']
+                    payload = self._buffer(start + entry['length'])[start:start + entry['length']] \
+                        if entry['length'] else b''
+                    moved = dict(entry, offset=out.tell())
+                    out.write(payload)
+                    by_digest[entry['sha256']] = moved
+                new_entries[snapshot_name] = dict(moved)
+            if self.sync is not None:
+                self.sync.file(out)
+        self.close()
+        os.replace(tmp_path, self.data_path)
+        if self.sync is not None:
+            self.sync.committed(self.data_path)
+        self._write_index(new_entries)
+        return old_size - self.data_path.stat().st_size
+
+
+def _log_header(generation: int) -> bytes:
+    return json.dumps({'generation': generation}).encode('utf-8') + b'\n'
+
+
+def _log_generation(line: bytes) -> Optional[int]:
+    try:
+        return json.loads(line).get('generation')
+    except (ValueError, AttributeError):
+        return None
+
+
+def open_store(
+    root: Path,
+    kind: Optional[str] = None,
+    compress: bool = False,
+    sync: Optional[SyncPolicy] = None
+):
+    """Return the store for a snapshot directory, detecting the layout if unset."""
+    if kind is None:
+        kind = 'pack' if PackStore.detect(root) else 'directory'
+    if kind == 'pack':
+        return PackStore(root, compress=compress, sync=sync)
+    if kind == 'directory':
+        return DirectoryStore(root, sync=sync)
+    raise ValueError(f"Unknown snapshot store: {kind}")
+
+
+def pack_snapshots(
+    root: Path,
+    compress: bool = False,
+    sync: Optional[SyncPolicy] = None
+) -> int:
+    """Move every ``.snapshot`` file in a directory into a pack; returns the count."""
+    with DirectoryLock(root):
+        return _pack_snapshots(root, compress, sync)
+
+
+def _pack_snapshots(root: Path, compress: bool, sync: Optional[SyncPolicy]) -> int:
+    source = DirectoryStore(root)
+    target = PackStore(root, compress=compress, sync=sync)
+    names = source.names()
+    entries = target._read_index()
+    by_digest = {e['sha256']: e for e in entries.values()}
+    with open(target.data_path, 'ab') as f:
+        for snapshot_name in names:
+            data = source.read(snapshot_name)
+            digest = hashlib.sha256(data).hexdigest()
+            entry = by_digest.get(digest)
+            if entry is None:
+                payload, compression = data, None
+                if compress:
+                    compressed = zlib.compress(data)
+                    if len(compressed) < len(data):
+                        payload, compression = compressed, 'zlib'
+                entry = {
+                    'offset': f.tell(),
+                    'length': len(payload),
+                    'size': len(data),
+                    'compression': compression,
+                    'sha256': digest,
+                }
+                f.write(payload)
+                by_digest[digest] = entry
+            entries[snapshot_name] = dict(entry)
+        if sync is not None:
+            sync.file(f)
+    if sync is not None:
+        sync.committed(target.data_path)
+    target.compress = compress
+    target._write_index(entries)
+    for snapshot_name in names:
+        source.delete(snapshot_name)
+    return len(names)
+
+
+def unpack_snapshots(root: Path, sync: Optional[SyncPolicy] = None) -> int:
+    """Write every packed snapshot back out as a file and remove the pack."""
+    with DirectoryLock(root):
+        return _unpack_snapshots(root, sync)
+
+
+def _unpack_snapshots(root: Path, sync: Optional[SyncPolicy]) -> int:
+    source = PackStore(root)
+    target = DirectoryStore(root, sync=sync)
+    names = source.names()
+    for snapshot_name in names:
+        target.write(snapshot_name, source.read(snapshot_name))
+    source.close()
+    source.index_path.unlink()
+    for path in (source.log_path, source.data_path):
+        if path.exists():
+            path.unlink()
+    return len(names)
@@ -0,0 +1,149 @@
+"""Canonical JSON/NDJSON snapshots and path-based structural diffs.
+
+Output captured with a ``structure`` is parsed and stored in a canonical
+form: keys sorted, no insignificant whitespace and every number written
+the way Python prints it (``1.50`` and ``1.5e0`` both become ``1.5``).
+Key order and float formatting therefore no longer change the snapshot
+or its digest. ``json`` output must be a single document and is stored
+indented; ``ndjson`` output is any sequence of JSON values (one per line
+or simply concatenated) and is stored one compact value per line.
+
+Documents are decoded one at a time, so a large NDJSON stream never
+exists as one parsed object. A mismatch is described by the paths whose
+values differ rather than by a line diff of the reformatted text.
+"""
+
+import json
+import re
+from typing import Any, Iterator, List, Optional, Tuple
+
+from .diff import DiffTooExpensive, myers_opcodes
+
+STRUCTURES = ('json', 'ndjson')
+
+# Rendered values in a structural diff are cut to this many characters.
+VALUE_WIDTH = 120
+
+Change = Tuple[str, str, Any, Any]
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*\Z')
+
+
+def _check_structure(structure: str) -> None:
+    if structure not in STRUCTURES:
+        raise ValueError(f"Unknown structure: {structure}")
+
+
+def iter_documents(text: str) -> Iterator[Any]:
+    """Decode consecutive JSON values separated by optional whitespace."""
+    pos = _WHITESPACE.match(text).end()
+    while pos < len(text):
+        try:
+            value, pos = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Output is not valid JSON: {e}") from None
+        yield value
+        pos = _WHITESPACE.match(text, pos).end()
+
+
+def parse(text: str, structure: str) -> List[Any]:
+    """Return the documents of structured output as a list.
+
+    ``json`` output must hold exactly one document.
+    """
+    _check_structure(structure)
+    documents = list(iter_documents(text))
+    if structure == 'json' and len(documents) != 1:
+        raise ValueError(
+            f"Output is not a single JSON document ({len(documents)} found); "
+            "use the ndjson structure for a stream of documents"
+        )
+    return documents
+
+
+def _dumps(value: Any, indent: Optional[int] = None) -> str:
+    separators = (',', ': ') if indent else (',', ':')
+    return json.dumps(value, sort_keys=True, ensure_ascii=False,
+                      indent=indent, separators=separators)
+
+
+def canonicalize(text: str, structure: str) -> str:
+    """Return the canonical form of structured output."""
+    _check_structure(structure)
+    if structure == 'json':
+        document, = parse(text, structure)
+        return _dumps(document, indent=2) + '\n'
+    return ''.join(_dumps(document) + '\n' for document in iter_documents(text))
+
+
+def _child(path: str, key: Any) -> str:
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    if _IDENTIFIER.match(key):
+        return f"{path}.{key}"
+    return f"{path}[{json.dumps(key, ensure_ascii=False)}]"
+
+
+def _diff_lists(path: str, expected: List[Any], actual: List[Any]) -> Iterator[Change]:
+    """Align list items by content so an insertion is not reported as a shift."""
+    try:
+        opcodes = myers_opcodes([_dumps(item) for item in expected],
+                                [_dumps(item) for item in actual])
+    except DiffTooExpensive:
+        opcodes = [('replace', 0, len(expected), 0, len(actual))]
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            continue
+        paired = min(i2 - i1, j2 - j1)
+        for offset in range(paired):
+            yield from diff_values(expected[i1 + offset], actual[j1 + offset],
+                                   _child(path, j1 + offset))
+        for i in range(i1 + paired, i2):
+            yield '-', _child(path, i), expected[i], None
+        for j in range(j1 + paired, j2):
+            yield '+', _child(path, j), None, actual[j]
+
+
+def diff_values(expected: Any, actual: Any, path: str = '$') -> Iterator[Change]:
+    """Yield ``(op, path, expected, actual)`` for every difference.
+
+    ``op`` is ``'~'`` for a changed value, ``'-'`` for a removed key or
+    item and ``'+'`` for an added one. List items are reported at their
+    index in ``actual``, or in ``expected`` when removed.
+    """
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(expected.keys() | actual.keys()):
+            if key not in actual:
+                yield '-', _child(path, key), expected[key], None
+            elif key not in expected:
+                yield '+', _child(path, key), None, actual[key]
+            else:
+                yield from diff_values(expected[key], actual[key], _child(path, key))
+    elif isinstance(expected, list) and isinstance(actual, list):
+        yield from _diff_lists(path, expected, actual)
+    # 1, 1.0 and true compare equal in Python but not in JSON.
+    elif type(expected) is not type(actual) or expected != actual:
+        yield '~', path, expected, actual
+
+
+def structural_diff(expected: str, actual: str, structure: str) -> Iterator[Change]:
+    """Diff two structured outputs; see ``diff_values``.
+
+    A ``json`` document is rooted at ``$``; the documents of ``ndjson``
+    output are the items of a list rooted at ``$``.
+    """
+    expected_documents = parse(expected, structure)
+    actual_documents = parse(actual, structure)
+    if structure == 'json':
+        return diff_values(expected_documents[0], actual_documents[0])
+    return diff_values(expected_documents, actual_documents)
+
+
+def render_value(value: Any, width: int = VALUE_WIDTH) -> str:
+    """Render a value compactly for a structural diff line."""
+    text = _dumps(value)
+    if len(text) > width:
+        text = text[:width - 3] + '...'
+    return text
@@ -0,0 +1,404 @@
+"""Manifest loading and parallel suite execution."""
+
+import functools
+import json
+import os
+import shlex
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .atomic import SyncPolicy
+from .normalize import parse_redactions
+from .snapshot import ASYNC_CONCURRENCY, SnapshotManager
+from .trace import Tracer
+
+ENTRY_KEYS = {'name', 'command', 'timeout', 'strip_ansi', 'stream', 'inputs', 'input_mtime', 'env'}
+NORMALIZE_KEYS = {'redact', 'strip_trailing_whitespace'}
+
+# 'process' runs entries in a process pool, 'async' on one event loop.
+ENGINES = ('process', 'async')
+
+_managers: Dict[str, SnapshotManager] = {}
+
+
+def _load_toml(path: Path) -> Dict[str, Any]:
+    """Parse a TOML manifest with tomllib or the tomli backport."""
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise RuntimeError(
+                "TOML manifests require Python 3.11+ or the 'tomli' package"
+            )
+    with path.open('rb') as f:
+        return tomllib.load(f)
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """Load a JSON or TOML manifest and normalize its snapshot entries."""
+    manifest_path = Path(path)
+    if manifest_path.suffix == '.toml':
+        data = _load_toml(manifest_path)
+    else:
+        data = json.loads(manifest_path.read_text(encoding='utf-8'))
+
+    if isinstance(data, list):
+        data = {'snapshots': data}
+    if not isinstance(data, dict) or not isinstance(data.get('snapshots'), list):
+        raise ValueError("Manifest must define a 'snapshots' list")
+
+    defaults = {
+        'timeout': data.get('timeout', 30),
+        'strip_ansi': data.get('strip_ansi', False),
+        'stream': data.get('stream', False),
+        'inputs': None,
+        'input_mtime': data.get('input_mtime', False),
+        'env': [],
+    }
+    entries = []
+    for index, raw in enumerate(data['snapshots']):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Manifest entry {index} must be a table/object")
+        unknown = set(raw) - ENTRY_KEYS
+        if unknown:
+            raise ValueError(
+                f"Manifest entry {index} has unknown keys: {', '.join(sorted(unknown))}"
+            )
+        command = raw.get('command')
+        if isinstance(command, str):
+            command = shlex.split(command)
+        if not command:
+            raise ValueError(f"Manifest entry {index} is missing a command")
+        for key in ('inputs', 'env'):
+            if isinstance(raw.get(key), str):
+                raise ValueError(f"Manifest entry {index}: '{key}' must be a list")
+        entry = dict(defaults)
+        entry.update(raw)
+        entry['command'] = [str(arg) for arg in command]
+        entries.append(entry)
+
+    normalize = data.get('normalize', {})
+    unknown = set(normalize) - NORMALIZE_KEYS
+    if unknown:
+        raise ValueError(f"Unknown normalize keys: {', '.join(sorted(unknown))}")
+    # Validate redaction patterns up front rather than in every worker.
+    parse_redactions(normalize.get('redact'))
+
+    return {
+        'snapshot_dir': data.get('snapshot_dir', '.snapshots'),
+        'normalize': normalize,
+        'snapshots': entries,
+    }
+
+
+def _get_manager(
+    snapshot_dir: str,
+    normalize: Optional[Dict[str, Any]] = None,
+    record_durations: bool = True
+) -> SnapshotManager:
+    """Return a per-process SnapshotManager for the given directory and settings.
+
+    Managers defer fsync; the suite syncs everything written in one pass.
+    """
+    key = json.dumps([snapshot_dir, normalize or {}, record_durations], sort_keys=True)
+    manager = _managers.get(key)
+    if manager is None:
+        manager = _managers[key] = SnapshotManager(
+            snapshot_dir, sync='batch', record_durations=record_durations, **(normalize or {})
+        )
+    return manager
+
+
+def _verify_entry(
+    snapshot_dir: str,
+    entry: Dict[str, Any],
+    include_output: bool = False,
+    normalize: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    trace: bool = False,
+    record_durations: bool = True
+) -> Dict[str, Any]:
+    """Verify a single manifest entry; runs inside a worker process."""
+    manager = _get_manager(snapshot_dir, normalize, record_durations)
+    result = {
+        'name': entry.get('name') or ' '.join(entry['command']),
+        'command': entry['command'],
+    }
+    tracer = Tracer() if trace else None
+    start = time.perf_counter()
+    try:
+        with _traced(tracer, entry):
+            result['name'] = manager._generate_name(entry['command'], entry.get('name'))
+            if entry['stream']:
+                outcome = manager.verify_stream(
+                    entry['command'],
+                    name=entry.get('name'),
+                    strip_ansi=entry['strip_ansi'],
+                    timeout=entry['timeout']
+                )
+            else:
+                outcome = manager.verify(
+                    entry['command'],
+                    name=entry.get('name'),
+                    strip_ansi=entry['strip_ansi'],
+                    timeout=entry['timeout'],
+                    inputs=entry['inputs'],
+                    env=entry['env'],
+                    use_cache=use_cache,
+                    input_mtime=entry.get('input_mtime', False)
+                )
+        _record_outcome(result, outcome, include_output)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    result['duration'] = time.perf_counter() - start
+    result['written'] = manager.sync.take()
+    if tracer is not None:
+        result['trace'] = tracer.records[0]
+    return result
+
+
+def _traced(tracer: Optional[Tracer], entry: Dict[str, Any]):
+    """Record one entry's verification (from any thread or task) as one operation."""
+    if tracer is None:
+        return nullcontext()
+    return tracer.operation('verify', entry['command'])
+
+
+def _record_outcome(
+    result: Dict[str, Any],
+    outcome: Dict[str, Any],
+    include_output: bool
+) -> None:
+    result['status'] = 'passed' if outcome['matches'] else 'failed'
+    result['cached'] = outcome.get('cached', False)
+    if include_output and not outcome['matches']:
+        result['expected'] = outcome['expected']
+        result['actual'] = outcome['actual']
+        if outcome.get('structure'):
+            result['structure'] = outcome['structure']
+        stderr = outcome.get('stderr')
+        if stderr and not stderr['matches']:
+            result['stderr_expected'] = stderr['expected']
+            result['stderr_actual'] = stderr['actual']
+
+
+async def _averify_entry(
+    manager: SnapshotManager,
+    entry: Dict[str, Any],
+    include_output: bool = False,
+    use_cache: bool = True,
+    trace: bool = False
+) -> Dict[str, Any]:
+    """Verify a single manifest entry on the running event loop."""
+    result = {
+        'name': entry.get('name') or ' '.join(entry['command']),
+        'command': entry['command'],
+    }
+    import asyncio
+    import contextvars
+
+    tracer = Tracer() if trace else None
+    start = time.perf_counter()
+    try:
+        with _traced(tracer, entry):
+            result['name'] = manager._generate_name(entry['command'], entry.get('name'))
+            if entry['stream']:
+                # Streaming verification is thread-based; keep it off the loop.
+                # The copied context carries the trace record into the thread.
+                outcome = await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    functools.partial(
+                        contextvars.copy_context().run,
+                        manager.verify_stream,
+                        entry['command'],
+                        name=entry.get('name'),
+                        strip_ansi=entry['strip_ansi'],
+                        timeout=entry['timeout']
+                    )
+                )
+            else:
+                outcome = await manager.averify(
+                    entry['command'],
+                    name=entry.get('name'),
+                    strip_ansi=entry['strip_ansi'],
+                    timeout=entry['timeout'],
+                    inputs=entry['inputs'],
+                    env=entry['env'],
+                    use_cache=use_cache,
+                    input_mtime=entry.get('input_mtime', False)
+                )
+        _record_outcome(result, outcome, include_output)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    result['duration'] = time.perf_counter() - start
+    if tracer is not None:
+        result['trace'] = tracer.records[0]
+    return result
+
+
+async def arun_suite(
+    entries: List[Dict[str, Any]],
+    snapshot_dir: str = '.snapshots',
+    jobs: Optional[int] = None,
+    include_output: bool = False,
+    normalize: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    trace: bool = False,
+    record_durations: bool = True
+) -> AsyncIterator[Dict[str, Any]]:
+    """Verify manifest entries concurrently on one event loop.
+
+    Suited to commands that mostly wait on I/O; ``jobs`` caps how many run
+    at once. Results are yielded as they finish and fsync is batched.
+    With ``trace`` each result carries its trace record under ``'trace'``.
+    """
+    import asyncio
+
+    manager = SnapshotManager(
+        snapshot_dir,
+        sync='batch',
+        max_concurrency=jobs or ASYNC_CONCURRENCY,
+        record_durations=record_durations,
+        **(normalize or {})
+    )
+    tasks = [
+        asyncio.ensure_future(_averify_entry(manager, entry, include_output, use_cache, trace))
+        for entry in entries
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        manager.sync.flush()
+
+
+def run_suite(
+    entries: List[Dict[str, Any]],
+    snapshot_dir: str = '.snapshots',
+    jobs: Optional[int] = None,
+    include_output: bool = False,
+    normalize: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    engine: str = 'process',
+    trace: bool = False,
+    record_durations: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """Verify manifest entries across a process pool, yielding results as they finish.
+
+    Index and run-result files written by the workers are fsynced once,
+    after the last entry, rather than after every write. With ``engine``
+    set to ``'async'`` the entries run on a private event loop instead.
+    With ``trace`` each result carries its per-phase trace record (see
+    ``assert_snapshot.trace``) under ``'trace'``. Sharded runs pass
+    ``record_durations=False`` so every shard partitions the suite from
+    the same recorded durations.
+    """
+    if engine == 'async':
+        yield from drive(arun_suite(
+            entries, snapshot_dir, jobs, include_output, normalize, use_cache, trace,
+            record_durations
+        ))
+        return
+    if engine != 'process':
+        raise ValueError(f"Unknown engine: {engine}")
+
+    sync = SyncPolicy('batch')
+    try:
+        for result in _run_entries(entries, snapshot_dir, jobs,
+                                   (include_output, normalize, use_cache, trace, record_durations)):
+            sync.extend(result.pop('written', ()))
+            yield result
+    finally:
+        sync.flush()
+
+
+def drive(results: AsyncIterator[Any]) -> Iterator[Any]:
+    """Iterate an async generator from synchronous code on a new event loop.
+
+    Used by ``run_suite`` for the async engine and by the ``watch`` command.
+    """
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
+
+
+def _run_entries(
+    entries: List[Dict[str, Any]],
+    snapshot_dir: str,
+    jobs: Optional[int],
+    args: Tuple[Any, ...]
+) -> Iterator[Dict[str, Any]]:
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(entries) <= 1:
+        for entry in entries:
+            yield _verify_entry(snapshot_dir, entry, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(entries))) as executor:
+        futures = [
+            executor.submit(_verify_entry, snapshot_dir, entry, *args)
+            for entry in entries
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def shard_entries(
+    entries: List[Dict[str, Any]],
+    snapshot_dir: str,
+    index: int,
+    count: int
+) -> List[Dict[str, Any]]:
+    """Keep the manifest entries of shard ``index`` of ``count`` (1-based).
+
+    Entries are split by snapshot name, balanced by the durations recorded
+    in ``snapshot_dir`` (see ``SnapshotManager.shard_names``).
+    """
+    manager = SnapshotManager(snapshot_dir)
+    names = []
+    for entry in entries:
+        try:
+            names.append(manager._generate_name(entry['command'], entry.get('name')))
+        except ValueError:
+            # Invalid names still need a home; verifying them reports the error.
+            names.append(entry.get('name') or ' '.join(entry['command']))
+    selected = set(manager.shard_names(names, index, count))
+    return [entry for entry, name in zip(entries, names) if name in selected]
+
+
+def summarize(results: List[Dict[str, Any]], duration: float) -> Dict[str, Any]:
+    """Aggregate per-entry results into suite totals."""
+    counts = {'passed': 0, 'failed': 0, 'error': 0}
+    cached = 0
+    for result in results:
+        counts[result['status']] += 1
+        cached += bool(result.get('cached'))
+    return {
+        'total': len(results),
+        'passed': counts['passed'],
+        'failed': counts['failed'],
+        'errors': counts['error'],
+        'cached': cached,
+        'duration': duration,
+        'success': counts['failed'] == 0 and counts['error'] == 0,
+    }
@@ -0,0 +1,222 @@
+"""Per-phase timing and resource accounting for capture and verify.
+
+A ``Tracer`` records one dict per operation: its duration broken down by
+phase (spawn, run, decode, normalize, read, compare, write, diff...), the
+bytes of command output and snapshot data read and written, and the CPU
+time and peak RSS of the child process.
+
+The current operation lives in a context variable, so instrumented code
+calls the module-level ``phase``/``count``/``note`` helpers without holding
+a tracer, and they cost one lookup when nothing is being traced. Operations
+opened while another is current join it, which lets the CLI wrap a whole
+command (including diff rendering) in one record.
+
+Child CPU time and peak RSS come from ``wait4`` on the command itself (see
+``reap``), so they are exact whatever else ran before or alongside it.
+Without ``wait4`` (Windows) they are not recorded.
+"""
+
+import contextvars
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+REPORT_VERSION = 1
+
+_current: contextvars.ContextVar = contextvars.ContextVar('assert_snapshot_trace', default=None)
+_untraced = nullcontext()
+
+
+def _new_record(op: str, command: Iterable[str]) -> Dict[str, Any]:
+    return {
+        'op': op,
+        'snapshot': None,
+        'command': list(command),
+        'status': None,
+        'duration': 0.0,
+        'phases': {},
+        'output_bytes': 0,
+        'bytes_read': 0,
+        'bytes_written': 0,
+        'cpu_user': None,
+        'cpu_system': None,
+        'max_rss': None,
+    }
+
+
+class Tracer:
+    """Collect a record per capture/verify; pass as ``SnapshotManager(tracer=...)``.
+
+    ``on_record`` is called with each finished record, from the thread or
+    task that ran the operation.
+    """
+
+    def __init__(self, on_record: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.records: List[Dict[str, Any]] = []
+        self.on_record = on_record
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def operation(self, op: str, command: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Record everything inside the block as one operation."""
+        record = _current.get()
+        if record is not None:
+            yield record
+            return
+        record = _new_record(op, command)
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = str(e)
+            raise
+        finally:
+            record['duration'] = time.perf_counter() - start
+            _current.reset(token)
+            with self._lock:
+                self.records.append(record)
+            if self.on_record is not None:
+                self.on_record(record)
+
+    def report(self) -> Dict[str, Any]:
+        return build_report(self.records)
+
+
+def current() -> Optional[Dict[str, Any]]:
+    """Return the record of the operation being traced, if any."""
+    return _current.get()
+
+
+def phase(name: str, record: Optional[Dict[str, Any]] = None):
+    """Add the time spent in the block to phase ``name`` of the current record."""
+    record = record if record is not None else _current.get()
+    if record is None:
+        return _untraced
+    return _timed(record, name)
+
+
+@contextmanager
+def _timed(record: Dict[str, Any], name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = record['phases']
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def count(key: str, amount: int) -> None:
+    """Add ``amount`` to a byte counter of the current record."""
+    record = _current.get()
+    if record is not None:
+        record[key] += amount
+
+
+def note(**fields: Any) -> None:
+    """Set fields (snapshot name, status) on the current record."""
+    record = _current.get()
+    if record is not None:
+        record.update(fields)
+
+
+def rss_bytes(maxrss: int) -> int:
+    """Convert ``ru_maxrss`` (kilobytes on Linux, bytes on macOS) to bytes."""
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def reap(process) -> Any:
+    """Wait for a ``subprocess.Popen`` child and return its own rusage.
+
+    Uses ``wait4``, which reports the usage of that child alone. None is
+    returned where it is unavailable, or when ``Popen`` already reaped the
+    child (``poll`` and ``kill`` do), since its usage is lost by then.
+    """
+    if not hasattr(os, 'wait4'):  # pragma: no cover - Windows
+        process.wait()
+        return None
+    if process.returncode is not None:
+        return None
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = _exit_code(status)
+    return usage
+
+
+def charge_child(usage: Any) -> None:
+    """Add the CPU time and peak RSS of a child reaped by ``reap`` to the current record."""
+    record = _current.get()
+    if record is None or usage is None:
+        return
+    record['cpu_user'] = (record['cpu_user'] or 0.0) + usage.ru_utime
+    record['cpu_system'] = (record['cpu_system'] or 0.0) + usage.ru_stime
+    record['max_rss'] = max(record['max_rss'] or 0, rss_bytes(usage.ru_maxrss))
+
+
+def build_report(records: List[Dict[str, Any]], duration: Optional[float] = None) -> Dict[str, Any]:
+    """Aggregate operation records into the JSON document written by ``--report``."""
+    phases: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        for name, seconds in record['phases'].items():
+            totals = phases.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            totals['count'] += 1
+            totals['total'] += seconds
+            totals['max'] = max(totals['max'], seconds)
+    return {
+        'version': REPORT_VERSION,
+        'duration': duration if duration is not None else sum(r['duration'] for r in records),
+        'operations': records,
+        'phases': phases,
+        'totals': {
+            key: sum(r[key] for r in records)
+            for key in ('output_bytes', 'bytes_read', 'bytes_written')
+        },
+    }
+
+
+def format_bytes(size: Optional[float]) -> str:
+    if size is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def format_profile(report: Dict[str, Any], top: int = 10) -> List[str]:
+    """Render the slowest operations and the phase totals of a report."""
+    operations = sorted(report['operations'], key=lambda r: r['duration'], reverse=True)
+    lines = [f"Slowest snapshots (of {len(operations)}):"]
+    for record in operations[:top]:
+        slowest = max(record['phases'].items(), key=lambda item: item[1], default=None)
+        hint = f"  slowest phase: {slowest[0]} {slowest[1]:.3f}s" if slowest else ''
+        cpu = record['cpu_user']
+        if cpu is not None:
+            hint += f"  cpu {cpu + record['cpu_system']:.3f}s  rss {format_bytes(record['max_rss'])}"
+        name = record['snapshot'] or ' '.join(record['command'])
+        lines.append(f"  {record['duration']:8.3f}s  {name}{hint}")
+
+    total = sum(p['total'] for p in report['phases'].values()) or 1.0
+    lines.append("Phases:")
+    for name, totals in sorted(report['phases'].items(), key=lambda item: item[1]['total'], reverse=True):
+        lines.append(
+            f"  {name:<12} {totals['total']:8.3f}s  {totals['total'] / total:5.1%}  "
+            f"(x{totals['count']}, max {totals['max']:.3f}s)"
+        )
+    totals = report['totals']
+    lines.append(
+        f"Output {format_bytes(totals['output_bytes'])}, "
+        f"read {format_bytes(totals['bytes_read'])}, "
+        f"written {format_bytes(totals['bytes_written'])}"
+    )
+    return lines
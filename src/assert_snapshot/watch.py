@@ -0,0 +1,327 @@
+"""Watch manifest inputs and re-verify only the snapshots they affect.
+
+A watcher wakes up when something changes in the directories holding a
+snapshot's declared ``inputs``: inotify on Linux (through ctypes, no extra
+dependency), polling elsewhere. Bursts of changes are debounced, then the
+size and mtime of each entry's inputs decide which snapshots are affected.
+Those are re-verified concurrently on one event loop; a snapshot whose
+inputs change again while it is being verified has its run cancelled
+(killing the command's process group) and started over.
+"""
+
+import asyncio
+import glob
+import os
+import sys
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from .fingerprint import expand_inputs
+from .snapshot import ASYNC_CONCURRENCY, SnapshotManager
+from .suite import _averify_entry
+
+BACKENDS = ('auto', 'inotify', 'poll')
+
+DEFAULT_DEBOUNCE = 0.1
+DEFAULT_POLL_INTERVAL = 0.5
+
+# inotify(7) event mask: anything that can change a file's contents or presence.
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+            | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF)
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+
+WatchDirs = Set[Tuple[str, bool]]
+
+
+def _existing_ancestor(path: str) -> str:
+    path = os.path.abspath(path)
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def watch_dirs(inputs: Iterable[str]) -> WatchDirs:
+    """Return ``(directory, recursive)`` pairs covering every input pattern.
+
+    A file is covered by its directory, so it is still seen after being
+    replaced by a rename. Directories, ``**`` patterns and the fixed prefix
+    of other globs are covered too, so new matching files are noticed;
+    missing paths are covered by their closest existing ancestor.
+    """
+    dirs: WatchDirs = set()
+    for pattern in inputs:
+        if glob.has_magic(pattern):
+            prefix = pattern
+            while glob.has_magic(prefix):
+                prefix = os.path.dirname(prefix)
+            dirs.add((_existing_ancestor(prefix or '.'), '**' in pattern))
+        elif os.path.isdir(pattern):
+            dirs.add((os.path.abspath(pattern), True))
+        else:
+            dirs.add((_existing_ancestor(os.path.dirname(pattern) or '.'), False))
+        for path in expand_inputs([pattern]):
+            dirs.add((_existing_ancestor(os.path.dirname(path) or '.'), False))
+    return dirs
+
+
+def _expand_dirs(dirs: WatchDirs) -> List[str]:
+    """List every directory to watch, walking the recursive ones."""
+    expanded = set()
+    for directory, recursive in dirs:
+        expanded.add(directory)
+        if recursive:
+            for root, subdirs, _ in os.walk(directory):
+                expanded.update(os.path.join(root, name) for name in subdirs)
+    return sorted(expanded)
+
+
+def input_stamp(inputs: Iterable[str]) -> Tuple[Tuple[str, Optional[Tuple[int, int]]], ...]:
+    """Size and mtime of every input file; changes whenever an input does."""
+    stamp = []
+    for path in expand_inputs(inputs):
+        try:
+            stat = os.stat(path)
+            stamp.append((path, (stat.st_size, stat.st_mtime_ns)))
+        except OSError:
+            stamp.append((path, None))
+    return tuple(stamp)
+
+
+class PollingWatcher:
+    """Detect changes by re-listing the watched directories every interval."""
+
+    def __init__(self, dirs: WatchDirs, interval: float = DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self._closed = threading.Event()
+        self.watch(dirs)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        state = {}
+        for directory in self._dirs:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    stat = entry.stat(follow_symlinks=True)
+                except OSError:
+                    continue
+                state[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return state
+
+    def watch(self, dirs: WatchDirs) -> None:
+        """Replace the watched directories and take a fresh baseline."""
+        self._dirs = _expand_dirs(dirs)
+        self._state = self._scan()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until something changed (True), ``timeout`` passed or close()."""
+        waited = 0.0
+        while not self._closed.is_set():
+            state = self._scan()
+            if state != self._state:
+                self._state = state
+                return True
+            if timeout is not None and waited >= timeout:
+                return False
+            step = self.interval if timeout is None else min(self.interval, timeout - waited)
+            self._closed.wait(step)
+            waited += step
+        return False
+
+    def close(self) -> None:
+        self._closed.set()
+
+
+class InotifyWatcher:
+    """Linux inotify through ctypes; one watch per directory."""
+
+    def __init__(self, dirs: WatchDirs):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self._ctypes = ctypes
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # A pipe lets close() wake a blocked wait().
+        self._wake_r, self._wake_w = os.pipe()
+        self._watched: Set[str] = set()
+        self.watch(dirs)
+
+    def watch(self, dirs: WatchDirs) -> None:
+        """Add watches for any directories not watched yet.
+
+        Directories that disappear keep a dead watch until close(); that is
+        harmless and cheaper than tracking watch descriptors.
+        """
+        for directory in _expand_dirs(dirs):
+            if directory in self._watched:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _IN_MASK)
+            if wd < 0:
+                errno = self._ctypes.get_errno()
+                if not os.path.isdir(directory):
+                    continue
+                raise OSError(errno, f"Cannot watch {directory}: {os.strerror(errno)}")
+            self._watched.add(directory)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until an event arrives (True), ``timeout`` passed or close()."""
+        import select
+
+        readable, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+        if self._fd not in readable:
+            return False
+        # Only the fact that something changed matters; drain the events.
+        while True:
+            try:
+                if not os.read(self._fd, 64 * 1024):
+                    break
+            except BlockingIOError:
+                break
+        return True
+
+    def close(self) -> None:
+        try:
+            os.write(self._wake_w, b'x')
+        except OSError:
+            pass
+
+    def __del__(self):
+        for fd in (getattr(self, '_fd', -1), getattr(self, '_wake_r', -1), getattr(self, '_wake_w', -1)):
+            if fd >= 0:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+
+def open_watcher(dirs: WatchDirs, backend: str = 'auto', interval: float = DEFAULT_POLL_INTERVAL):
+    """Create a watcher; ``auto`` uses inotify on Linux and polls elsewhere."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown watch backend: {backend}")
+    if backend == 'poll' or (backend == 'auto' and not sys.platform.startswith('linux')):
+        return PollingWatcher(dirs, interval)
+    try:
+        return InotifyWatcher(dirs)
+    except OSError:
+        if backend == 'inotify':
+            raise
+        # Out of watches or no inotify: polling still works.
+        return PollingWatcher(dirs, interval)
+
+
+def _watch_thread(watcher, dirs: WatchDirs, debounce: float, notify) -> None:
+    """Report each debounced burst of changes by calling ``notify()``."""
+    while watcher.wait():
+        while watcher.wait(debounce):
+            pass
+        watcher.watch(dirs)
+        notify()
+
+
+async def awatch(
+    entries: List[Dict[str, Any]],
+    snapshot_dir: str = '.snapshots',
+    jobs: Optional[int] = None,
+    include_output: bool = True,
+    normalize: Optional[Dict[str, Any]] = None,
+    debounce: float = DEFAULT_DEBOUNCE,
+    backend: str = 'auto',
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    initial: bool = True
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Verify manifest entries, then again whenever their inputs change.
+
+    Yields ``('changed', names)`` for each debounced burst of changes,
+    ``('cancelled', name)`` when a run is abandoned because its inputs
+    changed again, and ``('result', result)`` with a result shaped like
+    ``run_suite``'s as each verification finishes. Runs until closed.
+    Entries without ``inputs`` are only verified by the ``initial`` run.
+    """
+    loop = asyncio.get_running_loop()
+    manager = SnapshotManager(
+        snapshot_dir,
+        max_concurrency=jobs or ASYNC_CONCURRENCY,
+        **(normalize or {})
+    )
+    names = [entry.get('name') or ' '.join(entry['command']) for entry in entries]
+    inputs = [entry.get('inputs') or [] for entry in entries]
+    stamps = [input_stamp(entry_inputs) for entry_inputs in inputs]
+    dirs = watch_dirs(path for entry_inputs in inputs for path in entry_inputs)
+
+    events: asyncio.Queue = asyncio.Queue()
+    running: Dict[int, asyncio.Task] = {}
+
+    def start(index: int) -> Optional[str]:
+        """Start verifying an entry; returns its name if a stale run was cancelled."""
+        stale = running.get(index)
+        cancelled = None
+        if stale is not None and not stale.done():
+            stale.cancel()
+            cancelled = names[index]
+        task = asyncio.ensure_future(_averify_entry(manager, entries[index], include_output))
+        task.add_done_callback(lambda done: events.put_nowait(('done', (index, done))))
+        running[index] = task
+        return cancelled
+
+    watcher = open_watcher(dirs, backend, poll_interval)
+    thread = threading.Thread(
+        target=_watch_thread,
+        args=(watcher, dirs, debounce,
+              lambda: loop.call_soon_threadsafe(events.put_nowait, ('changed', None))),
+        daemon=True
+    )
+    thread.start()
+    try:
+        if initial:
+            for index in range(len(entries)):
+                start(index)
+        while True:
+            kind, payload = await events.get()
+            if kind == 'changed':
+                affected = []
+                for index, entry_inputs in enumerate(inputs):
+                    if not entry_inputs:
+                        continue
+                    stamp = input_stamp(entry_inputs)
+                    if stamp != stamps[index]:
+                        stamps[index] = stamp
+                        affected.append(index)
+                if not affected:
+                    continue
+                # Start every run before yielding, so none waits on the consumer.
+                cancelled = [start(index) for index in affected]
+                yield 'changed', [names[index] for index in affected]
+                for name in cancelled:
+                    if name is not None:
+                        yield 'cancelled', name
+            else:
+                index, task = payload
+                # Cancelled and superseded runs were already reported.
+                if task.cancelled() or running.get(index) is not task:
+                    continue
+                yield 'result', task.result()
+    finally:
+        watcher.close()
+        for task in running.values():
+            task.cancel()
+        await asyncio.gather(*running.values(), return_exceptions=True)
+        thread.join(1)
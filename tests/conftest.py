@@ -0,0 +1,19 @@
+"""Fixtures shared by the test modules."""
+
+import pytest
+
+from assert_snapshot.snapshot import SnapshotManager
+
+pytest_plugins = ['pytester']
+
+
+@pytest.fixture
+def temp_dir(tmp_path):
+    """Temporary directory, removed by pytest."""
+    return tmp_path
+
+
+@pytest.fixture
+def manager(temp_dir):
+    """SnapshotManager on a fresh ``snaps`` directory under ``temp_dir``."""
+    return SnapshotManager(str(temp_dir / 'snaps'))
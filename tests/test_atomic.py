@@ -0,0 +1,103 @@
+"""Tests for atomic writes, sync policies and the directory lock."""
+
+import pytest
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from assert_snapshot.atomic import DirectoryLock, SyncPolicy, atomic_write
+from assert_snapshot.snapshot import SnapshotManager
+
+
+def _capture(args):
+    snapshot_dir, store, index = args
+    manager = SnapshotManager(snapshot_dir, store=store)
+    return manager.capture(['echo', f'output {index}' * 1000], name=f'snap{index}')
+
+
+class TestAtomicWrite:
+    def test_replaces_without_leftovers(self, temp_dir):
+        """Test the target is replaced and no temporary file remains."""
+        target = temp_dir / 'file.txt'
+        target.write_bytes(b'old')
+        atomic_write(target, b'new', SyncPolicy('each'))
+        assert target.read_bytes() == b'new'
+        assert [p.name for p in temp_dir.iterdir()] == ['file.txt']
+
+    def test_failed_write_keeps_original(self, temp_dir):
+        """Test a failing write leaves the old content and cleans up."""
+        target = temp_dir / 'file.txt'
+        target.write_bytes(b'old')
+        with pytest.raises(TypeError):
+            atomic_write(target, 'not bytes')
+        assert target.read_bytes() == b'old'
+        assert [p.name for p in temp_dir.iterdir()] == ['file.txt']
+
+
+class TestSyncPolicy:
+    def test_batch_defers_until_flush(self, temp_dir):
+        """Test batch mode collects paths and syncs them once."""
+        sync = SyncPolicy('batch')
+        atomic_write(temp_dir / 'a', b'a', sync)
+        atomic_write(temp_dir / 'b', b'b', sync)
+        atomic_write(temp_dir / 'a', b'c', sync)
+        assert sync.flush() == 2
+        assert sync.flush() == 0
+
+    def test_take_and_extend(self, temp_dir):
+        """Test pending paths can be handed between policies."""
+        worker, suite = SyncPolicy('batch'), SyncPolicy('batch')
+        atomic_write(temp_dir / 'a', b'a', worker)
+        suite.extend(worker.take())
+        assert worker.flush() == 0
+        assert suite.flush() == 1
+
+    def test_unknown_mode(self):
+        """Test invalid modes are rejected."""
+        with pytest.raises(ValueError):
+            SyncPolicy('sometimes')
+
+
+class TestDirectoryLock:
+    def test_reentrant(self, temp_dir):
+        """Test nested acquisition in one process does not deadlock."""
+        with DirectoryLock(temp_dir):
+            with DirectoryLock(temp_dir):
+                pass
+        assert (temp_dir / '.lock').exists()
+
+    @pytest.mark.skipif(sys.platform == 'win32', reason='flock is POSIX only')
+    def test_excludes_other_processes(self, temp_dir):
+        """Test another process cannot take the lock while it is held."""
+        probe = (
+            "import fcntl, os, sys\n"
+            "fd = os.open(sys.argv[1], os.O_RDWR)\n"
+            "try:\n"
+            "    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)\n"
+            "except BlockingIOError:\n"
+            "    sys.exit(3)\n"
+        )
+        lock_path = str(temp_dir / '.lock')
+        with DirectoryLock(temp_dir):
+            held = subprocess.run([sys.executable, '-c', probe, lock_path])
+        free = subprocess.run([sys.executable, '-c', probe, lock_path])
+        assert held.returncode == 3
+        assert free.returncode == 0
+
+
+class TestConcurrentCapture:
+    @pytest.mark.parametrize('store', ['directory', 'pack'])
+    def test_parallel_captures_are_consistent(self, temp_dir, store):
+        """Test concurrent captures neither tear snapshots nor lose index entries."""
+        snapshot_dir = str(temp_dir / 'snaps')
+        SnapshotManager(snapshot_dir, store=store)
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            names = list(executor.map(
+                _capture, [(snapshot_dir, store, i) for i in range(12)]
+            ))
+
+        manager = SnapshotManager(snapshot_dir)
+        assert sorted(manager.index.names()) == sorted(names)
+        for i in range(12):
+            expected = f'output {i}' * 1000 + '\n'
+            assert manager.read_snapshot(f'snap{i}.snapshot') == expected
+            assert manager.verify(['echo', f'output {i}' * 1000], name=f'snap{i}')['matches']
@@ -0,0 +1,102 @@
+"""Smoke tests for the benchmark harness in benchmarks/."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+import bench  # noqa: E402
+import generators  # noqa: E402
+from assert_snapshot.snapshot import SnapshotManager  # noqa: E402
+
+
+class TestGenerators:
+    def test_deterministic(self):
+        assert generators.make_text(4096) == generators.make_text(4096)
+        assert generators.make_text(4096, seed=1) != generators.make_text(4096)
+
+    def test_make_text_size(self):
+        text = generators.make_text(10_000)
+        assert 10_000 <= len(text) < 10_100
+        assert text.endswith('\n')
+
+    def test_write_text_streams_to_file(self, tmp_path):
+        path = generators.write_text(tmp_path / 'out.txt', 50_000, chunk_lines=100)
+        assert path.stat().st_size >= 50_000
+
+    def test_diverge_changes_requested_fraction(self):
+        lines = generators.make_lines(1000)
+        changed = generators.diverge(lines, 0.1)
+        assert sum(a != b for a, b in zip(lines, changed)) == 100
+        assert generators.diverge(lines, 0.0) != lines
+
+    def test_colorize_strips_back(self, tmp_path):
+        text = generators.make_text(2000)
+        colored = generators.colorize(text)
+        assert colored != text
+        assert SnapshotManager(str(tmp_path))._strip_ansi(colored) == text
+
+
+class TestHarness:
+    def test_run_filtered(self):
+        results = bench.run_benchmarks('quick', pattern='format_diff', repeat=1)
+        assert results['version'] == bench.RESULTS_VERSION
+        assert results['meta']['preset'] == 'quick'
+        names = {entry['benchmark'] for entry in results['results']}
+        assert names == {'format_diff'}
+        entry = results['results'][0]
+        assert entry['min'] <= entry['median']
+        assert len(entry['timings']) == 1
+        json.dumps(results)
+
+    def test_run_throughput(self, monkeypatch):
+        monkeypatch.setitem(bench.PRESETS, 'tiny', {
+            'sizes': [1024], 'lines': [10], 'divergence': [0.5], 'snapshots': [3], 'repeat': 1
+        })
+        results = bench.run_benchmarks('tiny')
+        names = {entry['benchmark'] for entry in results['results']}
+        assert names == set(bench.BENCHMARKS)
+        sized = [entry for entry in results['results'] if 'size' in entry['params']]
+        assert all(entry['mb_per_s'] for entry in sized)
+
+
+def _results(*medians):
+    return {
+        'version': bench.RESULTS_VERSION,
+        'results': [
+            {'benchmark': 'verify', 'params': {'size': index}, 'median': median}
+            for index, median in enumerate(medians)
+        ],
+    }
+
+
+class TestCompare:
+    def test_flags_regressions(self):
+        rows = bench.compare_results(_results(0.010, 0.010), _results(0.011, 0.020))
+        assert [row['regression'] for row in rows] == [False, True]
+
+    def test_ignores_small_absolute_delta(self):
+        rows = bench.compare_results(_results(0.0001), _results(0.0005))
+        assert not rows[0]['regression']
+
+    def test_skips_unmatched(self):
+        rows = bench.compare_results(_results(0.01), _results(0.01, 0.02))
+        assert len(rows) == 1
+
+    def test_exit_code(self, tmp_path, capsys):
+        base = tmp_path / 'base.json'
+        new = tmp_path / 'new.json'
+        base.write_text(json.dumps(_results(0.01)))
+        new.write_text(json.dumps(_results(0.05)))
+        assert bench.main(['compare', str(base), str(base)]) == 0
+        assert bench.main(['compare', str(base), str(new)]) == 1
+        assert 'REGRESSION' in capsys.readouterr().out
+
+    def test_rejects_unknown_version(self, tmp_path):
+        path = tmp_path / 'old.json'
+        path.write_text(json.dumps({'version': 0, 'results': []}))
+        with pytest.raises(SystemExit):
+            bench.main(['compare', str(path), str(path)])
@@ -0,0 +1,213 @@
+"""Tests for byte-exact binary snapshots and separate stderr."""
+
+import asyncio
+import json
+import pytest
+import sys
+from pathlib import Path
+import shutil
+from click.testing import CliRunner
+from assert_snapshot.cli import cli
+from assert_snapshot.client import decode_message, encode_message
+from assert_snapshot.formatter import format_diff_stat, iter_diff, render_bytes
+from assert_snapshot.snapshot import SnapshotManager, encode_snapshot, mismatched_streams, stderr_name
+from assert_snapshot.suite import run_suite
+
+
+def emit(stdout: bytes, stderr: bytes = b''):
+    """A command writing the given raw bytes to stdout and stderr."""
+    script = (
+        'import sys; '
+        f'sys.stdout.buffer.write({stdout!r}); sys.stdout.flush(); '
+        f'sys.stderr.buffer.write({stderr!r})'
+    )
+    return [sys.executable, '-c', script]
+
+
+BLOB = b'\x89PNG\r\n\x1a\n\x00\xff\xfe\r\n'
+
+
+class TestBinaryCapture:
+    def test_round_trip(self, manager):
+        """Test invalid UTF-8 and CRLF are stored and compared unchanged."""
+        snapshot_name = manager.capture(emit(BLOB), name='blob', binary=True)
+        assert manager.read_snapshot(snapshot_name) == BLOB
+        assert manager.index.get(snapshot_name)['binary']
+        result = manager.verify(emit(BLOB), name='blob')
+        assert result['matches']
+        assert result['actual'] == BLOB
+
+    def test_mismatch(self, manager):
+        manager.capture(emit(BLOB), name='blob', binary=True)
+        result = manager.verify(emit(BLOB[:-1] + b'\x00'), name='blob')
+        assert not result['matches']
+        assert result['expected'] == BLOB
+        assert manager.results.load('blob.snapshot')['output'] == BLOB[:-1] + b'\x00'
+        manager.accept_last_run('blob.snapshot')
+        assert manager.read_snapshot('blob.snapshot') == BLOB[:-1] + b'\x00'
+        assert manager.index.get('blob.snapshot')['binary']
+
+    def test_text_mode_needs_utf8(self, manager):
+        """Test output that is not UTF-8 can only be snapshotted in binary mode."""
+        with pytest.raises(UnicodeDecodeError):
+            manager.capture(emit(BLOB), name='blob')
+
+    def test_rejects_normalization(self, temp_dir):
+        manager = SnapshotManager(str(temp_dir / 'snaps'), strip_trailing_whitespace=True)
+        with pytest.raises(ValueError):
+            manager.capture(emit(BLOB), name='blob', binary=True)
+        with pytest.raises(ValueError):
+            SnapshotManager(str(temp_dir / 'snaps')).capture(
+                emit(BLOB), name='blob', binary=True, strip_ansi=True
+            )
+
+    def test_packed_store(self, manager):
+        """Test binary compare works in place on both pack layouts."""
+        manager.capture(emit(BLOB), name='blob', binary=True)
+        for compress in (False, True):
+            manager.pack(compress=compress)
+            assert manager.store.equals('blob.snapshot', encode_snapshot(BLOB))
+            assert not manager.store.equals('blob.snapshot', encode_snapshot(BLOB[:-1] + b'?'))
+            assert manager.verify(emit(BLOB), name='blob')['matches']
+
+    def test_async_verify(self, manager):
+        manager.capture(emit(BLOB), name='blob', binary=True)
+        assert asyncio.run(manager.averify(emit(BLOB), name='blob'))['matches']
+
+    def test_stream_rejected(self, manager):
+        manager.capture(emit(BLOB), name='blob', binary=True)
+        with pytest.raises(ValueError):
+            manager.verify_stream(emit(BLOB), name='blob')
+
+
+class TestModesKeptWithSnapshots:
+    """The index is a local cache; a fresh clone only has the snapshot files."""
+
+    def test_binary_without_index(self, manager):
+        manager.capture(emit(BLOB), name='blob', binary=True)
+        shutil.rmtree(manager.snapshot_dir / '.index')
+        clone = SnapshotManager(str(manager.snapshot_dir))
+        assert clone.read_snapshot('blob.snapshot') == BLOB
+        assert clone.verify(emit(BLOB), name='blob')['matches']
+        assert clone.list_snapshots(details=True)[0]['binary']
+
+    def test_separate_stderr_without_index(self, manager):
+        manager.capture(emit(b'out\n', b'err\n'), name='both', separate_stderr=True)
+        shutil.rmtree(manager.snapshot_dir / '.index')
+        result = SnapshotManager(str(manager.snapshot_dir)).verify(emit(b'out\n', b'err\n'), name='both')
+        assert result['matches']
+        assert result['stderr']['matches']
+
+    def test_text_that_looks_like_a_header(self, manager):
+        text = '#assert-snapshot binary\n'
+        manager.capture(emit(text.encode()), name='odd')
+        assert manager.read_snapshot('odd.snapshot') == text
+        shutil.rmtree(manager.snapshot_dir / '.index')
+        clone = SnapshotManager(str(manager.snapshot_dir))
+        assert clone.verify(emit(text.encode()), name='odd')['matches']
+        assert clone.verify_stream(emit(text.encode()), name='odd')['matches']
+
+
+class TestSeparateStderr:
+    def test_streams_stored_apart(self, manager):
+        snapshot_name = manager.capture(emit(b'out\n', b'err\n'), name='both', separate_stderr=True)
+        assert manager.read_snapshot(snapshot_name) == 'out\n'
+        assert manager.read_snapshot(stderr_name(snapshot_name)) == 'err\n'
+        assert manager.verify(emit(b'out\n', b'err\n'), name='both')['matches']
+
+    def test_stream_swap_detected(self, manager):
+        """Test output moving between streams fails, unlike the merged default."""
+        manager.capture(emit(b'out\n', b'err\n'), name='both', separate_stderr=True)
+        result = manager.verify(emit(b'out\nerr\n'), name='both')
+        assert not result['matches']
+        streams = mismatched_streams(result)
+        assert [name for name, _, _ in streams] == ['both.snapshot', 'both.stderr.snapshot']
+
+    def test_stderr_only_mismatch(self, manager):
+        manager.capture(emit(b'out\n', b'err\n'), name='both', separate_stderr=True)
+        result = manager.verify(emit(b'out\n', b'changed\n'), name='both')
+        assert not result['matches']
+        assert result['stderr']['actual'] == 'changed\n'
+        assert manager.last_runs() == ['both.stderr.snapshot']
+
+    def test_recapture_merged_drops_companion(self, manager):
+        manager.capture(emit(b'out\n', b'err\n'), name='both', separate_stderr=True)
+        manager.capture(emit(b'out\n', b'err\n'), name='both')
+        assert manager.list_snapshots() == ['both.snapshot']
+
+    def test_reserved_suffix(self, manager):
+        with pytest.raises(ValueError):
+            manager.capture(['echo', 'x'], name='log.stderr')
+
+
+class TestRenderBytes:
+    def test_escaped(self):
+        assert render_bytes(b'ok\n\x00\xff\t') == 'ok\n\\x00\\xff\t'
+        assert render_bytes('é'.encode('utf-8')) == 'é'
+
+    def test_hex(self):
+        dump = render_bytes(bytes(range(20)), 'hex').splitlines()
+        assert dump[0] == '00000000: 0001 0203 0405 0607 0809 0a0b 0c0d 0e0f  ................'
+        assert dump[1].startswith('00000010: 1011 1213')
+
+    def test_unknown_style(self):
+        with pytest.raises(ValueError):
+            render_bytes(b'x', 'base64')
+
+    def test_diff_of_bytes(self):
+        lines = list(iter_diff(b'a\n\x00\n', b'a\n\x01\n', color=False))
+        assert '-\\x00\n' in lines and '+\\x01\n' in lines
+        assert '1 insertion' in format_diff_stat(b'a', b'b', binary_style='hex')
+
+    def test_message_round_trip(self):
+        message = {'result': {'expected': BLOB, 'actual': 'text'}}
+        assert decode_message(encode_message(message)) == message
+
+
+class TestBinaryCLI:
+    def test_capture_and_verify(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            result = runner.invoke(cli, ['capture', '--name', 'blob', '--binary', '--', *emit(BLOB)])
+            assert result.exit_code == 0
+            result = runner.invoke(cli, ['verify', '--name', 'blob', '--', *emit(BLOB)])
+            assert result.exit_code == 0
+
+            changed = emit(BLOB.replace(b'\xff', b'\xfd'))
+            result = runner.invoke(cli, ['verify', '--name', 'blob', '--binary-diff', 'hex', '--', *changed])
+            assert result.exit_code == 1
+            assert '00000000:' in result.output
+
+    def test_separate_stderr_diff(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'both', '--separate-stderr', '--', *emit(b'o\n', b'e\n')])
+            result = runner.invoke(cli, ['verify', '--name', 'both', '--', *emit(b'o\n', b'x\n')])
+            assert result.exit_code == 1
+            assert 'both.stderr.snapshot' in result.output
+            assert '+x' in result.output
+
+    def test_run_shows_stderr_diff(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'both', '--separate-stderr', '--', *emit(b'o\n', b'e\n')])
+            manifest = {'snapshots': [{'name': 'both', 'command': emit(b'o\n', b'x\n')}]}
+            Path('m.json').write_text(json.dumps(manifest))
+            result = runner.invoke(cli, ['run', 'm.json', '--diff'])
+            assert result.exit_code == 1
+            assert 'both.snapshot (stderr)' in result.output
+
+
+class TestBinarySuite:
+    @pytest.mark.parametrize('engine', ['process', 'async'])
+    def test_suite_reports_stderr(self, temp_dir, engine):
+        snapshot_dir = str(temp_dir / 'snaps')
+        SnapshotManager(snapshot_dir).capture(
+            emit(BLOB, b'e'), name='blob', binary=True, separate_stderr=True
+        )
+        entries = [{'name': 'blob', 'command': emit(BLOB, b'x'), 'timeout': 5, 'strip_ansi': False,
+                    'stream': False, 'inputs': None, 'env': []}]
+        result, = run_suite(entries, snapshot_dir, jobs=1, include_output=True, engine=engine)
+        assert result['status'] == 'failed'
+        assert result['stderr_expected'] == b'e'
+        assert result['stderr_actual'] == b'x'
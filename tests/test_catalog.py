@@ -0,0 +1,256 @@
+"""Tests for the snapshot catalog: statuses, filtered listing, delete and gc."""
+
+import json
+import time
+import pytest
+from pathlib import Path
+from click.testing import CliRunner
+from assert_snapshot.catalog import StatusStore, format_age, parse_age, parse_size
+from assert_snapshot.cli import cli
+from assert_snapshot.snapshot import SnapshotManager
+
+
+class TestParsing:
+    def test_parse_age(self):
+        assert parse_age('90') == 90
+        assert parse_age('30m') == 1800
+        assert parse_age('1.5h') == 5400
+        assert parse_age('2w') == 14 * 86400
+        with pytest.raises(ValueError):
+            parse_age('soon')
+
+    def test_parse_size(self):
+        assert parse_size('512') == 512
+        assert parse_size('10k') == 10240
+        assert parse_size('2MB') == 2 * 1024 * 1024
+        with pytest.raises(ValueError):
+            parse_size('-1')
+
+    def test_format_age(self):
+        assert format_age(None) == '-'
+        assert format_age(5) == '5s'
+        assert format_age(3 * 86400 + 10) == '3d'
+
+
+class TestStatusStore:
+    def test_capture_then_verify(self, temp_dir):
+        store = StatusStore(temp_dir / '.status')
+        store.captured('a.snapshot', when=10.0)
+        assert store.get('a.snapshot') == {'captured': 10.0, 'verified': None, 'status': None}
+        store.verified('a.snapshot', False, when=20.0)
+        assert store.get('a.snapshot') == {'captured': 10.0, 'verified': 20.0, 'status': 'failed'}
+        store.captured('a.snapshot', when=30.0)
+        assert store.get('a.snapshot')['status'] is None
+        assert store.names() == ['a.snapshot']
+
+    def test_suite_marker_is_not_a_snapshot(self, temp_dir):
+        store = StatusStore(temp_dir / '.status')
+        store.mark_suite(5.0, ['b.snapshot', 'a.snapshot', 'a.snapshot'])
+        assert store.last_suite() == {'started': 5.0, 'names': ['a.snapshot', 'b.snapshot'],
+                                      'managed': ['a.snapshot', 'b.snapshot']}
+        assert store.names() == []
+
+    def test_suite_runs_accumulate_managed_names(self, temp_dir):
+        store = StatusStore(temp_dir / '.status')
+        store.mark_suite(5.0, ['a.snapshot', 'b.snapshot'])
+        store.mark_suite(6.0, ['c.snapshot'])
+        assert store.last_suite()['names'] == ['c.snapshot']
+        assert store.last_suite()['managed'] == ['a.snapshot', 'b.snapshot', 'c.snapshot']
+        store.unmanage(['a.snapshot'])
+        assert store.last_suite()['managed'] == ['b.snapshot', 'c.snapshot']
+
+    def test_records_are_sharded(self, temp_dir):
+        """Test records share a bounded number of shard files."""
+        store = StatusStore(temp_dir / '.status')
+        for i in range(300):
+            store.captured(f'{i}.snapshot', when=1.0)
+        store.verified('7.snapshot', True, when=2.0)
+        assert len(list((temp_dir / '.status').glob('*.json'))) <= 256
+        assert len(store.names()) == 300
+        assert StatusStore(temp_dir / '.status').get('7.snapshot')['status'] == 'passed'
+        store.discard('7.snapshot')
+        assert store.get('7.snapshot') is None
+
+
+class TestLocalState:
+    def test_gitignore_covers_local_state(self, manager):
+        manager.capture(['echo', 'a'], name='a')
+        manager.verify(['echo', 'a'], name='a')
+        ignored = (manager.snapshot_dir / '.gitignore').read_text().split()
+        local = {p.name for p in manager.snapshot_dir.iterdir()} - {'a.snapshot', '.gitignore'}
+        assert local
+        assert all(f'/{name}/' in ignored or f'/{name}' in ignored for name in local)
+
+    def test_existing_gitignore_is_kept(self, temp_dir):
+        (temp_dir / 'snaps').mkdir()
+        (temp_dir / 'snaps' / '.gitignore').write_text('custom\n')
+        SnapshotManager(str(temp_dir / 'snaps'))
+        assert (temp_dir / 'snaps' / '.gitignore').read_text() == 'custom\n'
+
+
+class TestQueries:
+    def test_verify_records_status(self, manager):
+        manager.capture(['echo', 'a'], name='a')
+        manager.capture(['echo', 'b'], name='b')
+        manager.capture(['echo', 'c'], name='c')
+        manager.verify(['echo', 'a'], name='a')
+        manager.verify(['echo', 'changed'], name='b')
+        assert manager.list_snapshots(status='passed') == ['a.snapshot']
+        assert manager.list_snapshots(status='failed') == ['b.snapshot']
+        assert manager.list_snapshots(status='unverified') == ['c.snapshot']
+
+    def test_stream_and_cached_verifies_count(self, manager, temp_dir):
+        source = temp_dir / 'in.txt'
+        source.write_text('x')
+        manager.capture(['cat', str(source)], name='cat')
+        manager.verify_stream(['cat', str(source)], name='cat')
+        assert manager.status.get('cat.snapshot')['status'] == 'passed'
+        manager.verify(['cat', str(source)], name='cat', inputs=[str(source)])
+        before = manager.status.get('cat.snapshot')['verified']
+        assert manager.verify(['cat', str(source)], name='cat', inputs=[str(source)])['cached']
+        assert manager.status.get('cat.snapshot')['verified'] >= before
+
+    def test_size_and_age_filters(self, manager):
+        manager.capture(['echo', 'a'], name='small')
+        manager.capture(['seq', '1', '1000'], name='large')
+        assert manager.list_snapshots(min_size=1024) == ['large.snapshot']
+        assert manager.list_snapshots(max_size=10) == ['small.snapshot']
+        assert manager.list_snapshots(older_than=3600) == []
+        manager.status.discard('small.snapshot')
+        assert manager.list_snapshots(older_than=3600) == ['small.snapshot']
+
+    def test_details(self, manager):
+        manager.capture(['echo', 'a'], name='a')
+        manager.verify(['echo', 'a'], name='a')
+        detail, = manager.list_snapshots(details=True)
+        assert detail['name'] == 'a.snapshot'
+        assert detail['status'] == 'passed'
+        assert detail['command'] == ['echo', 'a']
+        assert detail['verified'] >= detail['captured']
+
+
+class TestDeleteAndGc:
+    def test_delete_snapshot(self, manager):
+        manager.capture(['sh', '-c', 'echo o; echo e >&2'], name='both', separate_stderr=True)
+        manager.verify(['sh', '-c', 'echo o; echo x >&2'], name='both')
+        assert manager.delete_snapshot('both') == ['both.snapshot', 'both.stderr.snapshot']
+        assert manager.list_snapshots() == []
+        assert manager.last_runs() == []
+        assert manager.status.names() == []
+        with pytest.raises(FileNotFoundError):
+            manager.delete_snapshot('both.snapshot')
+
+    def test_gc_needs_a_suite_run(self, manager):
+        with pytest.raises(FileNotFoundError):
+            manager.gc()
+
+    def test_gc_prunes_untouched(self, manager):
+        for name in ('kept', 'old', 'new', 'manual'):
+            manager.capture(['echo', name], name=name)
+        manager.capture(['sh', '-c', 'echo o; echo e >&2'], name='old2', separate_stderr=True)
+        manager.mark_suite_run(0.0, ['kept.snapshot', 'old.snapshot', 'old2.snapshot', 'new.snapshot'])
+        manager.status.discard('kept.snapshot')
+        manager.status.discard('manual.snapshot')
+        time.sleep(0.01)
+        manager.mark_suite_run(time.time(), ['kept.snapshot'])
+        manager.capture(['echo', 'new'], name='new')
+
+        assert manager.stale_snapshots() == ['old.snapshot', 'old2.snapshot', 'old2.stderr.snapshot']
+        assert manager.gc(dry_run=True)['stale'] == manager.stale_snapshots()
+        assert len(manager.list_snapshots()) == 6
+        manager.gc()
+        assert manager.list_snapshots() == ['kept.snapshot', 'manual.snapshot', 'new.snapshot']
+        assert 'old.snapshot' not in manager.status.last_suite()['managed']
+
+    def test_gc_keeps_snapshots_no_run_produced(self, manager):
+        """Test hand-captured snapshots are never stale, however old."""
+        manager.capture(['echo', 'a'], name='a')
+        manager.capture(['echo', 'manual'], name='manual')
+        manager.status.discard('manual.snapshot')
+        manager.mark_suite_run(time.time(), ['a.snapshot'])
+        assert manager.stale_snapshots() == []
+
+    def test_gc_removes_orphaned_records(self, manager):
+        manager.capture(['echo', 'a'], name='a')
+        manager.durations.record('gone.snapshot', 1.0)
+        manager.status.captured('gone.snapshot')
+        manager.mark_suite_run(0.0, ['a.snapshot'])
+        assert manager.gc() == {'stale': [], 'orphans': ['gone.snapshot']}
+        assert manager.durations.get('gone.snapshot') is None
+        assert manager.status.names() == ['a.snapshot']
+
+
+class TestCatalogCLI:
+    def test_run_then_gc(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            for name in ('a', 'b', 'stale', 'manual'):
+                runner.invoke(cli, ['capture', '--name', name, 'echo', name])
+            entries = [{'name': 'a', 'command': ['echo', 'a']}, {'name': 'b', 'command': ['echo', 'x']}]
+            Path('m.json').write_text(json.dumps({'snapshots': entries + [{'name': 'stale', 'command': ['echo', 'stale']}]}))
+
+            result = runner.invoke(cli, ['gc'])
+            assert result.exit_code == 1
+            runner.invoke(cli, ['run', 'm.json'])
+            time.sleep(0.01)
+            Path('m.json').write_text(json.dumps({'snapshots': entries}))
+            runner.invoke(cli, ['run', 'm.json'])
+
+            result = runner.invoke(cli, ['list', '--status', 'failed'])
+            assert 'b.snapshot' in result.output and 'a.snapshot' not in result.output
+            result = runner.invoke(cli, ['list', '--long'])
+            assert 'unverified' in result.output
+
+            result = runner.invoke(cli, ['gc', '--dry-run'])
+            assert 'Would delete 1 stale snapshot(s)' in result.output
+            result = runner.invoke(cli, ['gc'])
+            assert result.exit_code == 0
+            assert SnapshotManager().list_snapshots() == ['a.snapshot', 'b.snapshot', 'manual.snapshot']
+
+    def test_gc_snapshot_dir(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            manager = SnapshotManager('snaps')
+            manager.capture(['echo', 'a'], name='a')
+            manager.capture(['echo', 'old'], name='old')
+            entries = [{'name': 'a', 'command': ['echo', 'a']}]
+            Path('m.json').write_text(json.dumps({'snapshot_dir': 'snaps', 'snapshots': entries}))
+            manager.mark_suite_run(0.0, ['a.snapshot', 'old.snapshot'])
+            time.sleep(0.01)
+            runner.invoke(cli, ['run', 'm.json'])
+            result = runner.invoke(cli, ['gc', '--snapshot-dir', 'snaps'])
+            assert result.exit_code == 0
+            assert SnapshotManager('snaps').list_snapshots() == ['a.snapshot']
+
+    def test_commands_take_snapshot_dir(self, temp_dir):
+        """Test list, pack, unpack and update --from-last-run work outside .snapshots."""
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            manager = SnapshotManager('snaps')
+            manager.capture(['echo', 'a'], name='a')
+            manager.verify(['echo', 'b'], name='a')
+
+            result = runner.invoke(cli, ['list', '--snapshot-dir', 'snaps'])
+            assert 'a.snapshot' in result.output
+            result = runner.invoke(cli, ['pack', '--snapshot-dir', 'snaps'])
+            assert 'Packed 1 snapshot(s)' in result.output
+            result = runner.invoke(cli, ['unpack', '--snapshot-dir', 'snaps'])
+            assert 'Unpacked 1 snapshot(s)' in result.output
+            result = runner.invoke(cli, ['update', '--from-last-run', '--yes', '--snapshot-dir', 'snaps'])
+            assert 'Updated 1 of 1 snapshot(s)' in result.output
+            assert SnapshotManager('snaps').read_snapshot('a.snapshot') == 'b\n'
+            assert not Path('.snapshots', 'a.snapshot').exists()
+
+    def test_sharded_run_does_not_mark(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'a', 'echo', 'a'])
+            Path('m.json').write_text(json.dumps({'snapshots': [{'name': 'a', 'command': ['echo', 'a']}]}))
+            runner.invoke(cli, ['run', 'm.json', '--shard', '1/1'])
+            assert SnapshotManager().status.last_suite() is None
+
+    def test_invalid_filters(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            assert runner.invoke(cli, ['list', '--min-size', 'big']).exit_code == 2
+            assert runner.invoke(cli, ['list', '--status', 'flaky']).exit_code == 2
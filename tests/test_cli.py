@@ -84,3 +84,105 @@ class TestCLI:
         """Test error when no command provided."""
         result = runner.invoke(cli, ['capture'])
         assert result.exit_code != 0
+
+
+class TestUpdateFromLastRun:
+    def test_update_reuses_verified_output(self, runner, temp_dir):
+        """Test update accepts the diffed output rather than re-running."""
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'test', 'echo', 'old'])
+            result = runner.invoke(cli, ['update', '--yes', '--name', 'test', 'echo', 'new'])
+            assert result.exit_code == 0
+            assert Path('.snapshots/test.snapshot').read_text() == 'new\n'
+
+    def test_update_from_last_run(self, runner, temp_dir):
+        """Test bulk acceptance of recorded failures by pattern."""
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'api_a', 'echo', 'a'])
+            runner.invoke(cli, ['capture', '--name', 'cli_b', 'echo', 'b'])
+            runner.invoke(cli, ['verify', '--name', 'api_a', 'echo', 'A'])
+            runner.invoke(cli, ['verify', '--name', 'cli_b', 'echo', 'B'])
+            result = runner.invoke(
+                cli, ['update', '--from-last-run', '--pattern', 'api_*', '--yes']
+            )
+            assert result.exit_code == 0
+            assert 'Updated 1 of 1' in result.output
+            assert Path('.snapshots/api_a.snapshot').read_text() == 'A\n'
+            assert Path('.snapshots/cli_b.snapshot').read_text() == 'b\n'
+
+    def test_update_from_last_run_rejects_command(self, runner):
+        """Test --from-last-run cannot be combined with a command."""
+        result = runner.invoke(cli, ['update', '--from-last-run', 'echo', 'x'])
+        assert result.exit_code != 0
+
+    def test_update_requires_command(self, runner):
+        """Test update without a command or --from-last-run fails."""
+        result = runner.invoke(cli, ['update'])
+        assert result.exit_code != 0
+
+
+class TestDiffOptions:
+    def test_verify_diff_stat(self, runner, temp_dir):
+        """Test --diff-stat prints counts instead of the diff."""
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'test', 'echo', 'hello'])
+            result = runner.invoke(cli, ['verify', '--diff-stat', '--name', 'test', 'echo', 'bye'])
+            assert result.exit_code == 1
+            assert '1 insertion(s)(+)' in result.output
+            assert '+bye' not in result.output
+
+    def test_verify_diff_file(self, runner, temp_dir):
+        """Test --diff-file writes an uncolored diff to disk."""
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'test', 'echo', 'hello'])
+            result = runner.invoke(
+                cli, ['verify', '--diff-file', 'out.diff', '--name', 'test', 'echo', 'bye']
+            )
+            assert result.exit_code == 1
+            content = Path('out.diff').read_text()
+            assert '+bye' in content
+            assert '\x1b' not in content
+
+    def test_verify_max_diff_lines(self, runner, temp_dir):
+        """Test --max-diff-lines truncates the diff."""
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'test', 'seq', '1', '50'])
+            result = runner.invoke(
+                cli, ['verify', '--max-diff-lines', '3', '--name', 'test', 'seq', '2', '51']
+            )
+            assert result.exit_code == 1
+            assert 'diff truncated after 3 line(s)' in result.output
+
+
+class TestNormalizeOptions:
+    def test_redact_option(self, runner, temp_dir):
+        """Test --redact hides volatile values on capture and verify."""
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--redact', 'pids', '--name', 'test', 'echo', 'pid=1'])
+            result = runner.invoke(
+                cli, ['verify', '--redact', 'pids', '--name', 'test', 'echo', 'pid=2']
+            )
+            assert result.exit_code == 0
+
+    def test_invalid_redact_option(self, runner, temp_dir):
+        """Test invalid patterns are reported as errors."""
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            result = runner.invoke(cli, ['capture', '--redact', '(', 'echo', 'x'])
+            assert result.exit_code == 1
+            assert 'Invalid redaction pattern' in result.output
+
+
+class TestPackCommands:
+    def test_pack_and_unpack(self, runner, temp_dir):
+        """Test pack/unpack migrate snapshots transparently."""
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'test', 'echo', 'hello'])
+            result = runner.invoke(cli, ['pack', '--compress', '--compact'])
+            assert result.exit_code == 0
+            assert 'Packed 1 snapshot(s)' in result.output
+            assert not Path('.snapshots/test.snapshot').exists()
+            result = runner.invoke(cli, ['verify', '--name', 'test', 'echo', 'hello'])
+            assert result.exit_code == 0
+            result = runner.invoke(cli, ['unpack'])
+            assert 'Unpacked 1 snapshot(s)' in result.output
+            assert Path('.snapshots/test.snapshot').exists()
@@ -0,0 +1,132 @@
+"""Tests for the resident daemon and its thin client."""
+
+import os
+import socket
+import threading
+import pytest
+from assert_snapshot.client import forward, parse_args, request
+from assert_snapshot.snapshot import SnapshotManager
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='needs Unix sockets')
+
+SOCKET_PATH = os.path.join('.snapshots', '.daemon.sock')
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    """Run a daemon for a temporary working directory."""
+    from assert_snapshot.daemon import SnapshotDaemon
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('ASSERT_SNAPSHOT_SOCKET', raising=False)
+    monkeypatch.delenv('ASSERT_SNAPSHOT_NO_DAEMON', raising=False)
+    SnapshotManager().capture(['echo', 'hello'], name='hello')
+    server = SnapshotDaemon(SOCKET_PATH, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestParseArgs:
+    def test_verify_options(self):
+        """Test the supported verify options are translated."""
+        payload = parse_args([
+            'verify', '--name=x', '--timeout', '5', '--input', 'a', '--input', 'b',
+            '--no-cache', '--input-mtime', '--redact', 'uuids', 'echo', 'hi', '--', '--strip-ansi'
+        ])
+        assert payload['op'] == 'verify'
+        assert payload['params'] == {
+            'command': ['echo', 'hi', '--strip-ansi'],
+            'name': 'x',
+            'strip_ansi': False,
+            'timeout': 5,
+            'inputs': ['a', 'b'],
+            'env': [],
+            'use_cache': False,
+            'input_mtime': True,
+        }
+        assert payload['normalize']['redact'] == ['uuids']
+
+    @pytest.mark.parametrize('argv', [
+        ['list'],
+        ['verify', '--help', 'echo'],
+        ['verify', '--stream', 'echo', 'hi'],
+        ['verify', '--diff-stat', 'echo', 'hi'],
+        ['capture', '--input', 'a', 'echo', 'hi'],
+        ['verify', '--timeout', 'soon', 'echo'],
+        ['verify', '--name'],
+        ['capture'],
+    ])
+    def test_unsupported_arguments_fall_through(self, argv):
+        """Test anything the client does not understand is left to click."""
+        assert parse_args(argv) is None
+
+
+class TestDaemon:
+    def test_no_daemon(self, tmp_path, monkeypatch):
+        """Test requests without a daemon fall back to in-process execution."""
+        monkeypatch.chdir(tmp_path)
+        assert request({'op': 'ping'}) is None
+        assert forward(['verify', 'echo', 'hi']) is None
+
+    def test_stale_socket(self, tmp_path, monkeypatch):
+        """Test a leftover socket file with nobody listening is ignored."""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / '.snapshots').mkdir()
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(SOCKET_PATH)
+        stale.close()
+        assert forward(['verify', 'echo', 'hi']) is None
+
+    def test_verify_and_capture(self, daemon, capsys):
+        """Test verify and capture are answered by the daemon."""
+        assert request({'op': 'ping'})['pid'] == os.getpid()
+        assert forward(['verify', '--name', 'hello', 'echo', 'hello']) == 0
+        assert '✓ Snapshot matches' in capsys.readouterr().out
+
+        assert forward(['verify', '--name', 'hello', 'echo', 'bye']) == 1
+        out = capsys.readouterr().out
+        assert '✗ Snapshot mismatch' in out
+        assert 'bye' in out
+
+        assert forward(['capture', '--name', 'new', 'echo', 'new']) == 0
+        assert 'Snapshot saved: new.snapshot' in capsys.readouterr().out
+        assert SnapshotManager().read_snapshot('new.snapshot') == 'new\n'
+
+    def test_missing_snapshot(self, daemon, capsys):
+        """Test errors are reported like the in-process CLI."""
+        assert forward(['verify', '--name', 'missing', 'echo', 'hi']) == 1
+        captured = capsys.readouterr()
+        assert 'Snapshot not found: missing.snapshot' in captured.err
+        assert "Run 'capture' first" in captured.out
+
+    def test_uses_client_environment(self, daemon, monkeypatch, capsys):
+        """Test commands run with the client's environment, not the daemon's."""
+        monkeypatch.setenv('SNAPSHOT_GREETING', 'hi there')
+        command = ['sh', '-c', 'echo $SNAPSHOT_GREETING']
+        assert forward(['capture', '--name', 'env', '--', *command]) == 0
+        assert SnapshotManager().read_snapshot('env.snapshot') == 'hi there\n'
+
+    def test_other_directory_falls_back(self, daemon, tmp_path, monkeypatch):
+        """Test clients in another directory run in-process."""
+        payload = parse_args(['verify', '--name', 'hello', 'echo', 'hello'])
+        payload['cwd'] = str(tmp_path / 'elsewhere')
+        assert request(payload)['fallback'] is True
+
+    def test_sees_snapshots_written_elsewhere(self, daemon, capsys):
+        """Test the daemon's cached index picks up writes from other processes."""
+        assert forward(['verify', '--name', 'hello', 'echo', 'hello']) == 0
+        SnapshotManager().capture(['echo', 'changed'], name='hello')
+        assert forward(['verify', '--name', 'hello', 'echo', 'changed']) == 0
+
+    def test_serve_stop(self, daemon):
+        """Test 'serve --stop' shuts the daemon down."""
+        from click.testing import CliRunner
+        from assert_snapshot.cli import cli
+
+        result = CliRunner().invoke(cli, ['serve', '--stop'])
+        assert result.exit_code == 0
+        assert 'Daemon stopped.' in result.output
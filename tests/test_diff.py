@@ -0,0 +1,117 @@
+"""Tests for the diff engines."""
+
+import difflib
+import random
+import pytest
+from assert_snapshot.diff import (
+    DiffTooExpensive,
+    myers_opcodes,
+    register_backend,
+    summary_diff,
+    unified_diff,
+)
+
+
+def apply_opcodes(a, b, opcodes):
+    """Rebuild the second sequence from opcodes."""
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            out.extend(b[j1:j2])
+    return out
+
+
+def edit_cost(opcodes):
+    """Count inserted plus deleted lines."""
+    return sum(i2 - i1 + j2 - j1 for tag, i1, i2, j1, j2 in opcodes if tag != 'equal')
+
+
+class TestMyers:
+    def test_opcodes_reconstruct_random_inputs(self):
+        """Test Myers opcodes are valid and never worse than difflib."""
+        rng = random.Random(0)
+        for _ in range(500):
+            a = [rng.choice('abcd') for _ in range(rng.randint(0, 10))]
+            b = [rng.choice('abcd') for _ in range(rng.randint(0, 10))]
+            opcodes = myers_opcodes(a, b, max_cost=None)
+            assert apply_opcodes(a, b, opcodes) == b
+            reference = difflib.SequenceMatcher(None, a, b).get_opcodes()
+            assert edit_cost(opcodes) <= edit_cost(reference)
+
+    def test_identical_inputs(self):
+        """Test identical inputs yield a single equal opcode."""
+        assert myers_opcodes(['a', 'b'], ['a', 'b']) == [('equal', 0, 2, 0, 2)]
+
+    def test_max_cost_exceeded(self):
+        """Test the edit budget is enforced."""
+        with pytest.raises(DiffTooExpensive):
+            myers_opcodes(list('abcdef'), list('uvwxyz'), max_cost=3)
+
+    def test_large_similar_inputs(self):
+        """Test a large repetitive input with few edits is diffed."""
+        a = [f'row {i % 10}\n' for i in range(50000)]
+        b = list(a)
+        b[25000] = 'changed\n'
+        lines = list(unified_diff(a, b, algorithm='myers'))
+        assert '+changed\n' in lines
+        assert sum(1 for line in lines if line.startswith('@@')) == 1
+
+
+class TestUnifiedDiff:
+    def test_matches_difflib_format(self):
+        """Test output is line-for-line identical to difflib for the same opcodes."""
+        a = ['a\n', 'b\n', 'c\n', 'd\n', 'e\n', 'f\n', 'g\n', 'h\n', 'i\n']
+        b = ['a\n', 'X\n', 'c\n', 'd\n', 'e\n', 'f\n', 'g\n', 'h\n', 'Y\n', 'i\n']
+        expected = list(difflib.unified_diff(a, b, 'expected', 'actual', lineterm=''))
+        assert list(unified_diff(a, b, algorithm='difflib')) == expected
+        assert list(unified_diff(a, b, algorithm='myers')) == expected
+
+    def test_no_changes(self):
+        """Test identical inputs produce no output with every algorithm."""
+        for algorithm in ('auto', 'myers', 'difflib', 'summary'):
+            assert list(unified_diff(['a'], ['a'], algorithm=algorithm)) == []
+
+    def test_unknown_algorithm(self):
+        """Test unknown algorithms are rejected."""
+        with pytest.raises(ValueError, match='Unknown diff algorithm'):
+            unified_diff(['a'], ['b'], algorithm='nope')
+
+    def test_auto_falls_back_to_summary(self, monkeypatch):
+        """Test oversized inputs switch to the summary."""
+        monkeypatch.setattr('assert_snapshot.diff.SUMMARY_THRESHOLD_LINES', 3)
+        lines = list(unified_diff(['a', 'b'], ['a', 'c']))
+        assert lines[2].startswith('@@ summary')
+
+    def test_auto_falls_back_to_difflib_over_edit_budget(self, monkeypatch):
+        """Test a diff too costly for Myers in auto mode is still shown in full."""
+        monkeypatch.setattr('assert_snapshot.diff.MAX_EDIT_COST', 3)
+        a, b = list('abcdef'), list('uvwxyz')
+        expected = list(difflib.unified_diff(a, b, 'expected', 'actual', lineterm=''))
+        assert list(unified_diff(a, b)) == expected
+        assert list(unified_diff(a, b, algorithm='myers')) == expected
+
+    def test_register_backend(self):
+        """Test custom backends are used by name."""
+        register_backend('everything-changed', lambda a, b: [('replace', 0, len(a), 0, len(b))])
+        lines = list(unified_diff(['a'], ['a'], algorithm='everything-changed'))
+        assert lines[2:] == ['@@ -1 +1 @@', '-a', '+a']
+
+
+class TestSummaryDiff:
+    def test_summary_counts(self):
+        """Test the summary reports first difference and line counts."""
+        a = ['a', 'b', 'c', 'd']
+        b = ['a', 'B', 'c', 'd', 'e']
+        lines = list(summary_diff(a, b))
+        assert ' first difference at line 2:' in lines
+        assert '-b' in lines and '+B' in lines
+        assert lines[-1] == ' 2 line(s) added, 1 line(s) removed'
+
+    def test_summary_truncated_output(self):
+        """Test a missing tail is reported at the end of the shorter input."""
+        lines = list(summary_diff(['a', 'b'], ['a']))
+        assert ' first difference at line 2:' in lines
+        assert '-b' in lines
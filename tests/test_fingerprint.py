@@ -0,0 +1,54 @@
+"""Tests for input fingerprints."""
+
+import os
+import pytest
+from assert_snapshot.fingerprint import compute_fingerprint, expand_inputs
+
+
+@pytest.fixture
+def input_dir(temp_dir):
+    """Temporary directory with a few input files."""
+    (temp_dir / 'src').mkdir()
+    (temp_dir / 'src' / 'a.py').write_text('a')
+    (temp_dir / 'src' / 'b.txt').write_text('b')
+    return temp_dir
+
+
+class TestExpandInputs:
+    def test_globs_and_directories(self, input_dir):
+        """Test globs and directories expand to files."""
+        assert expand_inputs([str(input_dir / 'src' / '*.py')]) == [str(input_dir / 'src' / 'a.py')]
+        assert len(expand_inputs([str(input_dir / 'src')])) == 2
+
+    def test_missing_input_kept(self, input_dir):
+        """Test missing inputs are still part of the fingerprint."""
+        missing = str(input_dir / 'nope.txt')
+        assert expand_inputs([missing]) == [missing]
+
+
+class TestComputeFingerprint:
+    def test_stable(self, input_dir):
+        """Test identical inputs give identical fingerprints."""
+        inputs = [str(input_dir / 'src')]
+        assert compute_fingerprint(['echo'], inputs) == compute_fingerprint(['echo'], inputs)
+
+    def test_content_change(self, input_dir):
+        """Test editing an input changes the fingerprint."""
+        inputs = [str(input_dir / 'src')]
+        before = compute_fingerprint(['echo'], inputs)
+        (input_dir / 'src' / 'a.py').write_text('changed')
+        assert compute_fingerprint(['echo'], inputs) != before
+
+    def test_arguments_and_env(self, input_dir, monkeypatch):
+        """Test arguments and allowlisted env vars are covered."""
+        base = compute_fingerprint(['echo', 'a'], env=['SNAP_TEST_VAR'])
+        assert compute_fingerprint(['echo', 'b'], env=['SNAP_TEST_VAR']) != base
+        monkeypatch.setenv('SNAP_TEST_VAR', '1')
+        assert compute_fingerprint(['echo', 'a'], env=['SNAP_TEST_VAR']) != base
+
+    def test_mtime_mode(self, input_dir):
+        """Test mtime mode notices touched files."""
+        path = input_dir / 'src' / 'a.py'
+        before = compute_fingerprint(['echo'], [str(path)], use_mtime=True)
+        os.utime(path, ns=(1, 1))
+        assert compute_fingerprint(['echo'], [str(path)], use_mtime=True) != before
@@ -1,8 +1,15 @@
 """Tests for diff formatting and interactive prompts."""
 
+import io
 import pytest
 from unittest.mock import patch
-from assert_snapshot.formatter import format_diff, prompt_update
+from assert_snapshot.formatter import (
+    format_diff,
+    format_diff_stat,
+    iter_diff,
+    prompt_update,
+    write_diff,
+)
 
 
 class TestFormatter:
@@ -59,3 +66,60 @@ class TestFormatter:
         """Test prompt retries on invalid input."""
         result = prompt_update()
         assert result is True
+
+
+class TestFormatterAlgorithms:
+    def test_format_diff_summary(self):
+        """Test the summary algorithm keeps the colored format."""
+        diff = format_diff('a\nb\n', 'a\nc\n', algorithm='summary')
+        assert '@@ summary' in diff
+        assert '\x1b[31m-b' in diff
+        assert '\x1b[32m+c' in diff
+
+    def test_format_diff_difflib(self):
+        """Test the difflib backend is still available."""
+        diff = format_diff('a\nb', 'a\nc', algorithm='difflib')
+        assert '-b' in diff and '+c' in diff
+
+
+class TestStreamedDiff:
+    def test_iter_diff_is_lazy(self):
+        """Test iter_diff yields lines without building the whole diff."""
+        lines = iter_diff('a\nb\n', 'a\nc\n')
+        assert next(lines).startswith('---')
+
+    def test_iter_diff_max_lines(self):
+        """Test the line cap truncates with a note."""
+        expected = '\n'.join(str(i) for i in range(100))
+        actual = '\n'.join(str(i) + 'x' for i in range(100))
+        lines = list(iter_diff(expected, actual, max_lines=10, color=False))
+        assert len(lines) == 11
+        assert lines[-1] == '... diff truncated after 10 line(s)'
+
+    def test_iter_diff_max_hunks(self):
+        """Test the hunk cap stops before the next hunk header."""
+        expected = '\n'.join(str(i) for i in range(100))
+        actual = expected.replace('10', 'X').replace('90', 'Y')
+        lines = list(iter_diff(expected, actual, max_hunks=1, color=False))
+        assert sum(1 for line in lines if line.startswith('@@')) == 1
+        assert lines[-1] == '... diff truncated after 1 hunk(s)'
+
+    def test_iter_diff_without_color(self):
+        """Test uncolored output for files."""
+        lines = list(iter_diff('a', 'b', color=False))
+        assert '-a' in lines
+        assert not any('\x1b' in line for line in lines)
+
+    def test_write_diff(self):
+        """Test diff lines are written to the given stream."""
+        stream = io.StringIO()
+        count = write_diff(['--- expected', '+++ actual'], stream)
+        assert count == 2
+        assert stream.getvalue() == '--- expected\n+++ actual\n'
+
+    def test_format_diff_stat(self):
+        """Test the stat summary counts insertions, deletions and hunks."""
+        stat = format_diff_stat('a\nb\nc\n', 'a\nB\nc\nd\n')
+        assert '2 insertion(s)(+)' in stat
+        assert '1 deletion(s)(-)' in stat
+        assert '1 hunk(s)' in stat
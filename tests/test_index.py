@@ -0,0 +1,68 @@
+"""Tests for the snapshot digest index."""
+
+from assert_snapshot.index import SnapshotIndex, content_digest, shard_of
+
+
+class TestSnapshotIndex:
+    def test_set_and_get(self, temp_dir):
+        """Test entries persist across index instances."""
+        index = SnapshotIndex(temp_dir)
+        assert not index.exists()
+        index.set('a.snapshot', {'sha256': 'abc', 'size': 3})
+        assert SnapshotIndex(temp_dir).get('a.snapshot') == {'sha256': 'abc', 'size': 3}
+
+    def test_set_merges_concurrent_writers(self, temp_dir):
+        """Test writers re-read the index instead of clobbering it."""
+        first = SnapshotIndex(temp_dir)
+        second = SnapshotIndex(temp_dir)
+        first.set('a.snapshot', {'size': 1})
+        second.set('b.snapshot', {'size': 2})
+        assert SnapshotIndex(temp_dir).names() == ['a.snapshot', 'b.snapshot']
+
+    def test_remove(self, temp_dir):
+        """Test removing an entry."""
+        index = SnapshotIndex(temp_dir)
+        index.set('a.snapshot', {'size': 1})
+        index.remove('a.snapshot')
+        assert index.get('a.snapshot') is None
+
+    def test_corrupt_shard_is_empty(self, temp_dir):
+        """Test an unreadable shard is treated as empty without hiding the others."""
+        index = SnapshotIndex(temp_dir)
+        index.update({'a.snapshot': {'size': 1}, 'b.snapshot': {'size': 2}})
+        (index.root / f"{shard_of('a.snapshot')}.json").write_text('not json')
+        assert SnapshotIndex(temp_dir).names() == ['b.snapshot']
+
+    def test_set_rewrites_one_shard(self, temp_dir):
+        """Test a set leaves the shards of other entries untouched."""
+        index = SnapshotIndex(temp_dir)
+        names = [f'{i}.snapshot' for i in range(50)]
+        index.update({name: {'size': 1} for name in names})
+        other = next(name for name in names if shard_of(name) != shard_of('0.snapshot'))
+        other_path = index.root / f'{shard_of(other)}.json'
+        before = other_path.stat().st_mtime_ns, other_path.stat().st_ino
+        index.set('0.snapshot', {'size': 2})
+        assert (other_path.stat().st_mtime_ns, other_path.stat().st_ino) == before
+        assert len(list(index.root.iterdir())) <= 50
+
+    def test_refresh_sees_other_writers(self, temp_dir):
+        """Test cached shards are reread only after a refresh."""
+        reader = SnapshotIndex(temp_dir)
+        SnapshotIndex(temp_dir).set('a.snapshot', {'size': 1})
+        assert reader.get('a.snapshot') == {'size': 1}
+        SnapshotIndex(temp_dir).set('a.snapshot', {'size': 2})
+        assert reader.get('a.snapshot') == {'size': 1}
+        reader.refresh()
+        assert reader.get('a.snapshot') == {'size': 2}
+
+    def test_replace_all_drops_stale_shards(self, temp_dir):
+        index = SnapshotIndex(temp_dir)
+        index.update({f'{i}.snapshot': {'size': i} for i in range(20)})
+        index.replace_all({'only.snapshot': {'size': 0}})
+        assert SnapshotIndex(temp_dir).names() == ['only.snapshot']
+        assert len(list(index.root.iterdir())) == 1
+
+    def test_content_digest(self):
+        """Test digests are stable hex SHA-256 values."""
+        assert content_digest('hello') == content_digest('hello')
+        assert len(content_digest('')) == 64
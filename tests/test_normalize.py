@@ -0,0 +1,95 @@
+"""Tests for output normalization."""
+
+import pytest
+from assert_snapshot.normalize import (
+    Normalizer,
+    build_normalizer,
+    parse_redactions,
+)
+
+
+class TestParseRedactions:
+    def test_builtin_and_custom(self):
+        """Test builtin names, raw patterns and tables are accepted."""
+        rules = parse_redactions([
+            'uuids',
+            r'token-\w+',
+            {'pattern': r'port \d+', 'replacement': 'port N'},
+        ])
+        assert rules[0][1] == '<UUID>'
+        assert rules[1] == (r'token-\w+', '<REDACTED>')
+        assert rules[2] == (r'port \d+', 'port N')
+
+    def test_invalid_pattern(self):
+        """Test broken regexes are reported."""
+        with pytest.raises(ValueError, match='Invalid redaction pattern'):
+            parse_redactions(['(unclosed'])
+
+    def test_patterns_must_combine(self):
+        """Test rules that only break once joined into one regex are rejected up front."""
+        with pytest.raises(ValueError, match='scoped'):
+            parse_redactions(['(?i)secret'])
+        with pytest.raises(ValueError, match='backreference'):
+            parse_redactions([r'(a)\1'])
+        with pytest.raises(ValueError, match='Invalid redaction patterns'):
+            parse_redactions([r'(?P<id>\d+)', r'(?P<id>[a-f]+)'])
+        rules = parse_redactions([r'(?i:secret)', r'(?P<q>["\'])\w+(?P=q)', r'\\1'])
+        normalizer = Normalizer(redactions=rules)
+        assert normalizer('SECRET "abc" \\1') == '<REDACTED> <REDACTED> <REDACTED>'
+
+
+class TestNormalizer:
+    def test_inactive_is_identity(self):
+        """Test an empty chain returns text unchanged."""
+        normalizer = Normalizer()
+        assert not normalizer.active
+        assert normalizer('a\r\n \x1b[0m') == 'a\r\n \x1b[0m'
+
+    def test_combined_single_pass(self):
+        """Test all rules apply in one pass."""
+        normalizer = Normalizer(
+            strip_ansi=True,
+            redactions=parse_redactions(['timestamps', 'uuids', 'pids', 'tmp-paths']),
+            strip_trailing_whitespace=True
+        )
+        text = (
+            '\x1b[32mok\x1b[0m at 2024-01-02T03:04:05.123Z   \n'
+            'id 123e4567-e89b-12d3-a456-426614174000 pid=4242\n'
+            'wrote /tmp/tmpab12/out.txt\n'
+        )
+        assert normalizer(text) == (
+            'ok at <TIMESTAMP>\n'
+            'id <UUID> pid=<PID>\n'
+            'wrote <TMP>\n'
+        )
+
+    def test_trailing_whitespace_before_ansi_reset(self):
+        """Test spaces followed only by an escape sequence are still trailing."""
+        normalizer = Normalizer(strip_ansi=True, strip_trailing_whitespace=True)
+        assert normalizer('foo  \x1b[0m\nbar') == 'foo\nbar'
+
+    def test_redaction_sees_text_without_ansi(self):
+        """Test redactions match across escape sequences stripped beforehand."""
+        normalizer = Normalizer(strip_ansi=True, redactions=parse_redactions(['pids']))
+        assert normalizer('pid=\x1b[1m123\x1b[0m') == 'pid=<PID>'
+
+    def test_build_normalizer_is_cached(self):
+        """Test the chain is compiled once per process."""
+        assert build_normalizer(True) is build_normalizer(True)
+
+    def test_stream_split_escape_and_trailing_space(self):
+        """Test chunk boundaries inside escapes and trailing whitespace."""
+        normalizer = Normalizer(strip_ansi=True, strip_trailing_whitespace=True)
+        text = 'a\x1b[31mred\x1b[0m  \nb \t\nc '
+        stream = normalizer.stream()
+        out = ''.join(stream.feed(text[i:i + 2]) for i in range(0, len(text), 2))
+        out += stream.flush()
+        assert out == normalizer(text) == 'ared\nb\nc'
+
+    def test_stream_split_redaction(self):
+        """Test a redaction match split across chunks."""
+        normalizer = Normalizer(redactions=parse_redactions(['uuids']))
+        text = 'id 123e4567-e89b-12d3-a456-426614174000 done\n'
+        stream = normalizer.stream()
+        out = stream.feed(text[:10]) + stream.feed(text[10:]) + stream.flush()
+        assert out == 'id <UUID> done\n'
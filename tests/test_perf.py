@@ -0,0 +1,174 @@
+"""Tests for performance budgets."""
+
+import pytest
+import sys
+import shutil
+from click.testing import CliRunner
+from assert_snapshot.cli import cli
+from assert_snapshot.perf import (
+    check_budget, format_drift, make_budget, percentile, run_measured, summarize_samples
+)
+from assert_snapshot.snapshot import SnapshotManager
+
+BUSY = [sys.executable, '-c', 'sum(range(2_000_000)); print("done")']
+
+
+def summary(wall, cpu=None, max_rss=None):
+    samples = [{'wall': wall, 'cpu': cpu, 'max_rss': max_rss}]
+    return summarize_samples(samples)
+
+
+class TestStatistics:
+    def test_percentile(self):
+        values = [5.0, 1.0, 3.0, 2.0, 4.0]
+        assert percentile(values, 0.5) == 3.0
+        assert percentile(values, 0.0) == 1.0
+        assert percentile(values, 1.0) == 5.0
+        assert percentile(values, 0.9) == pytest.approx(4.6)
+        assert percentile([7.0], 0.9) == 7.0
+
+    def test_summarize_skips_missing_metrics(self):
+        stats = summarize_samples([{'wall': 1.0, 'cpu': None, 'max_rss': None},
+                                   {'wall': 3.0, 'cpu': None, 'max_rss': None}])
+        assert stats['runs'] == 2
+        assert stats['wall']['median'] == 2.0
+        assert 'cpu' not in stats
+
+    def test_run_measured(self):
+        stdout, stderr, sample = run_measured(BUSY)
+        assert stdout.strip() == b'done'
+        assert sample['wall'] > 0
+        assert sample['cpu'] > 0
+        assert sample['max_rss'] > 1024 * 1024
+
+    def test_run_measured_timeout(self):
+        with pytest.raises(TimeoutError):
+            run_measured(['sleep', '5'], timeout=1)
+
+
+class TestCheckBudget:
+    def test_absolute_limits(self):
+        budget = make_budget(max_wall=0.5, max_rss=1000)
+        violations = check_budget(summary(1.0, 0.1, 2000), None, budget)
+        assert [v['metric'] for v in violations] == ['wall', 'max_rss']
+
+    def test_tolerance(self):
+        budget = make_budget(tolerance=0.2)
+        recorded = summary(1.0, 1.0)
+        assert check_budget(summary(1.1, 1.1), recorded, budget) == []
+        violations = check_budget(summary(1.5, 1.1), recorded, budget)
+        assert [v['metric'] for v in violations] == ['wall']
+        assert violations[0]['baseline'] == 1.0
+
+    def test_tolerance_floor(self):
+        """Test tiny absolute drift is ignored for very fast commands."""
+        budget = make_budget(tolerance=0.1)
+        assert check_budget(summary(0.004), summary(0.001), budget) == []
+
+    def test_tolerance_without_baseline(self):
+        """Test a tolerance cannot pass when there is nothing to compare with."""
+        violations = check_budget(summary(1.0), None, make_budget(tolerance=0.1))
+        assert [v['kind'] for v in violations] == ['baseline']
+        assert check_budget(summary(1.0), None, make_budget(max_wall=2.0)) == []
+
+    def test_invalid_budget(self):
+        with pytest.raises(ValueError):
+            make_budget(repeat=0)
+        with pytest.raises(ValueError):
+            make_budget(statistic='p50')
+
+    def test_format_drift(self):
+        perf = {
+            'statistic': 'median', 'tolerance': 0.1,
+            'measured': summary(2.0), 'recorded': summary(1.0),
+            'violations': check_budget(summary(2.0), summary(1.0), make_budget(tolerance=0.1)),
+        }
+        text = '\n'.join(format_drift(perf))
+        assert 'recorded 1.000s, +100%' in text
+        assert 'over budget' in text
+
+
+class TestManagerBudgets:
+    def test_capture_records_perf(self, manager):
+        """Test capture --measure stores statistics in the index."""
+        manager.capture(BUSY, name='busy', measure=True, repeat=3)
+        perf = manager.recorded_perf('busy.snapshot')
+        assert perf['runs'] == 3
+        assert perf['wall']['min'] <= perf['wall']['median'] <= perf['wall']['max']
+        assert manager.read_snapshot('busy.snapshot') == 'done\n'
+
+    def test_plain_capture_drops_perf(self, manager):
+        manager.capture(BUSY, name='busy', measure=True)
+        manager.capture(BUSY, name='busy')
+        assert manager.recorded_perf('busy.snapshot') is None
+
+    def test_verify_keeps_perf(self, manager):
+        """Test verify and reindex keep the baseline of an unchanged snapshot."""
+        manager.capture(BUSY, name='busy', measure=True)
+        manager.verify(BUSY, name='busy')
+        manager.reindex()
+        assert manager.recorded_perf('busy.snapshot') is not None
+
+    def test_perf_kept_with_snapshot(self, manager):
+        """Test a fresh clone without the local index keeps the baseline."""
+        manager.capture(BUSY, name='busy', measure=True)
+        assert manager.snapshot_dir.joinpath('busy.snapshot').read_bytes().startswith(
+            b'#assert-snapshot perf={')
+        recorded = manager.recorded_perf('busy.snapshot')
+        shutil.rmtree(manager.snapshot_dir / '.index')
+        clone = SnapshotManager(str(manager.snapshot_dir))
+        assert clone.read_snapshot('busy.snapshot') == 'done\n'
+        result = clone.verify(BUSY, name='busy', budget=make_budget(tolerance=100.0))
+        assert result['matches']
+        assert result['perf']['recorded'] == recorded
+        assert result['perf']['violations'] == []
+
+    def test_verify_with_budget(self, manager):
+        manager.capture(BUSY, name='busy', measure=True)
+        result = manager.verify(BUSY, name='busy', budget=make_budget(repeat=2, max_wall=0.000001))
+        assert result['matches']
+        assert result['perf']['measured']['runs'] == 2
+        assert result['perf']['recorded']['runs'] == 1
+        assert [v['metric'] for v in result['perf']['violations']] == ['wall']
+
+    def test_budget_bypasses_cache(self, manager, temp_dir):
+        source = temp_dir / 'input.txt'
+        source.write_text('x')
+        command = ['cat', str(source)]
+        manager.capture(command, name='cat')
+        manager.verify(command, name='cat', inputs=[str(source)])
+        assert manager.verify(command, name='cat', inputs=[str(source)])['cached']
+        result = manager.verify(command, name='cat', inputs=[str(source)], budget=make_budget())
+        assert not result['cached']
+        assert 'perf' in result
+
+
+class TestBudgetCLI:
+    def test_measure_and_verify(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            result = runner.invoke(cli, ['capture', '--name', 'busy', '--measure', '--', *BUSY])
+            assert result.exit_code == 0
+            assert 'Performance (median of 1 run(s))' in result.output
+
+            result = runner.invoke(cli, ['verify', '--name', 'busy', '--repeat', '2', '--tolerance', '10', '--', *BUSY])
+            assert result.exit_code == 0
+            assert 'recorded' in result.output
+
+            result = runner.invoke(cli, ['verify', '--name', 'busy', '--max-wall', '0.000001', '--', *BUSY])
+            assert result.exit_code == 1
+            assert 'Performance budget exceeded' in result.output
+
+    def test_tolerance_without_baseline_fails(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            assert runner.invoke(cli, ['capture', '--name', 'busy', '--', *BUSY]).exit_code == 0
+            result = runner.invoke(cli, ['verify', '--name', 'busy', '--tolerance', '0.0', '--', *BUSY])
+            assert result.exit_code == 1
+            assert 'No recorded timings' in result.output
+
+    def test_stream_rejects_budget(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            result = runner.invoke(cli, ['verify', '--stream', '--repeat', '3', 'echo', 'x'])
+            assert result.exit_code == 2
@@ -0,0 +1,69 @@
+"""Tests for the pytest assert_snapshot fixture."""
+
+import pytest
+
+# Load the plugin from the source tree whether or not it is installed.
+PLUGIN_ARGS = ('-p', 'no:assert_snapshot', '-p', 'assert_snapshot.pytest_plugin')
+
+
+@pytest.fixture
+def suite(pytester):
+    pytester.makepyfile(test_sample='''
+        def render(n):
+            print("rendering", n)
+            return {"n": n, "items": list(range(n))}
+
+        def test_values(assert_snapshot):
+            assert_snapshot.assert_match("hello\\n")
+            assert_snapshot.assert_call(render, (3,))
+    ''')
+    return pytester
+
+
+class TestSnapshotFixture:
+    def test_missing_snapshot_fails(self, suite):
+        """Test a missing snapshot fails and points at --assert-snapshot-update."""
+        result = suite.runpytest(*PLUGIN_ARGS)
+        result.assert_outcomes(failed=1)
+        result.stdout.fnmatch_lines(['*--assert-snapshot-update*'])
+
+    def test_update_then_match(self, suite):
+        """Test snapshots written with --assert-snapshot-update pass on the next run."""
+        suite.runpytest(*PLUGIN_ARGS, '--assert-snapshot-update').assert_outcomes(passed=1)
+        snapshots = suite.path / '.snapshots'
+        assert sorted(p.name for p in snapshots.glob('*.snapshot')) == [
+            'test_sample_test_values.snapshot',
+            'test_sample_test_values_2.snapshot',
+        ]
+        rendered = (snapshots / 'test_sample_test_values_2.snapshot').read_text()
+        assert rendered.startswith('rendering 3\n{')
+        suite.runpytest(*PLUGIN_ARGS).assert_outcomes(passed=1)
+
+    def test_mismatch_shows_diff(self, suite):
+        """Test a changed value fails with a unified diff."""
+        suite.runpytest(*PLUGIN_ARGS, '--assert-snapshot-update')
+        source = suite.path / 'test_sample.py'
+        source.write_text(source.read_text().replace('hello', 'goodbye'))
+        result = suite.runpytest(*PLUGIN_ARGS)
+        result.assert_outcomes(failed=1)
+        result.stdout.fnmatch_lines(['*Snapshot mismatch*', '*-hello', '*+goodbye'])
+
+    def test_names_leave_room_for_other_plugins(self, pytester):
+        """Test a suite may define its own snapshot fixture and option."""
+        pytester.makeconftest('''
+            import pytest
+
+            def pytest_addoption(parser):
+                parser.addoption('--snapshot-update', action='store_true')
+
+            @pytest.fixture
+            def snapshot():
+                return 'other plugin'
+        ''')
+        pytester.makepyfile(test_other='''
+            def test_both(snapshot, assert_snapshot):
+                assert snapshot == 'other plugin'
+                assert_snapshot.assert_match("x")
+        ''')
+        result = pytester.runpytest(*PLUGIN_ARGS, '--snapshot-update', '--assert-snapshot-update')
+        result.assert_outcomes(passed=1)
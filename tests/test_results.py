@@ -0,0 +1,37 @@
+"""Tests for the run-result store."""
+
+import pytest
+from assert_snapshot.results import RunResultStore
+
+
+@pytest.fixture
+def store(temp_dir):
+    """Create a RunResultStore in a temporary directory."""
+    return RunResultStore(temp_dir / '.runs')
+
+
+class TestRunResultStore:
+    def test_record_and_load(self, store):
+        """Test a recorded run round-trips."""
+        store.record('a.snapshot', ['echo', 'a'], 'a\n', strip_ansi=True)
+        record = store.load('a.snapshot')
+        assert record == {'command': ['echo', 'a'], 'strip_ansi': True, 'output': 'a\n'}
+
+    def test_load_missing(self, store):
+        """Test loading an unknown snapshot returns None."""
+        assert store.load('missing.snapshot') is None
+
+    def test_names_with_pattern(self, store):
+        """Test listing recorded runs filtered by glob."""
+        store.record('api_a.snapshot', ['a'], '')
+        store.record('api_b.snapshot', ['b'], '')
+        store.record('cli.snapshot', ['c'], '')
+        assert store.names() == ['api_a.snapshot', 'api_b.snapshot', 'cli.snapshot']
+        assert store.names('api_*') == ['api_a.snapshot', 'api_b.snapshot']
+
+    def test_discard(self, store):
+        """Test discarding removes the record and tolerates repeats."""
+        store.record('a.snapshot', ['a'], 'a')
+        store.discard('a.snapshot')
+        store.discard('a.snapshot')
+        assert store.names() == []
@@ -0,0 +1,174 @@
+"""Tests for recorded durations, shard partitioning and merging shard results."""
+
+import asyncio
+import json
+import pytest
+from pathlib import Path
+from click.testing import CliRunner
+from assert_snapshot.cli import cli
+from assert_snapshot.shard import (
+    DurationStore, merge_documents, parse_shard, partition, results_document
+)
+from assert_snapshot.snapshot import SnapshotManager
+from assert_snapshot.suite import shard_entries, summarize
+
+
+NAMES = [f"s{i}.snapshot" for i in range(40)]
+
+
+class TestPartition:
+    def test_parse_shard(self):
+        assert parse_shard('2/16') == (2, 16)
+        for value in ('0/4', '5/4', '1', 'a/b', '1/0'):
+            with pytest.raises(ValueError):
+                parse_shard(value)
+
+    def test_covers_every_name_once(self):
+        durations = {name: float(i % 7) for i, name in enumerate(NAMES[:25])}
+        shards = partition(NAMES, durations, 6)
+        assert sorted(sum(shards, [])) == sorted(NAMES)
+
+    def test_deterministic(self):
+        durations = {name: 1.0 for name in NAMES[::3]}
+        assert partition(NAMES, durations, 4) == partition(reversed(NAMES), durations, 4)
+
+    def test_balanced_by_duration(self):
+        """Test one slow snapshot gets a shard to itself."""
+        durations = {name: 1.0 for name in NAMES[:8]}
+        durations['slow.snapshot'] = 8.0
+        shards = partition(list(durations), durations, 2)
+        assert ['slow.snapshot'] in shards
+        loads = [sum(durations[name] for name in shard) for shard in shards]
+        assert loads == [8.0, 8.0]
+
+    def test_hash_fallback_is_stable(self):
+        """Test names without history keep their shard as the suite grows."""
+        before = partition(NAMES[:20], {}, 4)
+        after = partition(NAMES, {}, 4)
+        for old, new in zip(before, after):
+            assert set(old) <= set(new)
+        assert all(before)
+
+
+class TestDurationStore:
+    def test_record_smooths(self, temp_dir):
+        store = DurationStore(temp_dir / '.durations')
+        assert store.get('a.snapshot') is None
+        assert store.record('a.snapshot', 2.0) == 2.0
+        assert store.record('a.snapshot', 4.0) == 3.0
+        assert store.load(['a.snapshot', 'b.snapshot']) == {'a.snapshot': 3.0}
+        store.discard('a.snapshot')
+        assert store.get('a.snapshot') is None
+
+    def test_verify_records_duration(self, manager, temp_dir):
+        manager.capture(['echo', 'a'], name='a')
+        assert manager.durations.get('a.snapshot') is None
+        manager.verify(['echo', 'a'], name='a')
+        assert manager.durations.get('a.snapshot') > 0
+        manager.verify_stream(['echo', 'a'], name='a')
+        asyncio.run(manager.averify(['echo', 'a'], name='a'))
+
+    def test_cached_verify_not_recorded(self, manager, temp_dir):
+        source = temp_dir / 'in.txt'
+        source.write_text('x')
+        manager.capture(['cat', str(source)], name='cat')
+        manager.verify(['cat', str(source)], name='cat', inputs=[str(source)])
+        recorded = manager.durations.get('cat.snapshot')
+        assert manager.verify(['cat', str(source)], name='cat', inputs=[str(source)])['cached']
+        assert manager.durations.get('cat.snapshot') == recorded
+
+
+class TestShardSelection:
+    def test_companion_follows_snapshot(self, manager):
+        manager.capture(['sh', '-c', 'echo o; echo e >&2'], name='both', separate_stderr=True)
+        for i in range(5):
+            manager.capture(['echo', str(i)], name=f"n{i}")
+        names = manager.list_snapshots()
+        shards = [manager.list_snapshots(shard=(i, 3)) for i in (1, 2, 3)]
+        assert sorted(sum(shards, [])) == names
+        holder, = [shard for shard in shards if 'both.snapshot' in shard]
+        assert 'both.stderr.snapshot' in holder
+
+    def test_shard_entries(self, manager, temp_dir):
+        entries = [{'name': f"e{i}", 'command': ['echo', str(i)]} for i in range(10)]
+        entries.append({'name': '../bad', 'command': ['echo']})
+        shards = [shard_entries(entries, str(temp_dir / 'snaps'), i, 3) for i in (1, 2, 3)]
+        assert sorted(len(shard) for shard in shards) != [0, 0, 11]
+        assert sum(len(shard) for shard in shards) == len(entries)
+
+
+def _document(shard, *statuses):
+    results = [
+        {'name': f"{shard[0]}-{i}.snapshot", 'command': ['x'], 'status': status, 'duration': 0.5}
+        for i, status in enumerate(statuses)
+    ]
+    return results_document(results, summarize(results, 1.0 + shard[0]), shard)
+
+
+class TestMerge:
+    def test_merge_documents(self):
+        merged = merge_documents([_document((1, 2), 'passed'), _document((2, 2), 'failed')])
+        assert merged['problems'] == []
+        assert [r['status'] for r in merged['results']] == ['passed', 'failed']
+        assert merged['duration'] == 3.0
+
+    def test_missing_and_repeated_shards(self):
+        merged = merge_documents([_document((1, 3), 'passed'), _document((1, 3), 'passed')])
+        assert merged['problems'] == ['Missing shard(s) 2, 3 of 3', 'Shard(s) 1 given more than once']
+
+    def test_mixed_splits(self):
+        merged = merge_documents([_document((1, 2), 'passed'), _document((1, 3), 'passed')])
+        assert 'different splits' in merged['problems'][0]
+
+
+class TestShardCLI:
+    def test_run_shards_and_merge(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            entries = [{'name': f"e{i}", 'command': ['echo', str(i)]} for i in range(6)]
+            for entry in entries:
+                runner.invoke(cli, ['capture', '--name', entry['name'], *entry['command']])
+            Path('m.json').write_text(json.dumps({'snapshots': entries}))
+
+            for i in (1, 2):
+                result = runner.invoke(cli, ['run', 'm.json', '--shard', f"{i}/2", '--results', f"r{i}.json"])
+                assert result.exit_code == 0
+
+            result = runner.invoke(cli, ['merge', 'r1.json', 'r2.json', '--output', 'all.json',
+                                         '--record-durations'])
+            assert result.exit_code == 0
+            assert '6 passed, 0 failed, 0 errors across 2 shard(s)' in result.output
+            assert len(json.loads(Path('all.json').read_text())['results']) == 6
+            assert SnapshotManager().durations.get('e0.snapshot') is not None
+
+            result = runner.invoke(cli, ['merge', 'r1.json'])
+            assert result.exit_code == 1
+            assert 'Missing shard(s) 2 of 2' in result.output
+
+    def test_merge_records_into_manifest_snapshot_dir(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            SnapshotManager('snaps').capture(['echo', 'a'], name='a')
+            entries = [{'name': 'a', 'command': ['echo', 'a']}]
+            Path('m.json').write_text(json.dumps({'snapshot_dir': 'snaps', 'snapshots': entries}))
+            runner.invoke(cli, ['run', 'm.json', '--shard', '1/1', '--results', 'r1.json', '--no-cache'])
+            assert json.loads(Path('r1.json').read_text())['snapshot_dir'] == 'snaps'
+
+            result = runner.invoke(cli, ['merge', 'r1.json', '--record-durations'])
+            assert result.exit_code == 0
+            assert SnapshotManager('snaps').durations.get('a.snapshot') is not None
+            assert not Path('.snapshots').exists()
+
+    def test_merge_rejects_mixed_snapshot_dirs(self):
+        first, second = _document((1, 2), 'passed'), _document((2, 2), 'passed')
+        first['snapshot_dir'], second['snapshot_dir'] = 'a', 'b'
+        assert 'different snapshot directories' in merge_documents([first, second])['problems'][0]
+
+    def test_list_shard(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'a', 'echo', 'a'])
+            result = runner.invoke(cli, ['list', '--shard', '1/1'])
+            assert 'a.snapshot' in result.output
+            result = runner.invoke(cli, ['list', '--shard', '3/2'])
+            assert result.exit_code == 2
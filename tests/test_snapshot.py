@@ -1,9 +1,14 @@
 """Tests for snapshot manager core functionality."""
 
+import asyncio
+import os
 import pytest
+import sys
+import time
 from pathlib import Path
 import tempfile
 import shutil
+from assert_snapshot.index import content_digest
 from assert_snapshot.snapshot import SnapshotManager
 
 
@@ -115,3 +120,398 @@ class TestSnapshotManager:
         manager.delete_snapshot('todelete')
         with pytest.raises(FileNotFoundError):
             manager.verify(['echo', 'test'], name='todelete')
+
+
+class TestVerifyStream:
+    def test_stream_matching(self, manager):
+        """Test streaming verify passes on identical output."""
+        manager.capture(['echo', 'hello'], name='test')
+        result = manager.verify_stream(['echo', 'hello'], name='test', chunk_size=2)
+        assert result['matches'] is True
+        assert result['offset'] is None
+
+    def test_stream_mismatch_offset(self, manager):
+        """Test streaming verify reports the first diverging offset."""
+        manager.capture(['echo', 'hello world'], name='test')
+        result = manager.verify_stream(['echo', 'hello there'], name='test', chunk_size=4)
+        assert result['matches'] is False
+        assert result['offset'] == 6
+        assert 'th' in result['actual']
+
+    def test_stream_snapshot_longer(self, manager):
+        """Test streaming verify fails when output is a prefix of the snapshot."""
+        manager.capture(['echo', 'hello world'], name='test')
+        result = manager.verify_stream(['echo', 'hello'], name='test')
+        assert result['matches'] is False
+
+    def test_stream_includes_stderr(self, manager):
+        """Test stderr is compared after stdout like verify."""
+        command = ['sh', '-c', 'echo out; echo err >&2']
+        manager.capture(command, name='test')
+        assert manager.verify_stream(command, name='test', chunk_size=3)['matches']
+        other = ['sh', '-c', 'echo out; echo other >&2']
+        assert not manager.verify_stream(other, name='test')['matches']
+
+    def test_stream_kills_on_mismatch(self, manager):
+        """Test a diverging command is stopped instead of run to completion."""
+        manager.capture(['echo', 'expected'], name='test')
+        command = ['sh', '-c', 'echo different; sleep 10']
+        result = manager.verify_stream(command, name='test', timeout=5)
+        assert result['matches'] is False
+
+    def test_stream_strip_ansi_split_escape(self, manager):
+        """Test escape sequences split across chunks are stripped."""
+        manager.capture(['printf', 'red text'], name='test')
+        command = ['printf', '\x1b[31mred\x1b[0m text']
+        result = manager.verify_stream(command, name='test', strip_ansi=True, chunk_size=3)
+        assert result['matches'] is True
+
+    def test_stream_timeout(self, manager):
+        """Test streaming verify enforces the timeout."""
+        manager.capture(['echo', 'x'], name='test')
+        with pytest.raises(TimeoutError, match='timed out'):
+            manager.verify_stream(['sleep', '10'], name='test', timeout=1)
+
+    def test_stream_timeout_kills_descendants(self, manager):
+        """Test a grandchild holding stdout open does not outlive the timeout."""
+        manager.capture(['echo', 'x'], name='test')
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            manager.verify_stream(['sh', '-c', 'sleep 6; echo x'], name='test', timeout=1)
+        assert time.monotonic() - start < 4
+
+
+class TestRunResults:
+    def test_failed_verify_records_output(self, manager):
+        """Test a mismatching verify keeps the actual output."""
+        manager.capture(['echo', 'old'], name='test')
+        manager.verify(['echo', 'new'], name='test')
+        assert manager.last_runs() == ['test.snapshot']
+        record = manager.results.load('test.snapshot')
+        assert record['command'] == ['echo', 'new']
+        assert record['output'] == 'new\n'
+
+    def test_passing_verify_clears_record(self, manager):
+        """Test a later passing verify discards the stale record."""
+        manager.capture(['echo', 'old'], name='test')
+        manager.verify(['echo', 'new'], name='test')
+        manager.verify(['echo', 'old'], name='test')
+        assert manager.last_runs() == []
+
+    def test_accept_last_run(self, manager):
+        """Test accepting a recorded run writes it without re-running."""
+        manager.capture(['echo', 'old'], name='test')
+        manager.verify(['echo', 'new'], name='test')
+        manager.accept_last_run('test.snapshot', command=['echo', 'new'])
+        assert manager.read_snapshot('test.snapshot') == 'new\n'
+        assert manager.last_runs() == []
+
+    def test_accept_last_run_command_mismatch(self, manager):
+        """Test a record from a different command is not accepted."""
+        manager.capture(['echo', 'old'], name='test')
+        manager.verify(['echo', 'new'], name='test')
+        with pytest.raises(ValueError, match='different command'):
+            manager.accept_last_run('test.snapshot', command=['echo', 'other'])
+
+    def test_accept_last_run_missing(self, manager):
+        """Test accepting without a recorded run fails."""
+        with pytest.raises(FileNotFoundError, match='No recorded run'):
+            manager.accept_last_run('missing.snapshot')
+
+
+class TestSnapshotIndexing:
+    def test_capture_indexes_snapshot(self, manager):
+        """Test capture records digest, size and command."""
+        manager.capture(['echo', 'hello'], name='test', strip_ansi=True)
+        entry = manager.index.get('test.snapshot')
+        assert entry['size'] == 6
+        assert entry['command'] == ['echo', 'hello']
+        assert entry['strip_ansi'] is True
+        assert len(entry['sha256']) == 64
+
+    def test_verify_skips_body_on_digest_match(self, manager, monkeypatch):
+        """Test a matching digest avoids reading the snapshot body."""
+        manager.capture(['echo', 'hello'], name='test')
+
+        def fail_read(*args, **kwargs):
+            raise AssertionError('snapshot body was read')
+
+        monkeypatch.setattr(manager.store, 'read', fail_read)
+        assert manager.verify(['echo', 'hello'], name='test')['matches'] is True
+
+    def test_verify_detects_hand_edited_snapshot(self, manager):
+        """Test stale index entries fall back to reading the body."""
+        manager.capture(['echo', 'hello'], name='test')
+        (manager.snapshot_dir / 'test.snapshot').write_text('edited by hand\n')
+        result = manager.verify(['echo', 'hello'], name='test')
+        assert result['matches'] is False
+        assert result['expected'] == 'edited by hand\n'
+
+    def test_list_snapshots_details(self, manager):
+        """Test metadata queries are answered from the index."""
+        manager.capture(['echo', 'a'], name='snap1')
+        manager.capture(['echo', 'bb'], name='snap2')
+        details = manager.list_snapshots('snap2*', details=True)
+        assert len(details) == 1
+        assert details[0]['name'] == 'snap2.snapshot'
+        assert details[0]['size'] == 3
+
+    def test_reindex_legacy_directory(self, manager):
+        """Test snapshots written without an index are picked up."""
+        (manager.snapshot_dir / 'legacy.snapshot').write_text('old\n')
+        assert manager.list_snapshots() == ['legacy.snapshot']
+        assert manager.index.get('legacy.snapshot')['sha256'] is None
+        assert manager.verify(['echo', 'old'], name='legacy')['matches'] is True
+        assert manager.index.get('legacy.snapshot')['sha256'] == content_digest('old\n')
+
+    def test_list_picks_up_files_changed_behind_the_index(self, manager):
+        """Test snapshots added or deleted outside the manager are reflected."""
+        manager.capture(['echo', 'a'], name='a')
+        manager.capture(['echo', 'b'], name='b')
+        assert manager.list_snapshots() == ['a.snapshot', 'b.snapshot']
+        (manager.snapshot_dir / 'b.snapshot').unlink()
+        (manager.snapshot_dir / 'copied.snapshot').write_text('c\n')
+        assert manager.list_snapshots() == ['a.snapshot', 'copied.snapshot']
+        assert manager.index.names() == ['a.snapshot', 'copied.snapshot']
+        assert manager.verify(['echo', 'c'], name='copied')['matches'] is True
+
+
+class TestNormalization:
+    def test_redactions_applied_on_capture_and_verify(self, temp_snapshot_dir):
+        """Test redacted values do not cause mismatches."""
+        manager = SnapshotManager(temp_snapshot_dir, redact=[r'run-\d+'])
+        manager.capture(['echo', 'run-1'], name='test')
+        assert manager.read_snapshot('test.snapshot') == '<REDACTED>\n'
+        assert manager.verify(['echo', 'run-2'], name='test')['matches'] is True
+
+    def test_stream_uses_normalizer(self, temp_snapshot_dir):
+        """Test streaming verify applies the same chain."""
+        manager = SnapshotManager(temp_snapshot_dir, strip_trailing_whitespace=True)
+        manager.capture(['printf', 'a  \nb\n'], name='test')
+        result = manager.verify_stream(['printf', 'a\nb \n'], name='test', chunk_size=1)
+        assert result['matches'] is True
+
+    def test_index_records_normalization(self, temp_snapshot_dir):
+        """Test the index keeps the normalization settings."""
+        manager = SnapshotManager(temp_snapshot_dir, strip_trailing_whitespace=True)
+        manager.capture(['echo', 'x'], name='test', strip_ansi=True)
+        spec = manager.index.get('test.snapshot')['normalize']
+        assert spec['strip_ansi'] is True
+        assert spec['strip_trailing_whitespace'] is True
+
+
+class TestInputCache:
+    def test_unchanged_inputs_skip_execution(self, manager, tmp_path):
+        """Test a passing verify with unchanged inputs is served from cache."""
+        data = tmp_path / 'data.txt'
+        data.write_text('v1')
+        command = ['cat', str(data)]
+        manager.capture(command, name='test')
+        assert manager.verify(command, name='test', inputs=[str(data)])['cached'] is False
+        assert manager.verify(command, name='test', inputs=[str(data)])['cached'] is True
+
+    def test_changed_inputs_rerun(self, manager, tmp_path):
+        """Test an edited input forces the command to run."""
+        data = tmp_path / 'data.txt'
+        data.write_text('v1')
+        command = ['cat', str(data)]
+        manager.capture(command, name='test')
+        manager.verify(command, name='test', inputs=[str(data)])
+        data.write_text('v2')
+        result = manager.verify(command, name='test', inputs=[str(data)])
+        assert result['cached'] is False
+        assert result['matches'] is False
+
+    def test_no_cache_and_failure_clear_fingerprint(self, manager, tmp_path):
+        """Test a failing uncached run invalidates the stored fingerprint."""
+        data = tmp_path / 'data.txt'
+        data.write_text('v1')
+        manager.capture(['cat', str(data)], name='test')
+        manager.verify(['cat', str(data)], name='test', inputs=[str(data)])
+        result = manager.verify(['echo', 'x'], name='test', inputs=[str(data)], use_cache=False)
+        assert result['matches'] is False
+        assert 'fingerprint' not in manager.index.get('test.snapshot')
+
+    def test_recapture_invalidates_cache(self, manager, tmp_path):
+        """Test updating the snapshot drops the fingerprint."""
+        data = tmp_path / 'data.txt'
+        data.write_text('v1')
+        command = ['cat', str(data)]
+        manager.capture(command, name='test')
+        manager.verify(command, name='test', inputs=[str(data)])
+        manager.capture(command, name='test')
+        assert manager.verify(command, name='test', inputs=[str(data)])['cached'] is False
+
+
+class TestPackedManager:
+    def test_capture_verify_list_packed(self, temp_snapshot_dir):
+        """Test the manager API works unchanged on a pack store."""
+        manager = SnapshotManager(temp_snapshot_dir, store='pack')
+        manager.capture(['echo', 'hello'], name='test')
+        assert not (manager.snapshot_dir / 'test.snapshot').exists()
+        assert manager.verify(['echo', 'hello'], name='test')['matches'] is True
+        assert manager.verify_stream(['echo', 'hello'], name='test')['matches'] is True
+        assert manager.verify(['echo', 'bye'], name='test')['expected'] == 'hello\n'
+        assert manager.list_snapshots() == ['test.snapshot']
+
+    def test_pack_migration_keeps_digests(self, manager):
+        """Test packing an existing directory keeps it verifiable from the index."""
+        manager.capture(['echo', 'a'], name='a')
+        manager.capture(['echo', 'b'], name='b')
+        assert manager.pack() == 2
+        reopened = SnapshotManager(str(manager.snapshot_dir))
+        assert reopened.store.kind == 'pack'
+        assert reopened.index.get('a.snapshot')['sha256'] == content_digest('a\n')
+        assert reopened.verify(['echo', 'b'], name='b')['matches'] is True
+        assert reopened.unpack() == 2
+        assert (manager.snapshot_dir / 'a.snapshot').read_text() == 'a\n'
+
+
+class TestNameCollisions:
+    def test_generated_name_collision(self, manager):
+        """Test commands that share a generated name are rejected."""
+        manager.capture(['echo', 'a', 'b', 'c'])
+        with pytest.raises(ValueError, match='already used'):
+            manager.capture(['echo', 'a', 'b', 'd'])
+        with pytest.raises(ValueError, match='already used'):
+            manager.verify(['echo', 'a', 'b', 'd'])
+
+    def test_same_command_and_explicit_names_allowed(self, manager):
+        """Test recapturing the same command or passing a name is fine."""
+        manager.capture(['echo', 'a', 'b', 'c'])
+        manager.capture(['echo', 'a', 'b', 'c'])
+        manager.capture(['echo', 'a', 'b', 'd'], name='other')
+        assert manager.verify(['echo', 'a', 'b', 'c'])['matches'] is True
+        assert manager.verify(['echo', 'a', 'b', 'd'], name='other')['matches'] is True
+
+    def test_batch_defers_sync(self, manager):
+        """Test writes inside batch() are synced when the block exits."""
+        with manager.batch():
+            manager.capture(['echo', 'one'], name='one')
+            assert manager.sync.pending
+        assert manager.sync.mode == 'each'
+        assert not manager.sync.pending
+
+
+class TestAsyncAPI:
+    def test_acapture_and_averify(self, manager):
+        """Test the async API mirrors capture and verify."""
+        async def scenario():
+            name = await manager.acapture(['echo', 'hello'], name='test')
+            passed = await manager.averify(['echo', 'hello'], name='test')
+            failed = await manager.averify(['echo', 'bye'], name='test')
+            return name, passed, failed
+
+        name, passed, failed = asyncio.run(scenario())
+        assert name == 'test.snapshot'
+        assert manager.read_snapshot(name) == 'hello\n'
+        assert passed['matches'] is True
+        assert failed['matches'] is False
+        assert failed['expected'] == 'hello\n'
+        assert manager.last_runs() == ['test.snapshot']
+
+    def test_averify_matches_sync_output(self, manager):
+        """Test async output decoding matches the synchronous runner."""
+        command = ['sh', '-c', 'printf "a\\r\\nb"; echo err >&2']
+        manager.capture(command, name='mixed')
+        result = asyncio.run(manager.averify(command, name='mixed'))
+        assert result['matches'] is True
+
+    def test_concurrency_limit(self, temp_snapshot_dir):
+        """Test at most max_concurrency commands run at once."""
+        manager = SnapshotManager(temp_snapshot_dir, max_concurrency=2)
+        manager.capture(['sleep', '0.2'], name='nap')
+
+        async def scenario():
+            return await asyncio.gather(*[
+                manager.averify(['sleep', '0.2'], name='nap') for _ in range(4)
+            ])
+
+        start = time.perf_counter()
+        results = asyncio.run(scenario())
+        assert all(r['matches'] for r in results)
+        assert time.perf_counter() - start >= 0.4
+
+    @pytest.mark.skipif(sys.platform == 'win32', reason='process groups are POSIX only')
+    def test_timeout_kills_process_group(self, manager, temp_snapshot_dir):
+        """Test a timeout kills the command together with its children."""
+        pid_file = Path(temp_snapshot_dir) / 'child.pid'
+        command = ['sh', '-c', f'sleep 30 & echo $! > {pid_file}; wait']
+        with pytest.raises(TimeoutError):
+            asyncio.run(manager.acapture(command, name='slow', timeout=0.5))
+
+        child = int(pid_file.read_text())
+        for _ in range(50):
+            try:
+                os.kill(child, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail('background child survived the timeout')
+
+    @pytest.mark.skipif(sys.platform == 'win32', reason='process groups are POSIX only')
+    def test_cancellation_reaps_process(self, manager, monkeypatch):
+        """Test a cancelled command is killed and waited for before the task ends."""
+        processes = []
+        spawn = asyncio.create_subprocess_exec
+
+        async def recording_spawn(*args, **kwargs):
+            process = await spawn(*args, **kwargs)
+            processes.append(process)
+            return process
+
+        monkeypatch.setattr(asyncio, 'create_subprocess_exec', recording_spawn)
+
+        async def scenario():
+            task = asyncio.ensure_future(manager.acapture(['sleep', '30'], name='slow'))
+            while not processes:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        assert processes[0].returncode is not None
+
+    def test_command_not_found(self, manager):
+        """Test a missing executable raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError, match='Command not found'):
+            asyncio.run(manager.acapture(['nonexistent-command-xyz']))
+
+
+def greet(name, punctuation='!'):
+    print(f"greeting {name}")
+    return f"Hello, {name}{punctuation}\n"
+
+
+class TestCallSnapshots:
+    def test_capture_and_verify_call(self, manager):
+        """Test callables are snapshotted in-process with generated names."""
+        snapshot_name = manager.capture_call(greet, ('world',))
+        assert snapshot_name == 'test_snapshot_greet_world.snapshot'
+        assert manager.read_snapshot(snapshot_name) == 'greeting world\nHello, world!\n'
+        assert manager.verify_call(greet, ('world',))['matches'] is True
+
+    def test_verify_call_mismatch(self, manager):
+        """Test a changed return value fails and can be accepted."""
+        manager.capture_call(greet, ('world',), name='greet')
+        result = manager.verify_call(greet, ('world',), {'punctuation': '?'}, name='greet')
+        assert result['matches'] is False
+        assert result['actual'].endswith('Hello, world?\n')
+        manager.accept_last_run('greet.snapshot')
+        assert manager.verify_call(greet, ('world',), {'punctuation': '?'}, name='greet')['matches']
+
+    def test_return_values_are_pretty_printed(self, manager):
+        """Test non-string return values are rendered with pprint."""
+        manager.capture_call(lambda: {'b': [1, 2], 'a': None}, name='data')
+        assert manager.read_snapshot('data.snapshot') == "{'a': None, 'b': [1, 2]}\n"
+
+    def test_normalization_applies(self, temp_snapshot_dir):
+        """Test redactions and ANSI stripping apply to call output."""
+        manager = SnapshotManager(temp_snapshot_dir, redact=['uuids'])
+        manager.capture_call(
+            lambda: '\x1b[31mid\x1b[0m 123e4567-e89b-12d3-a456-426614174000\n',
+            name='ids', strip_ansi=True
+        )
+        assert manager.read_snapshot('ids.snapshot') == 'id <UUID>\n'
@@ -0,0 +1,99 @@
+"""Cold-start guards: import budget and lazily loaded modules."""
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+from assert_snapshot.snapshot import SnapshotManager
+
+# Cumulative import time of the package on the verify path, in microseconds.
+# Loose enough for slow CI machines, tight enough to catch asyncio, click or
+# the diff renderer creeping back onto the fast path.
+IMPORT_BUDGET_US = 150_000
+
+HEAVY_MODULES = ('click', 'colorama', 'difflib', 'asyncio', 'multiprocessing', 'pprint')
+
+PROBE = '''
+import json, sys
+watched = json.loads(sys.argv[2])
+sys.argv = ['assert-snapshot'] + json.loads(sys.argv[1])
+from assert_snapshot.client import main
+try:
+    main()
+except SystemExit as e:
+    code = e.code
+heavy = [m for m in watched if m in sys.modules]
+sys.stderr.write(json.dumps({'code': code, 'heavy': heavy}))
+'''
+
+
+def run_probe(args, cwd):
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, json.dumps(args), json.dumps(HEAVY_MODULES)],
+        cwd=cwd, capture_output=True, text=True,
+        env=dict(os.environ, ASSERT_SNAPSHOT_NO_DAEMON='1')
+    )
+    return result.stdout, json.loads(result.stderr.splitlines()[-1])
+
+
+def import_time_us(module):
+    """Cumulative import time of ``module`` reported by ``-X importtime``."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True
+    )
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise AssertionError(f'{module} missing from importtime output')
+
+
+class TestStartup:
+    def test_passing_verify_stays_on_fast_path(self, tmp_path):
+        """Test a passing verify imports neither click nor the diff renderer."""
+        SnapshotManager(str(tmp_path / '.snapshots')).capture(['echo', 'hi'], name='hi')
+        out, probe = run_probe(['verify', '--name', 'hi', 'echo', 'hi'], tmp_path)
+        assert probe == {'code': 0, 'heavy': []}
+        assert '✓ Snapshot matches' in out
+
+    def test_mismatch_loads_diff_renderer(self, tmp_path):
+        """Test diff rendering is loaded once there is something to show."""
+        SnapshotManager(str(tmp_path / '.snapshots')).capture(['echo', 'hi'], name='hi')
+        out, probe = run_probe(['verify', '--name', 'hi', 'echo', 'bye'], tmp_path)
+        assert probe['code'] == 1
+        assert 'colorama' in probe['heavy']
+        assert '+bye' in out
+
+    def test_other_commands_use_click(self, tmp_path):
+        """Test commands outside the fast path still go through click."""
+        out, probe = run_probe(['list'], tmp_path)
+        assert probe['code'] == 0
+        assert 'click' in probe['heavy']
+        assert 'No snapshots found' in out
+
+    def test_cli_module_defers_heavy_imports(self):
+        """Test importing the click CLI does not load diff or async machinery."""
+        code = (
+            'import json, sys, assert_snapshot.cli; '
+            f'print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))'
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        assert json.loads(result.stdout) == ['click']
+
+    def test_pytest_plugin_defers_imports(self):
+        """Test the auto-loaded pytest plugin touches neither snapshots nor stdout."""
+        code = (
+            'import json, sys; stdout = sys.stdout; import assert_snapshot.pytest_plugin; '
+            'print(json.dumps([m for m in ("colorama", "assert_snapshot.snapshot") if m in sys.modules]'
+            ' + (["stdout"] if sys.stdout is not stdout else [])))'
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        assert json.loads(result.stdout) == []
+
+    @pytest.mark.parametrize('module', ['assert_snapshot.client', 'assert_snapshot.snapshot'])
+    def test_import_time_budget(self, module):
+        """Test the verify path imports within the startup budget."""
+        best = min(import_time_us(module) for _ in range(3))
+        assert best < IMPORT_BUDGET_US, f'{module} took {best}us to import'
@@ -0,0 +1,126 @@
+"""Tests for snapshot storage backends."""
+
+import pytest
+from assert_snapshot.store import (
+    PACK_FILENAME,
+    PACK_INDEX_FILENAME,
+    PACK_LOG_FILENAME,
+    DirectoryStore,
+    PackStore,
+    open_store,
+    pack_snapshots,
+    unpack_snapshots,
+)
+
+
+class TestDirectoryStore:
+    def test_round_trip(self, temp_dir):
+        """Test write, read, names and delete."""
+        store = DirectoryStore(temp_dir)
+        store.write('a.snapshot', b'hello\n')
+        assert store.read('a.snapshot') == b'hello\n'
+        assert store.names() == ['a.snapshot']
+        assert store.size('a.snapshot') == 6
+        store.delete('a.snapshot')
+        assert not store.exists('a.snapshot')
+
+
+class TestPackStore:
+    def test_round_trip(self, temp_dir):
+        """Test packed entries read back through mmap."""
+        store = PackStore(temp_dir)
+        store.write('a.snapshot', b'alpha\n')
+        store.write('b.snapshot', b'beta\n')
+        assert PackStore(temp_dir).read('b.snapshot') == b'beta\n'
+        with store.open('a.snapshot') as f:
+            assert f.read() == b'alpha\n'
+        assert store.names() == ['a.snapshot', 'b.snapshot']
+
+    def test_deduplicates_content(self, temp_dir):
+        """Test identical content is stored once."""
+        store = PackStore(temp_dir)
+        store.write('a.snapshot', b'same' * 100)
+        store.write('b.snapshot', b'same' * 100)
+        assert (temp_dir / PACK_FILENAME).stat().st_size == 400
+
+    def test_compression(self, temp_dir):
+        """Test compressible entries shrink and stream back intact."""
+        store = PackStore(temp_dir, compress=True)
+        data = b'repeated line\n' * 10000
+        store.write('a.snapshot', data)
+        assert (temp_dir / PACK_FILENAME).stat().st_size < len(data) // 10
+        assert store.read('a.snapshot') == data
+        with store.open('a.snapshot') as f:
+            assert f.read(7) == b'repeate'
+            assert f.read() == data[7:]
+
+    def test_stamp_changes_on_rewrite(self, temp_dir):
+        """Test rewriting an entry changes its stamp."""
+        store = PackStore(temp_dir)
+        store.write('a.snapshot', b'one')
+        before = store.stamp('a.snapshot')
+        store.write('a.snapshot', b'two')
+        assert store.stamp('a.snapshot') != before
+
+    def test_delete_and_compact(self, temp_dir):
+        """Test deleted entries are reclaimed by compaction."""
+        store = PackStore(temp_dir)
+        store.write('a.snapshot', b'a' * 100)
+        store.write('b.snapshot', b'b' * 50)
+        store.delete('a.snapshot')
+        assert store.compact() == 100
+        assert store.read('b.snapshot') == b'b' * 50
+
+    def test_remaps_after_compaction_elsewhere(self, temp_dir):
+        """Test a long-lived reader sees a pack compacted and regrown by another store."""
+        reader = PackStore(temp_dir)
+        reader.write('a.snapshot', b'A' * 100)
+        reader.write('b.snapshot', b'B' * 100)
+        assert reader.read('b.snapshot') == b'B' * 100
+        other = PackStore(temp_dir)
+        other.delete('a.snapshot')
+        other.compact()
+        other.write('z.snapshot', b'D' * 100)
+        other.write('y.snapshot', b'E' * 100)
+        assert reader.read('z.snapshot') == b'D' * 100
+        assert reader.read('b.snapshot') == b'B' * 100
+
+    def test_writes_append_to_index_log(self, temp_dir, monkeypatch):
+        """Test writes log one record each and the log is folded into the index."""
+        monkeypatch.setattr('assert_snapshot.store.PACK_LOG_FOLD_MIN', 3)
+        store = PackStore(temp_dir)
+        store.write('a.snapshot', b'a')
+        index = (temp_dir / PACK_INDEX_FILENAME).read_bytes()
+        store.write('b.snapshot', b'b')
+        store.write('c.snapshot', b'a')
+        store.delete('b.snapshot')
+        assert (temp_dir / PACK_INDEX_FILENAME).read_bytes() == index
+        assert len((temp_dir / PACK_LOG_FILENAME).read_bytes().splitlines()) == 4
+        assert store.stamp('c.snapshot') == store.stamp('a.snapshot')
+        reopened = PackStore(temp_dir)
+        assert reopened.names() == ['a.snapshot', 'c.snapshot']
+        store.write('d.snapshot', b'd')
+        assert (temp_dir / PACK_INDEX_FILENAME).read_bytes() != index
+        assert len((temp_dir / PACK_LOG_FILENAME).read_bytes().splitlines()) == 1
+        assert reopened.read('d.snapshot') == b'd'
+        assert PackStore(temp_dir).names() == ['a.snapshot', 'c.snapshot', 'd.snapshot']
+
+    def test_missing_entry(self, temp_dir):
+        """Test unknown names raise FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            PackStore(temp_dir).read('missing.snapshot')
+
+
+class TestMigration:
+    def test_pack_and_unpack(self, temp_dir):
+        """Test migrating between layouts preserves content."""
+        (temp_dir / 'a.snapshot').write_bytes(b'a\n')
+        (temp_dir / 'b.snapshot').write_bytes(b'b\n')
+        assert pack_snapshots(temp_dir, compress=True) == 2
+        assert not (temp_dir / 'a.snapshot').exists()
+        assert isinstance(open_store(temp_dir), PackStore)
+
+        assert unpack_snapshots(temp_dir) == 2
+        assert isinstance(open_store(temp_dir), DirectoryStore)
+        assert not (temp_dir / PACK_LOG_FILENAME).exists()
+        assert (temp_dir / 'b.snapshot').read_bytes() == b'b\n'
@@ -0,0 +1,169 @@
+"""Tests for canonical JSON/NDJSON snapshots and structural diffs."""
+
+import json
+import pytest
+import sys
+import shutil
+from click.testing import CliRunner
+from assert_snapshot.cli import cli
+from assert_snapshot.formatter import format_diff_stat, iter_diff
+from assert_snapshot.snapshot import SnapshotManager
+from assert_snapshot.structured import canonicalize, diff_values, render_value, structural_diff
+from assert_snapshot.suite import run_suite
+
+
+def emit(text: str, stderr: str = ''):
+    """A command printing ``text`` to stdout and ``stderr`` to stderr."""
+    script = f'import sys; sys.stdout.write({text!r}); sys.stdout.flush(); sys.stderr.write({stderr!r})'
+    return [sys.executable, '-c', script]
+
+
+class TestCanonicalize:
+    def test_key_order_and_floats(self):
+        assert canonicalize('{"b": 1.50, "a": [1e0]}', 'json') == canonicalize('{"a":[1.0],"b":1.5}', 'json')
+
+    def test_json_is_indented(self):
+        assert canonicalize('{"b":1,"a":null}', 'json') == '{\n  "a": null,\n  "b": 1\n}\n'
+
+    def test_ndjson_one_document_per_line(self):
+        text = '{"b": 2, "a": 1}\n\n{"c": "é"}{"d": []}'
+        assert canonicalize(text, 'ndjson') == '{"a":1,"b":2}\n{"c":"é"}\n{"d":[]}\n'
+        assert canonicalize('', 'ndjson') == ''
+
+    def test_invalid(self):
+        with pytest.raises(ValueError, match='not valid JSON'):
+            canonicalize('{"a": }', 'json')
+        with pytest.raises(ValueError, match='single JSON document'):
+            canonicalize('{}\n{}\n', 'json')
+        with pytest.raises(ValueError):
+            canonicalize('{}', 'yaml')
+
+
+class TestStructuralDiff:
+    def test_paths(self):
+        changes = list(diff_values(
+            {'a': {'b': 1}, 'gone': 1, 'odd key': True},
+            {'a': {'b': 2}, 'new': [1], 'odd key': 1}
+        ))
+        assert changes == [
+            ('~', '$.a.b', 1, 2),
+            ('-', '$.gone', 1, None),
+            ('+', '$.new', None, [1]),
+            ('~', '$["odd key"]', True, 1),
+        ]
+
+    def test_list_insertion_is_not_a_shift(self):
+        changes = list(diff_values([{'id': 1}, {'id': 2}], [{'id': 0}, {'id': 1}, {'id': 2}]))
+        assert changes == [('+', '$[0]', None, {'id': 0})]
+
+    def test_list_item_changed_in_place(self):
+        changes = list(diff_values([{'id': 1, 'v': 'a'}, {'id': 2}], [{'id': 1, 'v': 'b'}, {'id': 2}]))
+        assert changes == [('~', '$[0].v', 'a', 'b')]
+
+    def test_ndjson_documents_are_list_items(self):
+        changes = list(structural_diff('{"a":1}\n{"a":2}\n', '{"a":1}\n{"a":3}\n', 'ndjson'))
+        assert changes == [('~', '$[1].a', 2, 3)]
+
+    def test_render_value_truncates(self):
+        assert render_value('x' * 500, width=10) == '"xxxxxx...'
+
+    def test_formatter(self):
+        lines = list(iter_diff('{"a": 1}', '{"a": 2}', color=False, structure='json'))
+        assert lines == ['--- expected', '+++ actual', '@@ $.a @@', '-1', '+2']
+        assert '1 path(s) changed' in format_diff_stat('{"a": 1}', '{"a": 2}', structure='json')
+
+    def test_formatter_falls_back_to_lines(self):
+        lines = list(iter_diff('not json\n', 'still not\n', color=False, structure='json'))
+        assert '-not json\n' in lines
+
+
+class TestStructuredSnapshots:
+    def test_order_insensitive(self, manager):
+        snapshot_name = manager.capture(emit('{"b": 1.50, "a": 1}\n'), name='doc', structure='json')
+        assert manager.index.get(snapshot_name)['structure'] == 'json'
+        result = manager.verify(emit('{"a": 1, "b": 1.5}'), name='doc')
+        assert result['matches']
+        assert result['structure'] == 'json'
+
+    def test_mismatch_records_canonical_output(self, manager):
+        manager.capture(emit('{"a": 1}'), name='doc', structure='json')
+        result = manager.verify(emit('{"a": 2}'), name='doc')
+        assert not result['matches']
+        assert result['actual'] == '{\n  "a": 2\n}\n'
+        manager.accept_last_run('doc.snapshot')
+        assert manager.verify(emit('{ "a" : 2 }'), name='doc')['matches']
+        assert manager.index.get('doc.snapshot')['structure'] == 'json'
+
+    def test_ndjson_with_separate_stderr(self, manager):
+        """Test only stdout is parsed when stderr is kept apart."""
+        manager.capture(emit('{"b":1,"a":2}\n', 'not json\n'), name='log',
+                        structure='ndjson', separate_stderr=True)
+        assert manager.verify(emit('{"a":2,"b":1}\n', 'not json\n'), name='log')['matches']
+
+    def test_redactions_apply_before_parsing(self, temp_dir):
+        manager = SnapshotManager(str(temp_dir / 'snaps'), redact=['uuids'])
+        manager.capture(emit('{"id": "0b7e8f4c-56aa-4a8e-9b0e-0d1c2e3f4a5b", "n": 1}'),
+                        name='doc', structure='json')
+        assert manager.verify(emit('{"n": 1, "id": "1f2e3d4c-0000-4a8e-9b0e-0d1c2e3f4a5b"}'),
+                              name='doc')['matches']
+
+    def test_invalid_output_is_an_error(self, manager):
+        manager.capture(emit('{}'), name='doc', structure='json')
+        with pytest.raises(ValueError):
+            manager.verify(emit('oops'), name='doc')
+
+    def test_rejected_combinations(self, manager):
+        with pytest.raises(ValueError):
+            manager.capture(emit('{}'), name='doc', binary=True, structure='json')
+        manager.capture(emit('{}'), name='doc', structure='json')
+        with pytest.raises(ValueError):
+            manager.verify_stream(emit('{}'), name='doc')
+
+    def test_recapture_as_text(self, manager):
+        manager.capture(emit('{"a": 1}'), name='doc', structure='json')
+        manager.capture(emit('{"a": 1}'), name='doc')
+        assert 'structure' not in manager.index.get('doc.snapshot')
+        assert not manager.verify(emit('{"a":1}'), name='doc')['matches']
+
+    def test_structure_kept_with_snapshot(self, manager):
+        """Test a fresh clone without the local index still verifies structurally."""
+        manager.capture(emit('{"b": 1, "a": 2}'), name='doc', structure='json')
+        assert (manager.snapshot_dir / 'doc.snapshot').read_bytes().startswith(
+            b'#assert-snapshot structure=json\n{')
+        shutil.rmtree(manager.snapshot_dir / '.index')
+        clone = SnapshotManager(str(manager.snapshot_dir))
+        assert clone.recorded_structure('doc.snapshot') == 'json'
+        result = clone.verify(emit('{"a": 2, "b": 1}'), name='doc')
+        assert result['matches']
+        assert result['structure'] == 'json'
+        assert clone.read_snapshot('doc.snapshot') == '{\n  "a": 2,\n  "b": 1\n}\n'
+
+    def test_suite_reports_structure(self, temp_dir):
+        snapshot_dir = str(temp_dir / 'snaps')
+        SnapshotManager(snapshot_dir).capture(emit('{"a": 1}'), name='doc', structure='json')
+        entries = [{'name': 'doc', 'command': emit('{"a": 2}'), 'timeout': 5, 'strip_ansi': False,
+                    'stream': False, 'inputs': None, 'env': []}]
+        result, = run_suite(entries, snapshot_dir, jobs=1, include_output=True)
+        assert result['status'] == 'failed'
+        assert result['structure'] == 'json'
+
+
+class TestStructuredCLI:
+    def test_capture_and_verify(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            result = runner.invoke(cli, ['capture', '--name', 'doc', '--structure', 'json', '--',
+                                         *emit(json.dumps({'b': [1, 2], 'a': 1.0}))])
+            assert result.exit_code == 0
+            result = runner.invoke(cli, ['verify', '--name', 'doc', '--', *emit('{"a": 1.00, "b": [1, 2]}')])
+            assert result.exit_code == 0
+
+            result = runner.invoke(cli, ['verify', '--name', 'doc', '--', *emit('{"a": 1.0, "b": [1, 3]}')])
+            assert result.exit_code == 1
+            assert '@@ $.b[1] @@' in result.output
+
+    def test_unknown_structure(self, temp_dir):
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            result = runner.invoke(cli, ['capture', '--structure', 'yaml', 'echo', '{}'])
+            assert result.exit_code == 2
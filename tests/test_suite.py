@@ -0,0 +1,240 @@
+"""Tests for manifest loading and parallel suite execution."""
+
+import json
+import os
+import pytest
+from pathlib import Path
+from click.testing import CliRunner
+from assert_snapshot.cli import cli
+from assert_snapshot.snapshot import SnapshotManager
+from assert_snapshot.suite import drive, load_manifest, run_suite, summarize
+
+
+def write_manifest(path, snapshots, **extra):
+    """Write a JSON manifest with the given entries."""
+    data = dict(extra, snapshots=snapshots)
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+def make_entry(name, command, **overrides):
+    """Build a fully-populated manifest entry."""
+    entry = {
+        'name': name,
+        'command': command,
+        'timeout': 5,
+        'strip_ansi': False,
+        'stream': False,
+        'inputs': None,
+        'env': [],
+    }
+    entry.update(overrides)
+    return entry
+
+
+class TestLoadManifest:
+    def test_load_json_manifest(self, temp_dir):
+        """Test JSON manifest entries get defaults applied."""
+        path = write_manifest(
+            temp_dir / 'suite.json',
+            [{'name': 'hello', 'command': ['echo', 'hello']}],
+            timeout=5
+        )
+        config = load_manifest(path)
+        entry = config['snapshots'][0]
+        assert entry['command'] == ['echo', 'hello']
+        assert entry['timeout'] == 5
+        assert entry['strip_ansi'] is False
+        assert config['snapshot_dir'] == '.snapshots'
+
+    def test_load_toml_manifest(self, temp_dir):
+        """Test TOML manifests with string commands."""
+        pytest.importorskip('tomllib')
+        path = temp_dir / 'suite.toml'
+        path.write_text(
+            'snapshot_dir = "snaps"\n'
+            '[[snapshots]]\n'
+            'name = "hi"\n'
+            'command = "echo hi there"\n'
+            'strip_ansi = true\n'
+        )
+        config = load_manifest(str(path))
+        assert config['snapshot_dir'] == 'snaps'
+        assert config['snapshots'][0]['command'] == ['echo', 'hi', 'there']
+        assert config['snapshots'][0]['strip_ansi'] is True
+
+    def test_missing_command(self, temp_dir):
+        """Test entries without a command are rejected."""
+        path = write_manifest(temp_dir / 'suite.json', [{'name': 'x'}])
+        with pytest.raises(ValueError, match='missing a command'):
+            load_manifest(path)
+
+    def test_unknown_keys(self, temp_dir):
+        """Test typos in entry keys are rejected."""
+        path = write_manifest(
+            temp_dir / 'suite.json',
+            [{'command': ['echo'], 'timout': 3}]
+        )
+        with pytest.raises(ValueError, match='unknown keys'):
+            load_manifest(path)
+
+
+    def test_normalize_table(self, temp_dir):
+        """Test suite-wide normalization settings are loaded and validated."""
+        path = write_manifest(
+            temp_dir / 'suite.json',
+            [{'command': ['echo']}],
+            normalize={'redact': ['uuids'], 'strip_trailing_whitespace': True}
+        )
+        assert load_manifest(path)['normalize']['redact'] == ['uuids']
+        path = write_manifest(
+            temp_dir / 'suite.json',
+            [{'command': ['echo']}],
+            normalize={'redcat': ['uuids']}
+        )
+        with pytest.raises(ValueError, match='Unknown normalize keys'):
+            load_manifest(path)
+
+
+class TestRunSuite:
+    def test_run_suite_results(self, temp_dir):
+        """Test suite reports passes, failures and errors."""
+        snapshot_dir = str(temp_dir / 'snaps')
+        manager = SnapshotManager(snapshot_dir)
+        manager.capture(['echo', 'a'], name='a')
+        manager.capture(['echo', 'b'], name='b')
+        entries = [
+            make_entry('a', ['echo', 'a']),
+            make_entry('b', ['echo', 'changed']),
+            make_entry('c', ['echo', 'c']),
+        ]
+        results = list(run_suite(entries, snapshot_dir, jobs=2, include_output=True))
+        statuses = {r['name']: r['status'] for r in results}
+        assert statuses == {'a.snapshot': 'passed', 'b.snapshot': 'failed', 'c.snapshot': 'error'}
+        failed = next(r for r in results if r['status'] == 'failed')
+        assert 'changed' in failed['actual']
+
+        summary = summarize(results, 1.0)
+        assert summary['passed'] == 1
+        assert summary['failed'] == 1
+        assert summary['errors'] == 1
+        assert summary['success'] is False
+
+    def test_run_suite_streaming(self, temp_dir):
+        """Test entries can opt into streaming verification."""
+        snapshot_dir = str(temp_dir / 'snaps')
+        SnapshotManager(snapshot_dir).capture(['echo', 'a'], name='a')
+        entries = [make_entry('a', ['echo', 'a'], stream=True)]
+        results = list(run_suite(entries, snapshot_dir, jobs=1))
+        assert results[0]['status'] == 'passed'
+
+    def test_run_suite_cache_stats(self, temp_dir):
+        """Test unchanged inputs are skipped and counted as cache hits."""
+        snapshot_dir = str(temp_dir / 'snaps')
+        data = temp_dir / 'data.txt'
+        data.write_text('v1')
+        command = ['cat', str(data)]
+        SnapshotManager(snapshot_dir).capture(command, name='cat')
+        entries = [make_entry('cat', command, inputs=[str(data)])]
+
+        first = list(run_suite(entries, snapshot_dir, jobs=1))
+        second = list(run_suite(entries, snapshot_dir, jobs=1))
+        uncached = list(run_suite(entries, snapshot_dir, jobs=1, use_cache=False))
+        assert first[0]['cached'] is False
+        assert second[0]['cached'] is True
+        assert uncached[0]['cached'] is False
+        assert summarize(second, 1.0)['cached'] == 1
+
+    def test_run_suite_input_mtime(self, temp_dir):
+        """Test input_mtime fingerprints inputs by size and mtime only."""
+        snapshot_dir = str(temp_dir / 'snaps')
+        data = temp_dir / 'data.txt'
+        data.write_text('v1')
+        command = ['cat', str(data)]
+        SnapshotManager(snapshot_dir).capture(command, name='cat')
+        config = load_manifest(write_manifest(
+            temp_dir / 'suite.json', [{'name': 'cat', 'command': command, 'inputs': [str(data)]}],
+            input_mtime=True
+        ))
+        entries = config['snapshots']
+        assert entries[0]['input_mtime'] is True
+
+        list(run_suite(entries, snapshot_dir, jobs=1))
+        stat = data.stat()
+        data.write_text('v2')
+        os.utime(data, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert next(run_suite(entries, snapshot_dir, jobs=1))['cached'] is True
+        entries[0]['input_mtime'] = False
+        assert next(run_suite(entries, snapshot_dir, jobs=1))['status'] == 'failed'
+
+    def test_run_suite_async_engine(self, temp_dir):
+        """Test the async engine reports the same statuses as the process pool."""
+        snapshot_dir = str(temp_dir / 'snaps')
+        manager = SnapshotManager(snapshot_dir)
+        manager.capture(['echo', 'a'], name='a')
+        manager.capture(['echo', 'b'], name='b')
+        manager.capture(['echo', 's'], name='s')
+        entries = [
+            make_entry('a', ['echo', 'a']),
+            make_entry('b', ['echo', 'changed']),
+            make_entry('c', ['echo', 'c']),
+            make_entry('s', ['echo', 's'], stream=True),
+        ]
+        results = list(run_suite(entries, snapshot_dir, jobs=2, engine='async'))
+        statuses = {r['name']: r['status'] for r in results}
+        assert statuses == {
+            'a.snapshot': 'passed',
+            'b.snapshot': 'failed',
+            'c.snapshot': 'error',
+            's.snapshot': 'passed',
+        }
+        assert all('written' not in r for r in results)
+
+    def test_drive_closes_abandoned_generator(self):
+        """Test drive yields from an async generator and closes it when stopped early."""
+        closed = []
+
+        async def numbers():
+            try:
+                for n in range(3):
+                    yield n
+            finally:
+                closed.append(True)
+
+        results = drive(numbers())
+        assert next(results) == 0
+        results.close()
+        assert closed == [True]
+        assert list(drive(numbers())) == [0, 1, 2]
+
+    def test_run_cli(self, temp_dir):
+        """Test run command prints results and summary."""
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            SnapshotManager().capture(['echo', 'hi'], name='hi')
+            path = write_manifest(
+                Path('suite.json'),
+                [{'name': 'hi', 'command': ['echo', 'hi']}]
+            )
+            result = runner.invoke(cli, ['run', '--jobs', '1', path])
+            assert result.exit_code == 0
+            assert '✓ hi.snapshot' in result.output
+            assert '1 passed, 0 failed, 0 errors' in result.output
+
+            result = runner.invoke(cli, ['run', '--engine', 'async', path])
+            assert result.exit_code == 0
+            assert '1 passed, 0 failed, 0 errors' in result.output
+
+    def test_run_cli_diff_stat(self, temp_dir):
+        """Test run reports diff stats for failures."""
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            SnapshotManager().capture(['echo', 'hi'], name='hi')
+            path = write_manifest(
+                Path('suite.json'),
+                [{'name': 'hi', 'command': ['echo', 'bye']}]
+            )
+            result = runner.invoke(cli, ['run', '--jobs', '1', '--diff-stat', path])
+            assert result.exit_code == 1
+            assert '✗ hi.snapshot' in result.output
+            assert '1 deletion(s)(-)' in result.output
@@ -0,0 +1,163 @@
+"""Tests for per-phase tracing and trace reports."""
+
+import asyncio
+import json
+import pytest
+import sys
+from pathlib import Path
+from click.testing import CliRunner
+from assert_snapshot.cli import cli
+from assert_snapshot.snapshot import SnapshotManager
+from assert_snapshot.suite import run_suite
+from assert_snapshot.trace import Tracer, build_report, format_profile, phase
+
+
+@pytest.fixture
+def tracer():
+    return Tracer()
+
+
+@pytest.fixture
+def manager(temp_dir, tracer):
+    return SnapshotManager(str(temp_dir / 'snaps'), tracer=tracer)
+
+
+class TestTracer:
+    def test_capture_phases(self, manager, tracer):
+        """Test capture records its phases, output size and child usage."""
+        manager.capture(['echo', 'hello'], name='greeting')
+        record, = tracer.records
+        assert record['op'] == 'capture'
+        assert record['snapshot'] == 'greeting.snapshot'
+        assert record['status'] == 'captured'
+        assert {'spawn', 'run', 'decode', 'normalize', 'write'} <= set(record['phases'])
+        assert record['output_bytes'] == 6
+        assert record['bytes_written'] == 6
+        assert record['duration'] >= sum(record['phases'].values())
+        assert record['cpu_user'] is not None
+        assert record['max_rss'] > 0
+
+    def test_child_usage_is_per_command(self, manager, tracer):
+        """Test a small command after a large one reports its own peak RSS."""
+        big = [sys.executable, '-c', 'b = bytearray(200 * 1024 * 1024); b[::4096] = b"x" * len(b[::4096])']
+        manager.capture(big, name='big')
+        manager.capture(['true'], name='small')
+        big_record, small_record = tracer.records
+        # A forked child starts from this process's RSS, so compare relatively.
+        assert big_record['max_rss'] > 200 * 1024 * 1024
+        assert small_record['max_rss'] < big_record['max_rss'] - 100 * 1024 * 1024
+
+    def test_verify_status(self, manager, tracer):
+        """Test verify records pass, failure and errors."""
+        manager.capture(['echo', 'hello'], name='greeting')
+        manager.verify(['echo', 'hello'], name='greeting')
+        manager.verify(['echo', 'changed'], name='greeting')
+        with pytest.raises(FileNotFoundError):
+            manager.verify(['echo', 'x'], name='missing')
+        statuses = [r['status'] for r in tracer.records[1:]]
+        assert statuses == ['passed', 'failed', 'error']
+        failed = tracer.records[2]
+        assert 'read' in failed['phases']
+        assert failed['bytes_read'] == 6
+        assert failed['bytes_written'] == 8
+        assert 'Snapshot not found' in tracer.records[3]['error']
+
+    def test_stream_and_async(self, manager, tracer):
+        """Test streaming and async verifies are traced too."""
+        manager.capture(['echo', 'hello'], name='greeting')
+        manager.verify_stream(['echo', 'hello'], name='greeting')
+        asyncio.run(manager.averify(['echo', 'hello'], name='greeting'))
+        stream, async_verify = tracer.records[1:]
+        assert 'stream' in stream['phases']
+        assert stream['status'] == 'passed'
+        assert 'run' in async_verify['phases']
+        assert async_verify['status'] == 'passed'
+
+    def test_untraced_manager(self, temp_dir):
+        """Test a manager without a tracer records nothing."""
+        manager = SnapshotManager(str(temp_dir / 'snaps'))
+        manager.capture(['echo', 'hello'], name='greeting')
+        assert manager.tracer is None
+
+    def test_nested_operations_join(self, manager, tracer):
+        """Test an outer operation absorbs the manager's own operation."""
+        manager.capture(['echo', 'hello'], name='greeting')
+        outer = Tracer()
+        with outer.operation('verify', ['echo', 'hello']) as record:
+            manager.verify(['echo', 'hello'], name='greeting')
+            with phase('diff'):
+                pass
+        assert len(tracer.records) == 1
+        assert outer.records == [record]
+        assert {'run', 'diff'} <= set(record['phases'])
+
+    def test_on_record(self, temp_dir):
+        """Test the on_record hook sees every finished operation."""
+        seen = []
+        manager = SnapshotManager(str(temp_dir / 'snaps'), tracer=Tracer(seen.append))
+        manager.capture(['echo', 'hello'], name='greeting')
+        assert [r['op'] for r in seen] == ['capture']
+
+
+class TestReport:
+    def test_build_report(self, manager, tracer):
+        """Test phase totals and byte totals are aggregated."""
+        manager.capture(['echo', 'a'], name='a')
+        manager.capture(['echo', 'b'], name='b')
+        report = tracer.report()
+        assert report['phases']['run']['count'] == 2
+        assert report['totals']['output_bytes'] == 4
+        json.dumps(report)
+
+    def test_format_profile(self, manager, tracer):
+        """Test the profile lists snapshots and phases."""
+        manager.capture(['echo', 'a'], name='a')
+        lines = format_profile(build_report(tracer.records))
+        text = '\n'.join(lines)
+        assert 'a.snapshot' in text
+        assert 'run' in text
+
+
+class TestTracedSuite:
+    @pytest.mark.parametrize('engine', ['process', 'async'])
+    def test_run_suite_trace(self, temp_dir, engine):
+        """Test suite results carry one trace record per entry."""
+        snapshot_dir = str(temp_dir / 'snaps')
+        SnapshotManager(snapshot_dir).capture(['echo', 'a'], name='a')
+        entries = [
+            {'name': 'a', 'command': ['echo', 'a'], 'timeout': 5, 'strip_ansi': False,
+             'stream': stream, 'inputs': None, 'env': []}
+            for stream in (False, True)
+        ]
+        results = list(run_suite(entries, snapshot_dir, jobs=2, engine=engine, trace=True))
+        for result in results:
+            assert result['trace']['snapshot'] == 'a.snapshot'
+            assert result['trace']['status'] == 'passed'
+        assert 'trace' not in next(run_suite(entries[:1], snapshot_dir, jobs=1))
+
+
+class TestTraceCLI:
+    def test_verify_report(self, temp_dir):
+        """Test --report writes JSON including the diff phase."""
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'test', 'echo', 'hello'])
+            result = runner.invoke(
+                cli, ['verify', '--name', 'test', '--report', 'out.json', 'echo', 'changed']
+            )
+            assert result.exit_code == 1
+            report = json.loads(Path('out.json').read_text())
+            record, = report['operations']
+            assert record['status'] == 'failed'
+            assert 'diff' in record['phases']
+
+    def test_run_profile(self, temp_dir):
+        """Test run --profile prints the slowest snapshots and phases."""
+        runner = CliRunner()
+        with runner.isolated_filesystem(temp_dir=temp_dir):
+            runner.invoke(cli, ['capture', '--name', 'a', 'echo', 'a'])
+            Path('m.json').write_text(json.dumps({'snapshots': [{'name': 'a', 'command': ['echo', 'a']}]}))
+            result = runner.invoke(cli, ['run', 'm.json', '--profile', '--report', 'r.json'])
+            assert result.exit_code == 0
+            assert 'Slowest snapshots' in result.output
+            assert json.loads(Path('r.json').read_text())['operations'][0]['snapshot'] == 'a.snapshot'
@@ -0,0 +1,132 @@
+"""Tests for watch mode: change detection, debouncing and stale-run cancellation."""
+
+import asyncio
+import os
+import sys
+import pytest
+from assert_snapshot.snapshot import SnapshotManager
+from assert_snapshot.watch import (
+    InotifyWatcher, PollingWatcher, awatch, input_stamp, open_watcher, watch_dirs
+)
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is Linux-only')
+
+
+def make_entry(name, command, inputs):
+    return {'name': name, 'command': command, 'timeout': 10, 'strip_ansi': False,
+            'stream': False, 'inputs': inputs, 'env': []}
+
+
+class TestWatchDirs:
+    def test_files_dirs_and_globs(self, temp_dir):
+        (temp_dir / 'src' / 'pkg').mkdir(parents=True)
+        (temp_dir / 'src' / 'pkg' / 'a.py').write_text('a')
+        (temp_dir / 'conf.ini').write_text('x')
+        dirs = watch_dirs([
+            str(temp_dir / 'conf.ini'),
+            str(temp_dir / 'src'),
+            str(temp_dir / 'src' / '**' / '*.py'),
+            str(temp_dir / 'missing' / 'file.txt'),
+        ])
+        assert (str(temp_dir), False) in dirs
+        assert (str(temp_dir / 'src'), True) in dirs
+        assert (str(temp_dir / 'src' / 'pkg'), False) in dirs
+
+    def test_input_stamp_changes(self, temp_dir):
+        path = temp_dir / 'in.txt'
+        path.write_text('a')
+        before = input_stamp([str(path)])
+        path.write_text('ab')
+        assert input_stamp([str(path)]) != before
+        assert input_stamp([str(temp_dir / 'none')]) == ((str(temp_dir / 'none'), None),)
+
+
+class TestWatchers:
+    def check_watcher(self, watcher, temp_dir):
+        try:
+            assert not watcher.wait(0.05)
+            (temp_dir / 'new.txt').write_text('x')
+            assert watcher.wait(2)
+            watcher.close()
+            assert not watcher.wait()
+        finally:
+            watcher.close()
+
+    def test_polling(self, temp_dir):
+        self.check_watcher(PollingWatcher({(str(temp_dir), False)}, interval=0.01), temp_dir)
+
+    @linux_only
+    def test_inotify(self, temp_dir):
+        self.check_watcher(InotifyWatcher({(str(temp_dir), False)}), temp_dir)
+
+    def test_open_watcher(self, temp_dir):
+        assert isinstance(open_watcher(set(), 'poll'), PollingWatcher)
+        with pytest.raises(ValueError):
+            open_watcher(set(), 'fsevents')
+
+
+async def next_event(events, kind, timeout=10):
+    """Skip events until one of ``kind`` arrives."""
+    while True:
+        event = await asyncio.wait_for(events.__anext__(), timeout)
+        if event[0] == kind:
+            return event[1]
+
+
+@pytest.mark.parametrize('backend', [
+    'poll', pytest.param('inotify', marks=linux_only)
+])
+class TestAwatch:
+    def test_reverifies_affected_only(self, temp_dir, backend):
+        snapshot_dir = str(temp_dir / 'snaps')
+        first, second = temp_dir / 'first.txt', temp_dir / 'second.txt'
+        first.write_text('one\n')
+        second.write_text('two\n')
+        manager = SnapshotManager(snapshot_dir)
+        entries = [make_entry(path.stem, ['cat', str(path)], [str(path)]) for path in (first, second)]
+        for entry in entries:
+            manager.capture(entry['command'], name=entry['name'])
+
+        async def scenario():
+            events = awatch(entries, snapshot_dir, debounce=0.05, backend=backend, poll_interval=0.02)
+            try:
+                initial = {(await next_event(events, 'result'))['status'] for _ in entries}
+                assert initial == {'passed'}
+                first.write_text('changed\n')
+                assert await next_event(events, 'changed') == ['first']
+                result = await next_event(events, 'result')
+                assert result['name'] == 'first.snapshot'
+                assert result['status'] == 'failed'
+                assert result['actual'] == 'changed\n'
+            finally:
+                await events.aclose()
+
+        asyncio.run(scenario())
+
+    def test_cancels_stale_run(self, temp_dir, backend):
+        snapshot_dir = str(temp_dir / 'snaps')
+        source = temp_dir / 'in.txt'
+        source.write_text('a\n')
+        marker = temp_dir / 'slow'
+        # Sleeps only while the marker exists, so the initial run is quick.
+        command = ['sh', '-c', f'[ -e {marker} ] && sleep 5; cat {source}']
+        SnapshotManager(snapshot_dir).capture(command, name='slow')
+        entry = make_entry('slow', command, [str(source)])
+
+        async def scenario():
+            events = awatch([entry], snapshot_dir, debounce=0.05, backend=backend, poll_interval=0.02)
+            try:
+                assert (await next_event(events, 'result'))['status'] == 'passed'
+                marker.write_text('')
+                source.write_text('b\n')
+                await next_event(events, 'changed')
+                await asyncio.sleep(0.2)
+                os.unlink(marker)
+                source.write_text('a\n')
+                assert await next_event(events, 'cancelled') == 'slow'
+                result = await next_event(events, 'result', timeout=4)
+                assert result['status'] == 'passed'
+            finally:
+                await events.aclose()
+
+        asyncio.run(scenario())